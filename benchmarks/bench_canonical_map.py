@@ -0,0 +1,112 @@
+"""Benchmark do CanonicalMapper: laço sobre as variantes (legado) vs Aho–Corasick.
+
+Mede linhas/s da busca de chaves canônicas por linha, como em
+``ItemExtractor.extract_from_text``, usando as linhas reais de uma planta
+extraída repetidas até o tamanho pedido (ordem embaralhada). As linhas se
+repetem muito, então a comparação roda sem o memo de linhas
+(``LineMemo(0)``); o memo é medido à parte, na análise completa da linha.
+
+Uso:
+    python benchmarks/bench_canonical_map.py [--lines 50000] [--repeat 3]
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from memorial_maker.normalize.canonical_map import CanonicalMapper, LineMemo  # noqa: E402
+
+SAMPLE_JSON = (
+    Path(__file__).parent.parent / "test_output" / "MGAMAK_TELECOM_01_SUBSOLO_28-04-2025_unstructured.json"
+)
+
+
+def legacy_find_canonical(mapper: CanonicalMapper, text: str):
+    """Busca anterior: exata e depois teste de substring variante a variante."""
+    text_norm = re.sub(r"\s+", " ", text.lower()).strip()
+    if text_norm in mapper.reverse_map:
+        return mapper.reverse_map[text_norm]
+    for variant, canonical in mapper.reverse_map.items():
+        if variant in text_norm or text_norm in variant:
+            return canonical
+    return None
+
+
+def make_lines(count: int) -> list:
+    """Gera linhas de OCR a partir do texto real das plantas."""
+    with open(SAMPLE_JSON, "r", encoding="utf-8") as f:
+        source = [line for item in json.load(f)["text"] for line in item["text"].splitlines() if line.strip()]
+
+    rng = random.Random(42)
+    return [rng.choice(source) for _ in range(count)]
+
+
+def bench(name: str, lookup, lines: list, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            # Duas buscas por linha no extrator legado (ponto e cabo); uma no novo
+            lookup(line)
+        best = min(best, time.perf_counter() - start)
+    return {"impl": name, "seconds": best, "lines_per_s": len(lines) / best}
+
+
+def bench_memo(lines: list, repeat: int) -> dict:
+    """Análise completa das linhas com o memo de linhas (novo a cada rodada)."""
+    best = float("inf")
+    for _ in range(repeat):
+        memo = LineMemo(len(lines))
+        mapper = CanonicalMapper(memo=memo)
+        start = time.perf_counter()
+        for line in lines:
+            mapper.analyze(line)
+        best = min(best, time.perf_counter() - start)
+    return {"impl": "analyze (memo)", "seconds": best, "lines_per_s": len(lines) / best,
+            "hits": memo.hits, "misses": memo.misses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    mapper = CanonicalMapper(memo=LineMemo(0))
+    lines = make_lines(args.lines)
+    print(f"{args.lines} linhas ({len(set(lines))} distintas), {len(mapper.reverse_map)} variantes")
+
+    def legacy_line(line):
+        legacy_find_canonical(mapper, line)
+        legacy_find_canonical(mapper, line)
+
+    def automaton_line(line):
+        list(mapper.automaton.find(mapper.normalize_text(line)))
+
+    rows = [
+        bench("laço (2x/linha)", legacy_line, lines, args.repeat),
+        bench("autômato", automaton_line, lines, args.repeat),
+        bench("find_canonical", mapper.find_canonical, lines, args.repeat),
+        bench("find_all_canonical", mapper.find_all_canonical, lines, args.repeat),
+    ]
+
+    memo_rows = [
+        bench("analyze (sem memo)", mapper.analyze, lines, args.repeat),
+        bench_memo(lines, args.repeat),
+    ]
+
+    print(f"\n{'implementação':<22}{'tempo (s)':>12}{'linhas/s':>14}")
+    for row in rows + memo_rows:
+        print(f"{row['impl']:<22}{row['seconds']:>12.3f}{row['lines_per_s']:>14,.0f}")
+    print(f"\nGanho por linha (extrator, sem memo): {rows[0]['seconds'] / rows[3]['seconds']:.1f}x")
+    print(f"Memo de linhas: {memo_rows[1]['hits']} acertos, {memo_rows[1]['misses']} faltas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark do cache de OCR: arquivos JSON (legado) vs SQLite binário.
+
+Compara latência de leitura (cache hit) e espaço em disco usando páginas
+sintéticas montadas a partir de texto real extraído das plantas.
+
+Uso:
+    python benchmarks/bench_ocr_cache.py [--pages 2000] [--lookups 5]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from memorial_maker.utils.ocr_cache import (  # noqa: E402
+    JsonDirCache,
+    SQLiteCache,
+    encode_result,
+    MSGPACK_AVAILABLE,
+)
+
+SAMPLE_JSON = (
+    Path(__file__).parent.parent / "test_output" / "MGAMAK_TELECOM_01_SUBSOLO_28-04-2025_unstructured.json"
+)
+
+
+def make_pages(count: int) -> list:
+    """Gera resultados de OCR com texto de legenda denso."""
+    with open(SAMPLE_JSON, "r", encoding="utf-8") as f:
+        lines = [item["text"] for item in json.load(f)["text"]]
+
+    rng = random.Random(42)
+    pages = []
+    for i in range(count):
+        rng.shuffle(lines)
+        pages.append({
+            "text": "\n".join(lines),
+            "page_number": i,
+            "ocr_time": rng.uniform(5, 60),
+            "from_cache": False,
+        })
+    return pages
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def bench(name: str, backend, pages: list, lookups: int, footprint) -> dict:
+    start = time.perf_counter()
+    for i, page in enumerate(pages):
+        backend.set(f"key{i}", page)
+    write_time = time.perf_counter() - start
+
+    keys = [f"key{i}" for i in range(len(pages))] * lookups
+    random.Random(7).shuffle(keys)
+    start = time.perf_counter()
+    for key in keys:
+        backend.get(key)
+    hit_latency = (time.perf_counter() - start) / len(keys)
+
+    return {
+        "backend": name,
+        "write_s": write_time,
+        "hit_us": hit_latency * 1e6,
+        "disk_mb": footprint() / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    raw_json = sum(len(json.dumps(p, ensure_ascii=False, indent=2).encode()) for p in pages)
+    encoded = sum(len(encode_result(p)) for p in pages)
+    print(f"{args.pages} páginas, msgpack={'sim' if MSGPACK_AVAILABLE else 'não'}")
+    print(f"Payload JSON indent=2: {raw_json / 1e6:.2f} MB | binário comprimido: {encoded / 1e6:.2f} MB "
+          f"({raw_json / encoded:.1f}x menor)")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        json_dir = tmp / "json"
+        db_path = tmp / "sqlite" / "ocr_cache.sqlite3"
+
+        sqlite_cache = SQLiteCache(db_path)
+
+        def sqlite_footprint():
+            sqlite_cache.checkpoint()
+            return dir_size(db_path.parent)
+
+        rows = [
+            bench("json_dir", JsonDirCache(json_dir), pages, args.lookups, lambda: dir_size(json_dir)),
+            bench("sqlite_binario", sqlite_cache, pages, args.lookups, sqlite_footprint),
+        ]
+
+    print(f"\n{'backend':<16}{'escrita (s)':>14}{'hit (µs)':>12}{'disco (MB)':>12}")
+    for row in rows:
+        print(f"{row['backend']:<16}{row['write_s']:>14.2f}{row['hit_us']:>12.1f}{row['disk_mb']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
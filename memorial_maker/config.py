@@ -27,7 +27,12 @@ class Settings(BaseSettings):
     unstructured_strategy: str = os.getenv("UNSTRUCTURED_STRATEGY", "fast")  # "fast", "hi_res", "ocr_only", "auto"
     unstructured_model_name: str = "yolox"  # para detecção de tabelas
     extract_images: bool = os.getenv("EXTRACT_IMAGES", "true").lower() == "true"
-    extract_tables: bool = True
+    extract_tables: bool = os.getenv("EXTRACT_TABLES", "true").lower() == "true"
+    table_strategies: str = os.getenv("TABLE_STRATEGIES", "hi_res")  # estratégias com estágio de tabelas, separadas por vírgula
+
+    # Motor de extração (ver extract.engine)
+    extraction_strategy: str = os.getenv("EXTRACTION_STRATEGY", os.getenv("UNSTRUCTURED_STRATEGY", "fast"))  # "fast", "hi_res", "hybrid"
+    extraction_executor: str = os.getenv("EXTRACTION_EXECUTOR", "processes")  # "inline", "threads", "processes", "warm_pool"
 
     # Processamento
     parallel_execution: bool = True
@@ -36,7 +41,41 @@ class Settings(BaseSettings):
     # OCR Configuration
     ocr_workers: int = int(os.getenv("OCR_WORKERS", "4"))
     ocr_cache_dir: Path = Path("./runtime/ocr_cache")
+    ocr_cache_backend: str = os.getenv("OCR_CACHE_BACKEND", "sqlite")  # "sqlite" ou "json"
+    ocr_cache_max_mb: int = int(os.getenv("OCR_CACHE_MAX_MB", "2048"))  # 0 = sem limite
+    ocr_memory_cache_mb: int = int(os.getenv("OCR_MEMORY_CACHE_MB", "256"))  # cache em memória por processo
     ocr_config_version: str = os.getenv("OCR_CONFIG_VERSION", "v1.0")
+    ocr_batch_size: int = int(os.getenv("OCR_BATCH_SIZE", "1"))  # páginas por chamada de OCR (1 = uma por página)
+    ocr_worker_max_pages: int = int(os.getenv("OCR_WORKER_MAX_PAGES", "50"))  # recicla worker após N páginas
+    ocr_worker_max_rss_mb: int = int(os.getenv("OCR_WORKER_MAX_RSS_MB", "4096"))  # 0 = sem limite
+    ocr_worker_mem_mb: int = int(os.getenv("OCR_WORKER_MEM_MB", "1500"))  # estimativa por worker, limita OCR_WORKERS
+    task_budget_scale: float = float(os.getenv("TASK_BUDGET_SCALE", "1.0"))  # multiplica o tempo limite por página
+    normalize_workers: int = int(os.getenv("NORMALIZE_WORKERS", "4"))  # processos da normalização (1 = no próprio processo)
+
+    # Tabelas: estágio separado, só nas regiões de legenda/quadro de cada folha
+    table_cache_dir: Path = Path("./runtime/table_cache")
+
+    # Serviço de extração (pool de workers aquecido, acessado via IPC local)
+    ocr_service_enabled: bool = os.getenv("OCR_SERVICE_ENABLED", "false").lower() == "true"
+    ocr_service_host: str = os.getenv("OCR_SERVICE_HOST", "127.0.0.1")
+    ocr_service_port: int = int(os.getenv("OCR_SERVICE_PORT", "6011"))
+    ocr_service_authkey: str = os.getenv("OCR_SERVICE_AUTHKEY", "")  # vazio = chave aleatória em ocr_service_key_file
+    ocr_service_key_file: Path = Path(os.getenv("OCR_SERVICE_KEY_FILE", "./runtime/ocr_service.key"))
+    ocr_service_root: Path = Path(os.getenv("OCR_SERVICE_ROOT", "."))  # PDFs e saídas do serviço ficam abaixo deste diretório
+    ocr_service_health_timeout: float = 30.0
+
+    # Cache de páginas rasterizadas (compartilhado por OCR, carimbo e figuras)
+    raster_cache_dir: Path = Path("./runtime/raster_cache")
+    raster_cache_max_mb: int = int(os.getenv("RASTER_CACHE_MAX_MB", "4096"))  # 0 = sem limite
+    ocr_dpi: int = int(os.getenv("OCR_DPI", "200"))
+
+    # Carimbo (selo) - OCR apenas da região do selo
+    carimbo_region: str = os.getenv("CARIMBO_REGION", "0.75,0.7,1.0,1.0")  # x0,y0,x1,y1 (frações, origem no topo esquerdo)
+    carimbo_dpi: int = int(os.getenv("CARIMBO_DPI", "200"))
+    full_sheet_ocr: bool = os.getenv("FULL_SHEET_OCR", "true").lower() == "true"  # false = só o selo em páginas escaneadas
+
+    # Normalização: linhas distintas guardadas no memo da análise por linha
+    line_memo_size: int = int(os.getenv("LINE_MEMO_SIZE", "50000"))  # 0 = sem memo
 
     # Caminhos
     runtime_dir: Path = Path("./runtime")
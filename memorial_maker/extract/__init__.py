@@ -9,7 +9,9 @@ from memorial_maker.extract.unstructured_extract import (
 from memorial_maker.extract.optimized_extract import (
     extract_pdf_hybrid,
     extract_all_pdfs_optimized,
+    iter_extract_pdfs_optimized,
 )
+from memorial_maker.extract.engine import ExtractionEngine, ExtractionFailed
 
 __all__ = [
     "extract_pdf_unstructured",
@@ -18,6 +20,9 @@ __all__ = [
     "extract_tables_structured",
     "extract_pdf_hybrid",
     "extract_all_pdfs_optimized",
+    "iter_extract_pdfs_optimized",
+    "ExtractionEngine",
+    "ExtractionFailed",
 ]
 
 
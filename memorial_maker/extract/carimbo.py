@@ -0,0 +1,199 @@
+"""Carimbo (title block) parser and cross-sheet consensus.
+
+The title block is a short run of "LABEL:" lines, each followed by its value on
+the same line or on the next ones::
+
+    PROJETO:
+    PROJETO DE INSTALAÇÕES DE TELECOMUNICAÇÃO
+    CONSTRUTOR:
+    MGA CONSTRUÇÕES E INCORPORAÇÕES LTDA
+
+Some exports set all labels on one line ("PROJETO: CONSTRUTOR: EDIFÍCIO:
+LOCAL:") and the values below them, in the same order. ``parse_carimbo``
+reads both layouts in a single pass over the lines: each label queues its
+field, and the next lines that pass the field's check fill the queue in order.
+All patterns are compiled once, at import.
+
+Only the title-block text should be parsed: the region text of a page (see
+``carimbo_roi.region_text``) or, for pages without layout, the tail of the page
+text, where CAD exports draw the title block last.
+
+Every sheet of a project repeats the same title block, so ``carimbo_consensus``
+votes each field across sheets; a misread on one sheet is outvoted by the
+others, and the share of sheets that agree is reported as the confidence.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Any, Iterable, Optional
+
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("extract.carimbo")
+
+# Characters of page text (from the end) that hold the title block
+TAIL_CHARS = 4000
+# Lines a queued field waits for a value that passes its check
+VALUE_LOOKAHEAD = 4
+
+FIELD_LABELS = {
+    "projeto": r"PROJETO",
+    "construtora": r"CONSTRUTORA?",
+    "empreendimento": r"EDIF[ÍI]CIO|EMPREENDIMENTO|OBRA",
+    "endereco": r"LOCAL|ENDERE[ÇC]O",
+    "data": r"DATA",
+    "escala": r"ESCALA",
+    "revisao": r"REVIS[ÃA]O|REV\.",
+    "autor": r"PROJETADO\s+POR|AUTOR|RESPONS[ÁA]VEL\s+T[ÉE]CNICO",
+}
+
+LABEL_RE = re.compile(
+    r"(?:^|(?<=\s))(?:" + "|".join(f"(?P<{field}>{label})" for field, label in FIELD_LABELS.items()) + r")\s*:",
+    re.IGNORECASE,
+)
+# Any short "Label :" line (e.g. "Desenho :", "PROJETO Nº:") is never a value
+OTHER_LABEL_RE = re.compile(r"^[^\d:]{1,30}:$")
+DATE_RE = re.compile(r"\b(\d{2}[/\-]\d{2}[/\-]\d{4})\b")
+SCALE_RE = re.compile(r"^(?:\d+\s*[:/]\s*\d+|INDICADAS?|SEM\s+ESCALA|S/\s*ESC\.?)$", re.IGNORECASE)
+ADDRESS_RE = re.compile(
+    r"((?:AVENIDA|AV\.|RUA|R\.|TRAVESSA|TRAV\.|ALAMEDA|AL\.|RODOVIA)[^,\n]{2,100}"
+    r"(?:,[^,\n]{1,60}){1,4})",
+    re.IGNORECASE,
+)
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _is_value(field: str, line: str) -> bool:
+    """Whether a line can be the value of a field."""
+    if field == "data":
+        return DATE_RE.search(line) is not None
+    if field == "escala":
+        return SCALE_RE.match(line) is not None
+    if field == "endereco":
+        return len(line) > 8
+    return len(line) > 1
+
+
+def _clean(field: str, value: str) -> str:
+    if field == "data":
+        return DATE_RE.search(value).group(1)
+    return WHITESPACE_RE.sub(" ", value).strip()
+
+
+def parse_carimbo(text: str) -> Dict[str, str]:
+    """Parse the fields of one title block.
+
+    Args:
+        text: Title-block text, one label or value per line
+
+    Returns:
+        Dict with the fields found (projeto, construtora, empreendimento,
+        endereco, data, escala, revisao, autor)
+    """
+    carimbo: Dict[str, str] = {}
+    queue: List[List[Any]] = []  # [field, lines left]
+    first_date = None
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if first_date is None:
+            date = DATE_RE.search(line)
+            first_date = date.group(1) if date else None
+
+        labels = list(LABEL_RE.finditer(line)) if ":" in line else []
+        if labels:
+            for i, match in enumerate(labels):
+                field = match.lastgroup
+                end = labels[i + 1].start() if i + 1 < len(labels) else len(line)
+                value = line[match.end():end].strip()
+                if field in carimbo:
+                    continue
+                if value and _is_value(field, value):
+                    carimbo[field] = _clean(field, value)
+                elif not value and all(q[0] != field for q in queue):
+                    queue.append([field, VALUE_LOOKAHEAD])
+            continue
+        if OTHER_LABEL_RE.match(line):
+            continue
+
+        # Values fill the queued fields in label order; a field whose check
+        # fails keeps waiting a few lines (e.g. "Escala:" followed by a name)
+        rejected = []
+        for entry in queue:
+            if _is_value(entry[0], line):
+                carimbo[entry[0]] = _clean(entry[0], line)
+                queue.remove(entry)
+                break
+            rejected.append(entry)
+        for entry in rejected:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                queue.remove(entry)
+
+    if "data" not in carimbo and first_date:
+        carimbo["data"] = first_date
+    if "endereco" not in carimbo:
+        match = ADDRESS_RE.search(text)
+        if match:
+            carimbo["endereco"] = _clean("endereco", match.group(1))
+    return carimbo
+
+
+def parse_page_text(text: str) -> Dict[str, str]:
+    """Parse the carimbo from the text of a page without layout.
+
+    Only the tail of the text is read; the whole text is read when the tail has
+    no title-block label.
+    """
+    tail = text[-TAIL_CHARS:]
+    if len(tail) < len(text) and LABEL_RE.search(tail) is None:
+        tail = text
+    return parse_carimbo(tail)
+
+
+def normalize_value(value: str) -> str:
+    """Comparison key of a field value (case, spacing and edge punctuation ignored)."""
+    return WHITESPACE_RE.sub(" ", value).strip(" .,;:-").upper()
+
+
+def carimbo_consensus(carimbos: Iterable[Optional[Dict[str, str]]]) -> Dict[str, Dict[str, Any]]:
+    """Vote every carimbo field across sheets.
+
+    Args:
+        carimbos: Carimbo of each sheet (empty or None for sheets where nothing was read)
+
+    Returns:
+        Dict mapping field to {"value", "confidence", "votes", "sheets"}; confidence
+        is the share of sheets with a carimbo that agree on the value
+    """
+    read = [c for c in carimbos if c]
+    votes: Dict[str, Counter] = {}
+    spellings: Dict[str, Dict[str, Counter]] = {}
+    for carimbo in read:
+        for field, value in carimbo.items():
+            if not value:
+                continue
+            key = normalize_value(value)
+            votes.setdefault(field, Counter())[key] += 1
+            spellings.setdefault(field, {}).setdefault(key, Counter())[value] += 1
+
+    consensus = {}
+    for field, counter in votes.items():
+        # Ties go to the longer (more complete) reading
+        key, count = max(counter.items(), key=lambda item: (item[1], len(item[0])))
+        consensus[field] = {
+            "value": spellings[field][key].most_common(1)[0][0],
+            "confidence": round(count / len(read), 2),
+            "votes": count,
+            "sheets": len(read),
+        }
+        if len(counter) > 1:
+            logger.debug(f"Carimbo field {field}: {len(counter)} readings, {count}/{len(read)} agree")
+    return consensus
+
+
+def consensus_values(consensus: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Plain field values of a consensus (see carimbo_consensus)."""
+    return {field: entry["value"] for field, entry in consensus.items()}
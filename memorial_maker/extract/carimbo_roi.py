@@ -0,0 +1,220 @@
+"""Title-block (carimbo) fast path.
+
+Project metadata only lives in the title block in the lower-right corner of
+each sheet, so there is no need to OCR a whole A0/A1 plan to read it. This
+module crops the page to the configured region (``settings.carimbo_region``)
+and either reads the text layer inside it (a region query on the page's spatial
+index) or rasterises just that crop at ``settings.carimbo_dpi`` and runs
+Tesseract on it. The resulting text goes to the title-block parser
+(``extract.carimbo``).
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+    PdfReader = None
+    PdfWriter = None
+
+try:
+    # Bundled with unstructured[pdf]; plain pytesseract works the same way
+    import unstructured_pytesseract as pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    try:
+        import pytesseract
+        TESSERACT_AVAILABLE = True
+    except ImportError:
+        TESSERACT_AVAILABLE = False
+        pytesseract = None
+
+from memorial_maker.config import settings
+from memorial_maker.extract.carimbo import carimbo_consensus, consensus_values, parse_carimbo, parse_page_text
+from memorial_maker.extract.native_text import PDFMINER_AVAILABLE, elements_text, extract_native_elements
+from memorial_maker.extract.page_manifest import classify_page
+from memorial_maker.extract.spatial_index import PageSpatialIndex, group_elements_by_page
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.ocr_cache import file_digest as compute_file_digest
+from memorial_maker.utils.ocr_cache import get_cache_key, load_from_cache, save_to_cache
+from memorial_maker.utils.pdf_crop import Region, crop_page_pdf, region_box
+
+logger = get_logger("extract.carimbo_roi")
+
+
+def parse_region(spec: str) -> Region:
+    """Parse a region spec "x0,y0,x1,y1" given as fractions of the sheet.
+
+    Args:
+        spec: Region as seen on the rendered sheet (origin at the top-left)
+
+    Returns:
+        Tuple (x0, y0, x1, y1)
+    """
+    values = tuple(float(v) for v in spec.split(","))
+    if len(values) != 4:
+        raise ValueError(f"Região do carimbo inválida: {spec!r} (esperado x0,y0,x1,y1)")
+
+    x0, y0, x1, y1 = values
+    if not (0.0 <= x0 < x1 <= 1.0 and 0.0 <= y0 < y1 <= 1.0):
+        raise ValueError(f"Região do carimbo fora da folha: {spec!r}")
+    return values
+
+
+def region_text(index: PageSpatialIndex, region: Region) -> str:
+    """Text of a page's spatial index inside a region, in reading order."""
+    return index.text_in(index.region_box(region))
+
+
+def page_carimbos(
+    elements: List[Dict[str, Any]],
+    indexes: Dict[int, PageSpatialIndex],
+    one_indexed: bool = False,
+) -> List[Dict[str, Any]]:
+    """Carimbo of every page of an extraction result.
+
+    Pages with coordinates are read from their title-block region; pages without
+    layout (OCR) from the tail of their text.
+
+    Args:
+        elements: Text element records of the result
+        indexes: Spatial index of each page with coordinates (see build_page_indexes)
+        one_indexed: Page numbers in the element metadata start at 1
+
+    Returns:
+        List of {"page_number", "carimbo"} (0-indexed), pages where nothing was found left out
+    """
+    region = parse_region(settings.carimbo_region)
+    carimbos = []
+    for page_number, page_elements in sorted(group_elements_by_page(elements, one_indexed).items()):
+        if page_number in indexes:
+            carimbo = parse_carimbo(region_text(indexes[page_number], region))
+        else:
+            carimbo = parse_page_text(elements_text(page_elements))
+        if carimbo:
+            carimbos.append({"page_number": page_number, "carimbo": carimbo})
+    return carimbos
+
+
+def carimbo_of_pages(carimbos: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Carimbo of a file, each field voted across its pages (see page_carimbos)."""
+    return consensus_values(carimbo_consensus(c["carimbo"] for c in carimbos))
+
+
+def extract_region_text_native(page: Any, box: Tuple[float, float, float, float]) -> str:
+    """Read the text layer inside a box, in reading order (top to bottom, left to right).
+
+    Walks every text operator of the page with pypdf; only used when pdfminer
+    (and so the spatial index) is not available.
+    """
+    left, bottom, right, top = box
+    fragments = []
+
+    def visit(text, cm, tm, font_dict, font_size):
+        if not text.strip():
+            return
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        if left <= x <= right and bottom <= y <= top:
+            fragments.append((-round(y), x, text.strip()))
+
+    page.extract_text(visitor_text=visit)
+    fragments.sort()
+    return "\n".join(text for _, _, text in fragments)
+
+
+def ocr_region(
+    pdf_path: Path,
+    page_number: int,
+    region: Region,
+    dpi: int,
+    file_digest: Optional[str] = None,
+    content_digest: Optional[str] = None,
+) -> str:
+    """Rasterise only the region of a page (through the raster cache) and OCR it."""
+    from memorial_maker.utils.raster_cache import RASTER_AVAILABLE, Image, get_page_raster
+
+    if not RASTER_AVAILABLE or not TESSERACT_AVAILABLE:
+        raise ImportError("OCR do carimbo requer pdf2image e pytesseract. Execute: pip install unstructured[pdf]")
+
+    raster = get_page_raster(pdf_path, page_number, dpi, region, file_digest, content_digest)
+    return pytesseract.image_to_string(Image.fromarray(raster), lang="por")
+
+
+def extract_carimbo_roi(
+    pdf_path: Path,
+    page: Optional[Dict[str, Any]] = None,
+    page_number: int = 0,
+    region: Optional[Region] = None,
+    dpi: Optional[int] = None,
+    file_digest: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Extract the carimbo of one page from its title-block region only.
+
+    Args:
+        pdf_path: Path to PDF file
+        page: Page manifest entry (decides between text layer and OCR)
+        page_number: Page number (0-indexed), used when no manifest entry is given
+        region: Region fractions (default: settings.carimbo_region)
+        dpi: Rasterisation DPI for the OCR path (default: settings.carimbo_dpi)
+        file_digest: Digest of the PDF, for the cache key when there is no page digest
+
+    Returns:
+        Dict with carimbo fields, region text, method ("native"/"ocr"), time and cache flag
+    """
+    if not PYPDF_AVAILABLE:
+        raise ImportError("pypdf não está instalado. Execute: pip install unstructured[pdf]")
+
+    region = region or parse_region(settings.carimbo_region)
+    dpi = dpi or settings.carimbo_dpi
+    if page is not None:
+        page_number = page["page_number"]
+
+    start_time = time.time()
+    from_cache = False
+
+    if page is not None and classify_page(page)["strategy"] == "native":
+        method = "native"
+        if PDFMINER_AVAILABLE:
+            elements = extract_native_elements(pdf_path, [page_number]).get(page_number, [])
+            text = region_text(PageSpatialIndex(elements), region)
+        else:
+            pdf_page = PdfReader(str(pdf_path)).pages[page_number]
+            text = extract_region_text_native(pdf_page, region_box(pdf_page, region))
+    else:
+        method = "ocr"
+        if page is None and file_digest is None:
+            file_digest = compute_file_digest(pdf_path)
+        # Region and DPI are part of the key: a different crop is a different result
+        cache_key = get_cache_key(
+            file_digest,
+            page_number,
+            f"{settings.ocr_config_version}:carimbo:{','.join(map(str, region))}@{dpi}",
+            page.get("content_digest") if page else None,
+        )
+        cached = load_from_cache(cache_key)
+        if cached:
+            text = cached["text"]
+            from_cache = True
+        else:
+            text = ocr_region(
+                pdf_path, page_number, region, dpi,
+                file_digest, page.get("content_digest") if page else None,
+            )
+            save_to_cache(cache_key, {"text": text, "page_number": page_number})
+
+    elapsed = time.time() - start_time
+    logger.debug(f"Carimbo ROI ({method}) of {pdf_path.name} page {page_number}: {elapsed:.2f}s")
+
+    return {
+        "carimbo": parse_carimbo(text),
+        "text": text,
+        "page_number": page_number,
+        "method": method,
+        "time": elapsed,
+        "from_cache": from_cache,
+    }
@@ -0,0 +1,508 @@
+"""Extraction engine: one entry point for every extraction strategy and executor.
+
+Strategies:
+
+- ``fast``: Unstructured's fast partitioner on the text layer, one task per file
+  (``hi_res``, ``ocr_only`` and ``auto`` run the same way with that partition
+  strategy);
+- ``hybrid``: page manifest, text-first extraction with per-page OCR fallback,
+  one task per page (see ``extract.scheduler``).
+
+Executors:
+
+- ``inline``: runs every task in the calling thread (debugging, small batches);
+- ``threads``: thread pool;
+- ``processes``: supervised spawn-context process pool owned by the engine run;
+- ``warm_pool``: the process-wide warm pool with preloaded models, or the
+  extraction service when one is running (hybrid strategy).
+
+All combinations stream the same page/file events, reuse unchanged files and
+pages through the extraction manifest and write the same consolidated output.
+With ``settings.extract_tables`` the table stage (``extract.tables``) runs for
+the strategies in ``settings.table_strategies`` (``hi_res`` by default) on the
+same executor, only on the table regions of each sheet; the per-file JSONs are
+then written after the tables are merged.
+"""
+
+import json
+import multiprocessing
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator
+
+from memorial_maker.config import settings
+from memorial_maker.extract import events
+from memorial_maker.extract.incremental import ExtractionManifest, page_digests, pipeline_signature
+from memorial_maker.extract.optimized_extract import save_hybrid_json
+from memorial_maker.extract.page_manifest import build_page_manifest
+from memorial_maker.extract.scheduler import collect_results, error_result, iter_scheduled_extraction
+from memorial_maker.extract.supervisor import SupervisedPool
+from memorial_maker.extract.tables import UNSTRUCTURED_AVAILABLE as TABLES_AVAILABLE, iter_with_tables, table_strategies
+from memorial_maker.extract.unstructured_extract import extract_pdf_unstructured, save_unstructured_json
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.memory import recommended_workers
+from memorial_maker.utils.ocr_cache import file_digest
+
+logger = get_logger("extract.engine")
+
+FILE_STRATEGIES = ("fast", "hi_res", "ocr_only", "auto")
+STRATEGIES = FILE_STRATEGIES + ("hybrid",)
+EXECUTORS = ("inline", "threads", "processes", "warm_pool")
+
+
+class ExtractionFailed(RuntimeError):
+    """No file of a batch could be extracted (the error of each is in its result)."""
+
+
+class InlineExecutor(Executor):
+    """Executor que roda cada tarefa imediatamente na thread chamadora."""
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def plan_file(pdf_path: Path, incremental: Optional[ExtractionManifest] = None) -> Dict[str, Any]:
+    """Decide what has to be extracted from a PDF for a file-level strategy.
+
+    Args:
+        pdf_path: Path to PDF file
+        incremental: Manifest of the previous run
+
+    Returns:
+        Dict with file_digest and page digests, plus either the reused
+        "result" or the "page_numbers" to extract (None = every page) and the
+        "previous_result" the other pages come from
+    """
+    plan = {"file_digest": file_digest(pdf_path), "digests": {}}
+
+    if incremental is not None:
+        result = incremental.unchanged_result(pdf_path, plan["file_digest"])
+        if result is not None:
+            plan["digests"] = {int(n): d for n, d in incremental.files[pdf_path.name]["pages"].items()}
+            plan["result"] = result
+            return plan
+
+    try:
+        plan["digests"] = page_digests(build_page_manifest(pdf_path))
+    except Exception as e:
+        logger.warning(f"Could not read page digests of {pdf_path.name}: {e}")
+
+    previous = incremental.previous_result(pdf_path.name) if incremental else None
+    unchanged = incremental.unchanged_pages(pdf_path.name, plan["digests"]) if previous else set()
+    if not unchanged:
+        plan["page_numbers"] = None
+        return plan
+
+    incremental.reused_pages += len(unchanged)
+    page_numbers = sorted(set(plan["digests"]) - unchanged)
+    logger.info(f"{pdf_path.name}: reusing {len(unchanged)} unchanged pages, extracting {len(page_numbers)}")
+    print(f"♻️ {pdf_path.name}: {len(page_numbers)} de {len(plan['digests'])} páginas alteradas")
+
+    if not page_numbers:
+        # Only the file changed (e.g. its metadata), every page is the same
+        plan["result"] = previous
+    else:
+        plan["page_numbers"] = page_numbers
+        plan["previous_result"] = previous
+    return plan
+
+
+def run_file_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract one PDF (or some of its pages) with Unstructured inside a worker."""
+    pdf_path = Path(task["pdf_path"])
+    details = {"task_kind": task["strategy"], "filename": pdf_path.name, "page_numbers": task["page_numbers"] or []}
+
+    events.emit(events.TASK_STARTED, **details)
+    start_time = time.time()
+    try:
+        result = extract_pdf_unstructured(
+            pdf_path,
+            Path(task["output_dir"]),
+            task["page_numbers"],
+            task["previous_result"],
+            strategy=task["strategy"],
+            save_json=task.get("save_json", True),
+            infer_tables=task.get("infer_tables"),
+        )
+    except Exception as e:
+        events.emit(events.TASK_FAILED, error=str(e), **details)
+        raise
+
+    events.emit(events.TASK_FINISHED, elapsed=time.time() - start_time, **details)
+    return result
+
+
+def iter_file_extraction(
+    pdf_files: List[Path],
+    output_dir: Path,
+    executor: Executor,
+    strategy: str,
+    incremental: Optional[ExtractionManifest] = None,
+    save_json: bool = True,
+    infer_tables: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Extract a batch of PDFs one task per file, yielding file events as they complete.
+
+    Events have the format of scheduler.iter_scheduled_extraction "file" events.
+
+    Args:
+        pdf_files: PDFs to extract
+        output_dir: Directory for output files
+        executor: Worker pool that runs the file tasks
+        strategy: Unstructured partition strategy
+        incremental: Manifest of the previous run (updated as files complete)
+        save_json: Save each file JSON in the worker (see extract_pdf_unstructured)
+        infer_tables: Whole-sheet table detection (see extract_pdf_unstructured)
+
+    Yields:
+        File event dicts
+    """
+    total_files = len(pdf_files)
+    progress = {"files": 0}
+
+    def file_event(pdf_path: Path, result: Dict[str, Any], reused: bool = False) -> Dict[str, Any]:
+        progress["files"] += 1
+        event = {
+            "event": "file",
+            "pdf_path": str(pdf_path),
+            "filename": pdf_path.name,
+            "result": result,
+            "completed_files": progress["files"],
+            "total_files": total_files,
+        }
+        if reused:
+            event["reused"] = True
+        return event
+
+    pending: Dict[Future, Dict[str, Any]] = {}
+    for pdf_path in pdf_files:
+        try:
+            plan = plan_file(pdf_path, incremental)
+        except Exception as e:
+            logger.error(f"Failed to read {pdf_path.name}: {e}")
+            yield file_event(pdf_path, error_result(pdf_path, str(e)))
+            continue
+
+        if "result" in plan:
+            print(f"♻️ Sem alterações: {pdf_path.name}")
+            if incremental is not None:
+                incremental.update(pdf_path.name, plan["file_digest"], plan["digests"])
+            yield file_event(pdf_path, plan["result"], reused=True)
+            continue
+
+        task = {
+            "pdf_path": str(pdf_path),
+            "output_dir": str(output_dir),
+            "strategy": strategy,
+            "page_numbers": plan["page_numbers"],
+            "previous_result": plan.get("previous_result"),
+            "save_json": save_json,
+            "infer_tables": infer_tables,
+        }
+        pending[executor.submit(run_file_task, task)] = {"pdf_path": pdf_path, **plan}
+
+    for future in as_completed(pending):
+        plan = pending[future]
+        pdf_path = plan["pdf_path"]
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Failed to extract {pdf_path.name}: {e}")
+            print(f"❌ Erro ao extrair {pdf_path.name}: {e}")
+            yield file_event(pdf_path, error_result(pdf_path, str(e)))
+            continue
+
+        if incremental is not None:
+            incremental.update(pdf_path.name, plan["file_digest"], plan["digests"])
+        print(f"✅ Concluído: {pdf_path.name} ({progress['files'] + 1}/{total_files})")
+        yield file_event(pdf_path, result)
+
+
+def consolidated_name(strategy: str) -> str:
+    """File name of the consolidated output of a strategy."""
+    return "all_extractions_optimized.json" if strategy == "hybrid" else "all_extractions.json"
+
+
+def iter_saving_results(
+    stream: Iterable[Dict[str, Any]],
+    output_dir: Path,
+    strategy: str,
+) -> Iterator[Dict[str, Any]]:
+    """Write the per-file JSON of each extracted file as its event passes through.
+
+    Used when the results are completed after extraction (table stage), so the
+    per-file output matches the consolidated one. Reused files already have
+    their JSON and failed files have none.
+    """
+    save = save_hybrid_json if strategy == "hybrid" else save_unstructured_json
+    for event in stream:
+        result = event.get("result") or {}
+        if event["event"] == "file" and not event.get("reused") and not result.get("error"):
+            save(result, output_dir, Path(event["pdf_path"]))
+        yield event
+
+
+def print_summary(results: List[Dict[str, Any]], elapsed: float, reused: Dict[str, int]) -> None:
+    """Log and print (for Streamlit) the aggregate metrics of an extraction run."""
+    metrics = [r.get("metrics", {}) for r in results]
+    total_pages = sum(m.get("total_pages", 0) for m in metrics)
+    total_text_pages = sum(m.get("text_extracted_pages", 0) for m in metrics)
+    total_ocr_pages = sum(m.get("ocr_pages", 0) for m in metrics)
+    total_cache_hits = sum(m.get("cache_hits", 0) for m in metrics)
+    total_roi_pages = sum(m.get("carimbo_roi_pages", 0) for m in metrics)
+    total_memory_hits = sum(m.get("memory_cache_hits", 0) for m in metrics)
+    total_ocr_time = sum(m.get("total_ocr_time", 0.0) for m in metrics)
+    peak_rss_values = [m["peak_rss_mb"] for m in metrics if m.get("peak_rss_mb")]
+    failed_files = sum(1 for r in results if r.get("error"))
+
+    logger.info(
+        f"Total extraction ({elapsed:.2f}s): {len(results)} files, {total_pages} pages "
+        f"({total_text_pages} native, {total_ocr_pages} OCR), "
+        f"{(total_cache_hits/total_ocr_pages*100) if total_ocr_pages > 0 else 0:.1f}% cache hits, "
+        f"{total_ocr_time:.2f}s accumulated OCR time"
+    )
+
+    print(f"\n📊 Extração concluída em {elapsed:.2f}s:")
+    print(f"   • {len(results) - failed_files} arquivos extraídos")
+    if failed_files:
+        print(f"   • {failed_files} arquivos com erro")
+    if total_pages:
+        print(f"   • {total_pages} páginas processadas")
+        print(f"   • {total_text_pages} páginas com texto nativo")
+        print(f"   • {total_ocr_pages} páginas com OCR")
+    if total_roi_pages > 0:
+        print(f"   • {total_roi_pages} páginas com OCR só do carimbo")
+    if total_ocr_pages > 0:
+        print(
+            f"   • {(total_cache_hits/total_ocr_pages*100):.1f}% cache hits "
+            f"({total_memory_hits} memória, {total_cache_hits - total_memory_hits} disco)"
+        )
+        print(f"   • {total_ocr_time:.2f}s tempo total de OCR")
+    if peak_rss_values:
+        print(f"   • {max(peak_rss_values):.0f} MB de pico de memória por worker")
+    if reused["files"] or reused["pages"]:
+        print(f"   • {reused['files']} arquivos e {reused['pages']} páginas sem alteração reaproveitados")
+
+
+class ExtractionEngine:
+    """Motor de extração com estratégia e executor selecionáveis."""
+
+    def __init__(
+        self,
+        strategy: Optional[str] = None,
+        executor: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ):
+        """Inicializa motor.
+
+        Args:
+            strategy: "fast", "hi_res" ou "hybrid" (padrão: settings.extraction_strategy)
+            executor: "inline", "threads", "processes" ou "warm_pool"
+                (padrão: settings.extraction_executor)
+            max_workers: Número de workers (padrão: settings.ocr_workers)
+        """
+        self.strategy = strategy or settings.extraction_strategy
+        self.executor = executor or settings.extraction_executor
+        self.max_workers = max_workers or settings.ocr_workers
+
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Estratégia de extração inválida: {self.strategy!r} (opções: {', '.join(STRATEGIES)})")
+        if self.executor not in EXECUTORS:
+            raise ValueError(f"Executor de extração inválido: {self.executor!r} (opções: {', '.join(EXECUTORS)})")
+
+    def _create_executor(self, dispatcher: Optional[events.EventDispatcher]) -> Executor:
+        """Create the executor of one run (the warm pool is shared, not created)."""
+        if self.executor == "inline":
+            return InlineExecutor()
+        if self.executor == "threads":
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extract")
+        if self.executor == "processes":
+            return SupervisedPool(
+                recommended_workers(self.max_workers),
+                multiprocessing.get_context("spawn"),
+                max_tasks_per_worker=settings.ocr_worker_max_pages,
+                max_rss_mb=settings.ocr_worker_max_rss_mb,
+                on_event=dispatcher.dispatch if dispatcher else None,
+            )
+        from memorial_maker.extract.worker_service import get_warm_pool
+        return get_warm_pool()
+
+    def _iter_tasks(
+        self,
+        pdf_files: List[Path],
+        output_dir: Path,
+        executor: Executor,
+        incremental: Optional[ExtractionManifest],
+        table_stage: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        # With the table stage the per-file JSON is written after the tables
+        # are merged, and the partitioner does not look for tables itself
+        save_json = not table_stage
+        if self.strategy == "hybrid":
+            return iter_scheduled_extraction(pdf_files, output_dir, executor, incremental, save_json)
+        return iter_file_extraction(
+            pdf_files, output_dir, executor, self.strategy, incremental, save_json,
+            infer_tables=False if table_stage else None,
+        )
+
+    def _runs_tables(self) -> bool:
+        """Whether the table stage runs for this engine's strategy."""
+        if not settings.extract_tables or self.strategy not in table_strategies():
+            return False
+        if not TABLES_AVAILABLE:
+            logger.warning("Unstructured not installed, skipping table extraction")
+            return False
+        return True
+
+    def iter_extract(
+        self,
+        pdf_files: List[Path],
+        output_dir: Path,
+        event_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        incremental: Optional[ExtractionManifest] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Extract PDFs yielding page and file events as they complete.
+
+        See scheduler.iter_scheduled_extraction for the event format; file-level
+        strategies only yield file events.
+
+        Args:
+            pdf_files: PDFs to extract
+            output_dir: Directory for output files
+            event_callback: Optional listener for worker events (see extract.events)
+            incremental: Manifest of the previous run (unchanged files and pages are reused)
+
+        Yields:
+            Page and file event dicts
+        """
+        if self.executor == "warm_pool" and self.strategy == "hybrid" and settings.ocr_service_enabled:
+            # Prefer the long-lived extraction service when one is running
+            from memorial_maker.extract.worker_service import ExtractionServiceClient
+            client = ExtractionServiceClient()
+            if client.ping() is not None:
+                logger.info("Submitting batch to extraction service")
+                print("⚙️ Enviando PDFs para o serviço de extração (workers aquecidos)")
+                yield from client.iter_extract(
+                    pdf_files, output_dir, incremental.consolidated_json if incremental else None
+                )
+                return
+            logger.warning("Extraction service not reachable, using in-process warm pool")
+
+        # Worker events of an engine-owned process pool need their own dispatcher
+        dispatcher = events.EventDispatcher() if self.executor == "processes" else None
+
+        executor = self._create_executor(dispatcher)
+        channel = executor.events if self.executor == "warm_pool" else dispatcher
+        workers = getattr(executor, "max_workers", None) or getattr(executor, "_max_workers", 1)
+        logger.info(f"Extracting {len(pdf_files)} PDFs: strategy={self.strategy}, executor={self.executor} ({workers} workers)")
+        print(f"⚙️ Extração {self.strategy} com executor {self.executor} ({workers} workers)")
+
+        if event_callback and channel is not None:
+            channel.add_listener(event_callback)
+        try:
+            if self._runs_tables():
+                # Table regions run on the same workers as the text tasks; the
+                # per-file JSONs are written once the tables are merged
+                stream = self._iter_tasks(pdf_files, output_dir, executor, incremental, table_stage=True)
+                stream = iter_saving_results(iter_with_tables(stream, executor), output_dir, self.strategy)
+            else:
+                stream = self._iter_tasks(pdf_files, output_dir, executor, incremental)
+            yield from stream
+        except Exception as e:
+            if self.executor == "warm_pool":
+                from memorial_maker.extract.worker_service import report_warm_pool_error
+                report_warm_pool_error(e)
+            raise
+        finally:
+            if event_callback and channel is not None:
+                channel.remove_listener(event_callback)
+            if self.executor != "warm_pool":
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def extract(
+        self,
+        pdf_files: List[Path],
+        output_dir: Path,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Extract a batch of PDFs, save the consolidated output and the manifest.
+
+        Args:
+            pdf_files: PDFs to extract
+            output_dir: Directory for output files
+            progress_callback: Optional callback (current, total), called per page
+                for the hybrid strategy and per file otherwise
+
+        Returns:
+            List of extraction results, in the same order as pdf_files; a file that
+            failed has an "error" result (see scheduler.error_result)
+
+        Raises:
+            ExtractionFailed: Every file of the batch failed
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        pipeline = "optimized" if self.strategy == "hybrid" else "unstructured"
+
+        # Files and pages unchanged since the last run are merged back from its output
+        consolidated_json = output_dir / consolidated_name(self.strategy)
+        incremental = ExtractionManifest(consolidated_json, pipeline_signature(pipeline, self.strategy))
+        reused = {"files": 0, "pages": 0}
+
+        def count_reused(stream: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            for event in stream:
+                if event.get("reused"):
+                    reused["files"] += 1
+                elif event["event"] == "page" and event["page"].get("reused"):
+                    reused["pages"] += 1
+                yield event
+
+        start_time = time.time()
+        results = collect_results(
+            count_reused(self.iter_extract(pdf_files, output_dir, incremental=incremental)),
+            pdf_files,
+            progress_callback,
+            progress_unit="pages" if self.strategy == "hybrid" else "files",
+        )
+        if self.strategy != "hybrid":
+            reused["pages"] = incremental.reused_pages
+        print_summary(results, time.time() - start_time, reused)
+
+        failed = [result for result in results if result.get("error")]
+        if failed and len(failed) == len(results):
+            raise ExtractionFailed(
+                f"Nenhum dos {len(results)} PDFs foi extraído ({failed[0]['filename']}: {failed[0]['error']})"
+            )
+
+        with open(consolidated_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, separators=(",", ":"))
+
+        if self.strategy == "hybrid":
+            for result in results:
+                incremental.update_from_result(result)
+        incremental.save([pdf_path.name for pdf_path in pdf_files])
+
+        logger.info(f"Consolidated extraction saved: {consolidated_json}")
+        print(f"💾 Extração salva em: {consolidated_json}")
+        return results
+
+    def extract_dir(
+        self,
+        pdf_dir: Path,
+        output_dir: Path,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Extract every PDF of a directory (see extract)."""
+        pdf_files = sorted(pdf_dir.glob("*.pdf"))
+        logger.info(f"Found {len(pdf_files)} PDFs in {pdf_dir}")
+        print(f"🔍 Encontrados {len(pdf_files)} PDFs em {pdf_dir}")  # Direct print for Streamlit
+
+        if not pdf_files:
+            print("⚠️ Nenhum PDF encontrado!")
+            return []
+        return self.extract(pdf_files, output_dir, progress_callback)
@@ -0,0 +1,111 @@
+"""Structured event channel from extraction workers to the parent process.
+
+Each supervised worker sends its event records as ``("event", record)``
+messages on its own reply pipe (see ``extract.supervisor``), ahead of the
+task result. Nothing is shared between workers, so a worker killed in the
+middle of a send cannot leave a lock held for the others; the parent's
+dispatcher thread reads the pipes it already watches and hands each record
+to an :class:`EventDispatcher`, which logs it under
+``memorial_maker.extract.worker`` and fans it out to registered listeners,
+such as a UI progress callback.
+
+Record format::
+
+    {"kind": "task_started", "pid": 1234, "time": 1712345678.9,
+     "task_kind": "ocr", "filename": "planta.pdf", "page_numbers": [0]}
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("extract.worker")
+
+TASK_STARTED = "task_started"
+TASK_FINISHED = "task_finished"
+TASK_FAILED = "task_failed"
+WORKER_READY = "worker_ready"
+
+# Worker's pipe to the parent and the lock of its writes, set by worker_main
+_event_conn: Optional[Any] = None
+_event_lock: Optional[Any] = None
+
+
+def set_event_channel(conn: Optional[Any], lock: Optional[Any] = None) -> None:
+    """Install the event channel (the worker's reply pipe) in the current process.
+
+    Args:
+        conn: Connection to the parent, or None to disable events
+        lock: Lock shared with every other writer of conn in this process
+    """
+    global _event_conn, _event_lock
+    _event_conn = conn
+    _event_lock = lock or threading.Lock()
+
+
+def emit(kind: str, **fields: Any) -> None:
+    """Send an event record to the parent. No-op when no channel is installed."""
+    if _event_conn is None:
+        return
+    try:
+        with _event_lock:
+            _event_conn.send(("event", {"kind": kind, "pid": os.getpid(), "time": time.time(), **fields}))
+    except Exception:
+        pass  # Progress reporting must never break extraction
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    """Human-readable line for an event (console and Streamlit output)."""
+    kind = event.get("kind")
+    filename = event.get("filename", "")
+    pages = event.get("page_numbers") or []
+    where = f"{filename} página {pages[0] + 1}" if len(pages) == 1 else filename
+
+    if kind == TASK_STARTED:
+        labels = {"native": "Texto nativo", "ocr": "OCR", "carimbo_roi": "Carimbo", "table": "Tabelas"}
+        return f"🔄 {labels.get(event.get('task_kind'), event.get('task_kind'))}: {where}"
+    if kind == TASK_FINISHED:
+        return f"✔️ {where} ({event.get('elapsed', 0.0):.1f}s)"
+    if kind == TASK_FAILED:
+        return f"❌ {where}: {event.get('error')}"
+    if kind == WORKER_READY:
+        return f"🔥 Worker {event.get('pid')} pronto ({event.get('elapsed', 0.0):.1f}s)"
+    return str(event)
+
+
+class EventDispatcher:
+    """Distribui os eventos recebidos dos workers aos ouvintes registrados."""
+
+    def __init__(self):
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        """Log an event and hand it to every listener (called on the pool's dispatcher thread)."""
+        message = format_event(event)
+        if event.get("kind") == TASK_FAILED:
+            logger.warning(message)
+        else:
+            logger.debug(message)
+        if event.get("kind") in (TASK_STARTED, TASK_FAILED):
+            print(message)  # Direct print for Streamlit
+
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Error in event listener: {e}")
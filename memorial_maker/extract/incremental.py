@@ -0,0 +1,295 @@
+"""Incremental re-extraction.
+
+An extraction manifest saved next to the consolidated output
+(``all_extractions.json`` -> ``extraction_manifest.json``) records, for every
+PDF, its file digest, the content digest of each page and the settings that
+produced the result. On the next run a file whose digest did not change is
+taken from the previous output as is; for a revised file only the pages whose
+content digest changed (or that are new) are extracted again, and the other
+pages are merged back from the previous result.
+
+Manifest format::
+
+    {"version": 1, "signature": {...settings...},
+     "files": {"planta.pdf": {"file_digest": "...", "pages": {"0": "...", "1": null}}}}
+
+A ``null`` page digest marks a page that failed and must be extracted again.
+"""
+
+import io
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+    PdfReader = None
+    PdfWriter = None
+
+from memorial_maker.config import settings
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.ocr_cache import file_digest as compute_file_digest
+
+logger = get_logger("extract.incremental")
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(consolidated_json: Path) -> Path:
+    """Path of the extraction manifest kept next to a consolidated output file."""
+    return consolidated_json.with_name(
+        consolidated_json.name.replace("all_extractions", "extraction_manifest")
+    )
+
+
+def pipeline_signature(pipeline: str, strategy: Optional[str] = None) -> Dict[str, Any]:
+    """Settings that change the extraction output of a pipeline.
+
+    A previous result is only reused when it was produced with the same values.
+
+    Args:
+        pipeline: "unstructured" (file-level partitioning) or "optimized" (hybrid pipeline)
+        strategy: Unstructured partition strategy (default: settings.unstructured_strategy)
+    """
+    from memorial_maker.extract.tables import table_strategies
+
+    if pipeline == "unstructured":
+        return {
+            "pipeline": pipeline,
+            "strategy": strategy or settings.unstructured_strategy,
+            "extract_tables": settings.extract_tables,
+            "table_strategies": table_strategies(),
+            "extract_images": settings.extract_images,
+            "model_name": settings.unstructured_model_name,
+        }
+    return {
+        "pipeline": pipeline,
+        "extract_tables": settings.extract_tables,
+        "table_strategies": table_strategies(),
+        "model_name": settings.unstructured_model_name,
+        "ocr_config_version": settings.ocr_config_version,
+        "full_sheet_ocr": settings.full_sheet_ocr,
+        "carimbo_region": settings.carimbo_region,
+        "carimbo_dpi": settings.carimbo_dpi,
+        "ocr_dpi": settings.ocr_dpi,
+    }
+
+
+def page_digests(manifest: Dict[str, Any]) -> Dict[int, Optional[str]]:
+    """Content digest of every page of a page manifest."""
+    return {page["page_number"]: page.get("content_digest") for page in manifest["pages"]}
+
+
+def subset_pdf(pdf_path: Path, page_numbers: List[int]) -> bytes:
+    """Write a PDF containing only the given pages (0-indexed), in that order."""
+    if not PYPDF_AVAILABLE:
+        raise ImportError("pypdf não está instalado. Execute: pip install unstructured[pdf]")
+
+    reader = PdfReader(str(pdf_path))
+    writer = PdfWriter()
+    for page_number in page_numbers:
+        writer.add_page(reader.pages[page_number])
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def element_page(element: Dict[str, Any]) -> Optional[int]:
+    """0-indexed page of an Unstructured element record (None if unknown)."""
+    page_number = (element.get("metadata") or {}).get("page_number")
+    return page_number - 1 if page_number else None
+
+
+def merge_page_elements(
+    previous: Dict[str, Any],
+    current: Dict[str, Any],
+    extracted_pages: Set[int],
+) -> Dict[str, Any]:
+    """Merge a partial Unstructured result into the previous result of the same file.
+
+    Elements of the extracted pages come from ``current``, every other page keeps
+    its elements from ``previous``. Elements stay in page order.
+
+    Args:
+        previous: Earlier result of the file
+        current: Result of the pages extracted in this run
+        extracted_pages: Pages (0-indexed) that were extracted in this run
+
+    Returns:
+        Merged result (text and tables; other fields from current)
+    """
+    merged = dict(current)
+    for field in ("text", "tables"):
+        kept = [e for e in previous.get(field, []) if element_page(e) not in extracted_pages]
+        combined = kept + current.get(field, [])
+        # Stable sort: the order inside a page is preserved
+        combined.sort(key=lambda e: element_page(e) if element_page(e) is not None else -1)
+        merged[field] = combined
+
+    merged["total_elements"] = len(merged["text"]) + len(merged["tables"])
+    return merged
+
+
+def page_records_from_result(
+    result: Dict[str, Any],
+    page_numbers: Set[int],
+) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, str]]]:
+    """Rebuild hybrid-pipeline page records from a previous file result.
+
+    Args:
+        result: Previous result of build_hybrid_result
+        page_numbers: Pages (0-indexed) to take from it
+
+    Returns:
+        (page records, extraction decision of each page)
+    """
+    decisions = {
+        d["page_number"]: {"strategy": d["strategy"], "reason": d["reason"]}
+        for d in result.get("metadata", {}).get("extraction_decisions", [])
+        if d["page_number"] in page_numbers
+    }
+
+    page_elements: Dict[int, List[Dict[str, Any]]] = {}
+    for element in result.get("text", []):
+        metadata = element.get("metadata") or {}
+        if metadata.get("page_number") in page_numbers:
+            page_elements.setdefault(metadata["page_number"], []).append(element)
+
+    methods = {"native": "native", "carimbo_roi": "carimbo_roi"}
+    records = []
+    for page_number in sorted(page_numbers):
+        elements = page_elements.get(page_number, [])
+        if elements:
+            method = elements[0]["metadata"].get("extraction_method")
+        else:
+            # Pages without text leave no element; the decision tells how they were read
+            method = methods.get(decisions.get(page_number, {}).get("strategy"), "ocr")
+        record = {
+            "page_number": page_number,
+            "text": "\n".join(e["text"] for e in elements),
+            "extraction_method": method,
+            "reused": True,
+        }
+        if any("coordinates" in e["metadata"] for e in elements):
+            record["elements"] = elements
+        records.append(record)
+    return records, decisions
+
+
+class ExtractionManifest:
+    """Manifesto de extração: digests por arquivo e por página da execução anterior."""
+
+    def __init__(self, consolidated_json: Path, signature: Dict[str, Any]):
+        """Carrega o manifesto e os resultados anteriores.
+
+        Args:
+            consolidated_json: JSON consolidado da extração (ex.: all_extractions.json)
+            signature: Configurações do pipeline (ver pipeline_signature)
+        """
+        self.consolidated_json = consolidated_json
+        self.path = manifest_path(consolidated_json)
+        self.signature = signature
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.reused_files = 0
+        self.reused_pages = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with open(self.consolidated_json, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable extraction manifest {self.path}: {e}")
+            return
+
+        if data.get("version") != MANIFEST_VERSION or data.get("signature") != self.signature:
+            logger.info("Extraction settings changed since the last run, extracting everything")
+            return
+
+        self.results = {
+            r["filename"]: r for r in previous if r.get("filename") and not r.get("error")
+        }
+        # An entry is only usable if its result is still in the consolidated output
+        self.files = {
+            name: entry for name, entry in data.get("files", {}).items() if name in self.results
+        }
+
+    def previous_result(self, filename: str) -> Optional[Dict[str, Any]]:
+        return self.results.get(filename)
+
+    def unchanged_result(self, pdf_path: Path, digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Previous result of a PDF whose file digest did not change (None otherwise)."""
+        entry = self.files.get(pdf_path.name)
+        if entry is None or None in entry["pages"].values():
+            return None
+        if (digest or compute_file_digest(pdf_path)) != entry["file_digest"]:
+            return None
+        self.reused_files += 1
+        logger.info(f"Unchanged since last extraction: {pdf_path.name}")
+        return self.results[pdf_path.name]
+
+    def unchanged_pages(self, filename: str, digests: Dict[int, Optional[str]]) -> Set[int]:
+        """Pages whose content digest matches the previous run (failed pages excluded)."""
+        entry = self.files.get(filename)
+        if entry is None:
+            return set()
+        previous = entry["pages"]
+        return {
+            page_number for page_number, digest in digests.items()
+            if digest is not None and previous.get(str(page_number)) == digest
+        }
+
+    def update(
+        self,
+        filename: str,
+        file_digest: str,
+        digests: Dict[int, Optional[str]],
+        failed_pages: Optional[Set[int]] = None,
+    ) -> None:
+        """Record the digests of a file extracted (or reused) in this run."""
+        failed_pages = failed_pages or set()
+        self.files[filename] = {
+            "file_digest": file_digest,
+            "pages": {
+                str(page_number): None if page_number in failed_pages else digest
+                for page_number, digest in sorted(digests.items())
+            },
+        }
+
+    def update_from_result(self, result: Dict[str, Any]) -> None:
+        """Record the digests of a hybrid-pipeline result (see build_hybrid_result)."""
+        metadata = result.get("metadata", {})
+        if result.get("error") or not metadata.get("file_digest"):
+            self.files.pop(result.get("filename"), None)
+            return
+        self.update(
+            result["filename"],
+            metadata["file_digest"],
+            {p["page_number"]: p.get("content_digest") for p in metadata.get("page_manifest", [])},
+            set(metadata.get("failed_pages", [])),
+        )
+
+    def save(self, filenames: List[str]) -> None:
+        """Write the manifest, keeping only the files of the current run."""
+        files = {name: self.files[name] for name in filenames if name in self.files}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "signature": self.signature, "files": files},
+                f, ensure_ascii=False, indent=2,
+            )
+        os.replace(tmp_path, self.path)
+        logger.info(
+            f"Extraction manifest saved to {self.path} "
+            f"({self.reused_files} files and {self.reused_pages} pages reused)"
+        )
@@ -0,0 +1,348 @@
+"""Native text-layer backend for vector drawings.
+
+CAD exports carry a real text layer, but their content streams are dominated
+by tens of thousands of path operators. Interpreting all of them (which is what
+``partition_pdf(strategy="fast")`` and pdfminer's layout analysis do) costs
+seconds per sheet. Here the content stream is first reduced with a regex scan
+(string literals, comments and inline images skipped) to the operators that
+matter for text (``BT``...``ET`` objects, text state,
+graphics state and XObject calls) and only that remainder goes through
+pdfminer's interpreter, with a device that records each shown string as a span
+with its bounding box. Spans on the same baseline are joined into lines.
+
+Records have the same shape as the Unstructured elements stored by
+``extract_pdf_unstructured``::
+
+    {"type": "text", "text": "AP. 101",
+     "metadata": {"page_number": 1, "filename": "planta.pdf", "font_size": 8.0,
+                  "coordinates": {"points": ((x0, y0), (x0, y1), (x1, y1), (x1, y0)),
+                                  "system": "PointSpace",
+                                  "layout_width": 2748.0, "layout_height": 2266.0}}}
+
+Coordinates are PDF points on the displayed sheet (page rotation applied) with
+the origin at the top-left corner.
+"""
+
+import math
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable
+
+try:
+    from pdfminer.pdfdevice import PDFTextDevice
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import PDFStream, stream_value
+    PDFMINER_AVAILABLE = True
+except ImportError:
+    PDFMINER_AVAILABLE = False
+    PDFTextDevice = object
+    PDFPageInterpreter = object
+    PDFResourceManager = None
+    PDFPage = None
+    PDFStream = None
+    stream_value = None
+
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("extract.native_text")
+
+# Operators kept outside text objects; everything else (paths, colours, shading)
+# is dropped before interpretation. The scan also stops at string literals,
+# comments and inline image data, which are skipped whole so that an operator
+# name inside them ("(RUA ET AL) Tj") is not taken for an operator. The pattern
+# is a plain alternation of literals, which the regex engine scans for quickly;
+# the delimiters around an operator are checked in the loop
+SCAN_RE = re.compile(rb"\(|%|ID|BT|ET|cm|q|Q|Do|gs|Tf|Tc|Tw|Tz|TL|Ts|Tr")
+OPERATOR_SUFFIX = b" \t\r\n\f\v[(</"
+STRING_TOKEN_RE = re.compile(rb"\\.|[()]", re.DOTALL)
+END_OF_LINE_RE = re.compile(rb"[\r\n]")
+INLINE_IMAGE_END_RE = re.compile(rb"\sEI(?=\s|$)")
+OPERATOR_PREFIX = b" \t\r\n\f\x00])>"
+NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+NAME_RE = re.compile(rb"/[^\s/\[\]()<>{}%]+")
+OPERAND_WINDOW = 256
+
+# Number of trailing operands (numbers, names) of each kept operator
+OPERAND_COUNTS = {
+    b"cm": (6, 0), b"Tf": (1, 1), b"Tc": (1, 0), b"Tw": (1, 0), b"Tz": (1, 0),
+    b"TL": (1, 0), b"Ts": (1, 0), b"Tr": (1, 0), b"Do": (0, 1), b"gs": (0, 1),
+}
+
+# A gap wider than this fraction of the font size between glyphs is a space
+SPACE_GAP = 0.25
+# Spans closer than this (in font sizes) on the same baseline are one line
+LINE_GAP = 1.0
+
+
+def _operands(window: bytes, operator: bytes) -> Optional[bytes]:
+    """Rebuild the operand list of an operator from the bytes preceding it."""
+    numbers_needed, names_needed = OPERAND_COUNTS[operator]
+    numbers = NUMBER_RE.findall(window)[-numbers_needed:] if numbers_needed else []
+    names = NAME_RE.findall(window)[-names_needed:] if names_needed else []
+    if len(numbers) != numbers_needed or len(names) != names_needed:
+        return None
+    return b" ".join(names + numbers)
+
+
+def _string_end(data: bytes, start: int) -> int:
+    """End of the string literal opening at start (balanced parentheses, escapes skipped)."""
+    depth = 0
+    for match in STRING_TOKEN_RE.finditer(data, start):
+        token = match.group()
+        if token == b"(":
+            depth += 1
+        elif token == b")":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return len(data)
+
+
+def text_only_stream(data: bytes) -> bytes:
+    """Reduce a content stream to its text objects and the state they depend on.
+
+    Args:
+        data: Decoded content stream
+
+    Returns:
+        Content stream with text objects, text/graphics state and XObject calls only
+    """
+    out = []
+    segment_start = 0
+    text_start = None
+    pos = 0
+
+    while True:
+        match = SCAN_RE.search(data, pos)
+        if match is None:
+            break
+        start = match.start()
+        operator = match.group()
+
+        if operator == b"(":
+            pos = _string_end(data, start)
+            continue
+        if operator == b"%":
+            end = END_OF_LINE_RE.search(data, start)
+            pos = end.end() if end else len(data)
+            continue
+
+        pos = match.end()
+        if (start > 0 and data[start - 1] not in OPERATOR_PREFIX) or (
+            pos < len(data) and data[pos] not in OPERATOR_SUFFIX
+        ):
+            pos = start + 1
+            continue
+        if operator == b"ID":
+            end = INLINE_IMAGE_END_RE.search(data, pos)
+            pos = end.end() if end else len(data)
+            continue
+
+        if text_start is not None:
+            # Inside a text object everything is kept verbatim up to ET
+            if operator == b"ET":
+                out.append(data[text_start:pos])
+                text_start = None
+                segment_start = pos
+            continue
+
+        if operator == b"BT":
+            text_start = start
+        elif operator in (b"q", b"Q"):
+            out.append(operator)
+        elif operator in OPERAND_COUNTS:
+            window = data[max(segment_start, start - OPERAND_WINDOW):start]
+            operands = _operands(window, operator)
+            if operands is not None:
+                out.append(operands + b" " + operator)
+        segment_start = pos
+
+    return b"\n".join(out)
+
+
+class _TextOnlyInterpreter(PDFPageInterpreter):
+    """Interpretador que executa apenas o texto dos content streams (e de formulários)."""
+
+    def execute(self, streams: Iterable[object]) -> None:
+        filtered = []
+        for obj in streams:
+            stream = stream_value(obj)
+            reduced = PDFStream({}, text_only_stream(stream.get_data()))
+            # Keeps pdfminer's circular-reference guard working for forms
+            reduced.set_objid(stream.objid if stream.objid is not None else -1, 0)
+            filtered.append(reduced)
+        super().execute(filtered)
+
+
+class _SpanDevice(PDFTextDevice):
+    """Device que registra cada string exibida como um trecho com bounding box."""
+
+    def __init__(self, rsrcmgr: Any):
+        super().__init__(rsrcmgr)
+        self.spans: List[Dict[str, Any]] = []
+        self._chars: List[str] = []
+        self._box: List[float] = []
+        self._last_end = None
+        self._size = 0.0
+
+    def begin_page(self, page: Any, ctm: Any) -> None:
+        self.set_ctm(ctm)
+        self.spans = []
+
+    def render_string(self, textstate: Any, seq: Any, ncs: Any, graphicstate: Any) -> None:
+        self._chars = []
+        self._box = [math.inf, math.inf, -math.inf, -math.inf]
+        self._last_end = None
+        self._size = 0.0
+        super().render_string(textstate, seq, ncs, graphicstate)
+
+        text = "".join(self._chars).strip()
+        if text:
+            self.spans.append({"text": text, "bbox": tuple(self._box), "size": self._size})
+
+    def render_char(
+        self,
+        matrix: Any,
+        font: Any,
+        fontsize: float,
+        scaling: float,
+        rise: float,
+        cid: int,
+        ncs: Any,
+        graphicstate: Any,
+    ) -> float:
+        try:
+            char = font.to_unichr(cid)
+        except Exception:
+            char = ""
+        advance = font.char_width(cid) * fontsize * scaling
+
+        a, b, c, d, e, f = matrix
+        descent = font.get_descent() * fontsize
+        size = math.hypot(c, d) * fontsize
+        origin = (e + c * rise, f + d * rise)
+
+        if self._last_end is not None and size:
+            # Glyph pushed away from the previous one along the baseline (TJ
+            # kerning used as a word space)
+            scale = math.hypot(a, b) or 1.0
+            gap = ((origin[0] - self._last_end[0]) * a + (origin[1] - self._last_end[1]) * b) / scale
+            if gap > SPACE_GAP * size and not char.isspace():
+                self._chars.append(" ")
+        self._chars.append(char)
+        self._last_end = (origin[0] + a * advance, origin[1] + b * advance)
+        self._size = max(self._size, size)
+
+        for px in (0.0, advance):
+            for py in (descent + rise, descent + rise + fontsize):
+                tx, ty = a * px + c * py + e, b * px + d * py + f
+                self._box[0] = min(self._box[0], tx)
+                self._box[1] = min(self._box[1], ty)
+                self._box[2] = max(self._box[2], tx)
+                self._box[3] = max(self._box[3], ty)
+        return advance
+
+
+def merge_spans(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join consecutive spans that continue the same line.
+
+    CAD exports usually show a label in one string, but some split it per word
+    or per glyph run. Spans are merged in content order only, so labels that
+    happen to share a baseline elsewhere on the sheet stay separate.
+    """
+    lines: List[Dict[str, Any]] = []
+    for span in spans:
+        if lines:
+            line = lines[-1]
+            size = max(line["size"], span["size"]) or 1.0
+            same_baseline = abs(line["bbox"][1] - span["bbox"][1]) < 0.3 * size
+            similar_size = abs(line["size"] - span["size"]) <= 0.2 * size
+            gap = span["bbox"][0] - line["bbox"][2]
+            if same_baseline and similar_size and -0.1 * size <= gap < LINE_GAP * size:
+                separator = " " if gap > SPACE_GAP * size else ""
+                line["text"] += separator + span["text"]
+                line["bbox"] = (
+                    min(line["bbox"][0], span["bbox"][0]),
+                    min(line["bbox"][1], span["bbox"][1]),
+                    max(line["bbox"][2], span["bbox"][2]),
+                    max(line["bbox"][3], span["bbox"][3]),
+                )
+                continue
+        lines.append(dict(span))
+    return lines
+
+
+def _element(line: Dict[str, Any], page_number: int, filename: str, width: float, height: float) -> Dict[str, Any]:
+    """Build an element record (top-left origin coordinates) for a line."""
+    x0, y0, x1, y1 = line["bbox"]
+    top, bottom = height - y1, height - y0
+    return {
+        "type": "text",
+        "text": line["text"],
+        "metadata": {
+            "page_number": page_number + 1,
+            "filename": filename,
+            "font_size": round(line["size"], 2),
+            "coordinates": {
+                "points": ((x0, top), (x0, bottom), (x1, bottom), (x1, top)),
+                "system": "PointSpace",
+                "layout_width": width,
+                "layout_height": height,
+            },
+        },
+    }
+
+
+def extract_native_elements(
+    pdf_path: Path,
+    page_numbers: Optional[Iterable[int]] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Read the text layer of a PDF as element records with coordinates.
+
+    Args:
+        pdf_path: Path to PDF file
+        page_numbers: Pages to read (0-indexed); None = all
+
+    Returns:
+        Dict mapping page number (0-indexed) to its element records
+    """
+    if not PDFMINER_AVAILABLE:
+        raise ImportError("pdfminer.six não está instalado. Execute: pip install pdfminer.six")
+
+    wanted = set(page_numbers) if page_numbers is not None else None
+    rsrcmgr = PDFResourceManager(caching=True)
+    device = _SpanDevice(rsrcmgr)
+    interpreter = _TextOnlyInterpreter(rsrcmgr, device)
+
+    elements: Dict[int, List[Dict[str, Any]]] = {}
+    with open(pdf_path, "rb") as f:
+        for page_number, page in enumerate(PDFPage.get_pages(f)):
+            if wanted is not None and page_number not in wanted:
+                continue
+            x0, y0, x1, y1 = page.mediabox
+            width, height = abs(x1 - x0), abs(y1 - y0)
+            if page.rotate % 180 == 90:
+                width, height = height, width
+
+            try:
+                interpreter.process_page(page)
+            except Exception as e:
+                logger.warning(f"Could not read text layer of {pdf_path.name} page {page_number}: {e}")
+                device.spans = []
+
+            elements[page_number] = [
+                _element(line, page_number, pdf_path.name, width, height)
+                for line in merge_spans(device.spans)
+            ]
+
+    logger.debug(
+        f"Native text of {pdf_path.name}: "
+        f"{sum(len(e) for e in elements.values())} lines on {len(elements)} pages"
+    )
+    return elements
+
+
+def elements_text(elements: List[Dict[str, Any]]) -> str:
+    """Plain text of a page's element records, one line per record."""
+    return "\n".join(element["text"] for element in elements)
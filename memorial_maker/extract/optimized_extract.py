@@ -1,56 +1,37 @@
 """Optimized PDF extraction with hybrid text-first extraction, parallel OCR, and caching."""
 
+import io
 import time
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple, Callable
+from typing import Dict, List, Any, Optional, Callable, Iterator
 import json
-import os
-import multiprocessing
 
 try:
     from unstructured.partition.pdf import partition_pdf
+    from unstructured.partition.image import partition_image
     UNSTRUCTURED_AVAILABLE = True
 except ImportError:
     UNSTRUCTURED_AVAILABLE = False
     partition_pdf = None
+    partition_image = None
 
 from memorial_maker.config import settings
+from memorial_maker.extract.incremental import ExtractionManifest, subset_pdf
+from memorial_maker.extract.native_text import PDFMINER_AVAILABLE, elements_text, extract_native_elements
+from memorial_maker.extract.page_manifest import build_page_manifest, classify_page
+from memorial_maker.extract.spatial_index import build_page_indexes, build_pages
 from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.raster_cache import RASTER_AVAILABLE, get_page_image
 from memorial_maker.utils.ocr_cache import (
+    file_digest,
     get_cache_key,
-    load_from_cache,
+    lookup_cache,
     save_to_cache,
 )
 
 logger = get_logger("extract.optimized")
 
 
-def extract_pdf_hybrid_wrapper(pdf_path: Path, output_dir: Path, log_queue: Optional[multiprocessing.Queue] = None) -> Dict[str, Any]:
-    """Wrapper para extract_pdf_hybrid que captura logs em uma fila.
-    
-    Esta função é necessária porque spawn cria processos novos que não compartilham stdout.
-    Usamos uma Queue para enviar mensagens de log de volta ao processo pai.
-    """
-    def log_message(msg: str):
-        """Envia mensagem para a fila de log E imprime localmente."""
-        print(msg)  # Tenta print local (pode não aparecer com spawn)
-        if log_queue:
-            try:
-                log_queue.put(msg)
-            except:
-                pass  # Ignora erros de queue
-    
-    try:
-        log_message(f"🔄 Worker iniciado para: {pdf_path.name}")
-        result = extract_pdf_hybrid(pdf_path, output_dir)
-        log_message(f"✅ Worker completou: {pdf_path.name}")
-        return result
-    except Exception as e:
-        log_message(f"❌ Worker falhou: {pdf_path.name} - {e}")
-        raise
-
-
 def is_text_valid(text: str, min_length: int = 50) -> bool:
     """Check if extracted text is valid (not empty or too short).
     
@@ -72,54 +53,86 @@ def is_text_valid(text: str, min_length: int = 50) -> bool:
     return True
 
 
-def extract_page_native_text(pdf_path: Path, page_number: int) -> Tuple[str, bool]:
-    """Attempt native text extraction from a PDF page.
+def extract_native_elements_by_page(
+    pdf_path: Path,
+    page_numbers: Optional[List[int]] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Read the text layer of a PDF as element records, grouped by page.
+    
+    Uses the lightweight content-stream backend (extract.native_text); the
+    Unstructured fast partitioner is only used when pdfminer is not installed.
     
     Args:
         pdf_path: Path to PDF file
-        page_number: Page number (0-indexed)
+        page_numbers: Pages to read (0-indexed); None = all
         
     Returns:
-        Tuple of (extracted_text, success)
+        Dict mapping page number (0-indexed) to the page's element records
     """
+    if PDFMINER_AVAILABLE:
+        try:
+            return extract_native_elements(pdf_path, page_numbers)
+        except Exception as e:
+            logger.warning(f"Error extracting native text from {pdf_path.name}: {e}")
+            return {}
+    
     if not UNSTRUCTURED_AVAILABLE:
         raise ImportError("Unstructured não está instalado. Esta dependência é obrigatória.")
     
     try:
-        # Extract only the specific page
         elements = partition_pdf(
             filename=str(pdf_path),
             strategy="fast",  # Fast strategy for native text
-            page_numbers=[page_number],
             languages=["por"],
         )
-        
-        # Combine all text elements
-        text_parts = []
-        for element in elements:
-            text = str(element).strip()
-            if text:
-                text_parts.append(text)
-        
-        full_text = "\n".join(text_parts)
-        return full_text, True
-        
     except Exception as e:
-        logger.warning(f"Error extracting native text from page {page_number} of {pdf_path.name}: {e}")
-        return "", False
+        logger.warning(f"Error extracting native text from {pdf_path.name}: {e}")
+        return {}
+    
+    # Group text elements by page (Unstructured numbers pages from 1)
+    records: Dict[int, List[Dict[str, Any]]] = {}
+    for element in elements:
+        text = str(element).strip()
+        if not text:
+            continue
+        page_number = (getattr(element.metadata, "page_number", None) or 1) - 1
+        records.setdefault(page_number, []).append({
+            "type": type(element).__name__.lower(),
+            "text": text,
+            "metadata": element.metadata.to_dict(),
+        })
+    
+    return records
+
+
+def ocr_cache_key(
+    pdf_digest: Optional[str],
+    page_number: int,
+    content_digest: Optional[str],
+    strategy: str = "hi_res",
+) -> str:
+    """Cache key of a page OCR result (shared by single-page and batched OCR)."""
+    config_version = settings.ocr_config_version
+    if strategy != "hi_res":
+        config_version = f"{config_version}:{strategy}"
+    return get_cache_key(pdf_digest, page_number, config_version, content_digest)
 
 
 def extract_page_with_ocr(
     pdf_path: Path,
     page_number: int,
-    pdf_bytes: Optional[bytes] = None,
+    pdf_digest: Optional[str] = None,
+    content_digest: Optional[str] = None,
+    strategy: str = "hi_res",
 ) -> Dict[str, Any]:
     """Extract text from a PDF page using OCR (with caching).
     
     Args:
         pdf_path: Path to PDF file
         page_number: Page number (0-indexed)
-        pdf_bytes: Raw PDF bytes (for cache key generation)
+        pdf_digest: Digest of the whole PDF (computed if not provided)
+        content_digest: Digest of the page content (preferred cache key source)
+        strategy: Unstructured strategy ("hi_res", or "ocr_only" to skip layout detection)
         
     Returns:
         Dict with extracted text and metadata
@@ -127,31 +140,42 @@ def extract_page_with_ocr(
     if not UNSTRUCTURED_AVAILABLE:
         raise ImportError("Unstructured não está instalado. Esta dependência é obrigatória para OCR.")
     
-    # Load PDF bytes if not provided
-    if pdf_bytes is None:
-        with open(pdf_path, "rb") as f:
-            pdf_bytes = f.read()
+    # Hash the file only when there is no page digest to key on
+    if pdf_digest is None and content_digest is None:
+        pdf_digest = file_digest(pdf_path)
     
     # Check cache
-    cache_key = get_cache_key(pdf_bytes, page_number, settings.ocr_config_version)
-    cached_result = load_from_cache(cache_key)
+    cache_key = ocr_cache_key(pdf_digest, page_number, content_digest, strategy)
+    cached_result, cache_tier = lookup_cache(cache_key)
     
     if cached_result:
-        logger.debug(f"Cache hit for page {page_number} of {pdf_path.name}")
+        logger.debug(f"Cache hit ({cache_tier}) for page {page_number} of {pdf_path.name}")
         return {
             **cached_result,
             "from_cache": True,
+            "cache_tier": cache_tier,
         }
     
     # Run OCR
     start_time = time.time()
     try:
-        elements = partition_pdf(
-            filename=str(pdf_path),
-            strategy="hi_res",  # High-res strategy for OCR
-            page_numbers=[page_number],
-            languages=["por"],
-        )
+        if RASTER_AVAILABLE:
+            # Page raster is rendered once and shared with carimbo/figure crops
+            image = get_page_image(
+                pdf_path, page_number, settings.ocr_dpi, pdf_digest, content_digest
+            )
+            elements = partition_image(
+                file=image,
+                strategy=strategy,
+                languages=["por"],
+            )
+        else:
+            elements = partition_pdf(
+                filename=str(pdf_path),
+                strategy=strategy,  # High-res strategy for OCR
+                page_numbers=[page_number],
+                languages=["por"],
+            )
         
         # Combine all text elements
         text_parts = []
@@ -186,88 +210,221 @@ def extract_page_with_ocr(
         }
 
 
-def extract_pdf_hybrid(
+def extract_pages_with_ocr(
     pdf_path: Path,
-    output_dir: Path,
-) -> Dict[str, Any]:
-    """Extract content from PDF using hybrid approach (text-first, OCR fallback).
+    page_numbers: List[int],
+    pdf_digest: Optional[str] = None,
+    content_digests: Optional[Dict[int, Optional[str]]] = None,
+    strategy: str = "hi_res",
+) -> Dict[int, Dict[str, Any]]:
+    """Extract several pages with OCR in a single partitioner call.
+    
+    Cached pages are answered from the cache; the others are copied into one
+    subset PDF that goes through partition_pdf once, so PDF parsing and model
+    set-up are paid per batch instead of per page. Elements are mapped back to
+    their pages and every page gets its own cache entry, under the same key as
+    extract_page_with_ocr.
     
     Args:
         pdf_path: Path to PDF file
-        output_dir: Directory for output files
+        page_numbers: Pages to extract (0-indexed)
+        pdf_digest: Digest of the whole PDF (computed if a page has no content digest)
+        content_digests: Content digest of each page (preferred cache key source)
+        strategy: Unstructured strategy ("hi_res" or "ocr_only")
         
     Returns:
-        Dict with extracted data and metrics
+        Dict mapping page number to its OCR result (same fields as extract_page_with_ocr)
     """
-    logger.info(f"Extracting with hybrid approach: {pdf_path.name}")
-    
     if not UNSTRUCTURED_AVAILABLE:
-        raise ImportError("Unstructured não está instalado. Esta dependência é obrigatória.")
-
-    # Load PDF bytes for cache key generation
-    with open(pdf_path, "rb") as f:
-        pdf_bytes = f.read()
+        raise ImportError("Unstructured não está instalado. Esta dependência é obrigatória para OCR.")
+    
+    content_digests = content_digests or {}
+    if pdf_digest is None and any(content_digests.get(n) is None for n in page_numbers):
+        pdf_digest = file_digest(pdf_path)
+    
+    results: Dict[int, Dict[str, Any]] = {}
+    misses = []
+    for page_number in page_numbers:
+        cache_key = ocr_cache_key(pdf_digest, page_number, content_digests.get(page_number), strategy)
+        cached_result, cache_tier = lookup_cache(cache_key)
+        if cached_result:
+            results[page_number] = {**cached_result, "from_cache": True, "cache_tier": cache_tier}
+        else:
+            misses.append(page_number)
+    
+    if len(misses) == 1:
+        # A batch of one is a plain page OCR (and can use the shared page raster)
+        results[misses[0]] = extract_page_with_ocr(
+            pdf_path, misses[0], pdf_digest, content_digests.get(misses[0]), strategy
+        )
+        return results
+    if not misses:
+        return results
     
-    # Get total page count (quick check)
+    start_time = time.time()
     try:
-        # Extract first page to get metadata
-        sample_elements = partition_pdf(
-            filename=str(pdf_path),
-            strategy="fast",
-            page_numbers=[0],
+        elements = partition_pdf(
+            file=io.BytesIO(subset_pdf(pdf_path, misses)),
+            strategy=strategy,
             languages=["por"],
         )
-        # Estimate page count from filename or use a default
-        # Note: unstructured doesn't directly give page count, so we'll process pages incrementally
-        total_pages = 1  # Will be determined during processing
     except Exception as e:
-        logger.error(f"Error getting page count for {pdf_path.name}: {e}")
-        raise e
+        logger.error(f"Error during batched OCR of pages {misses} of {pdf_path.name}: {e}")
+        for page_number in misses:
+            results[page_number] = {
+                "text": "",
+                "page_number": page_number,
+                "ocr_time": 0.0,
+                "from_cache": False,
+                "error": str(e),
+            }
+        return results
+    
+    # Pages of the subset map back to the original document
+    texts: Dict[int, List[str]] = {page_number: [] for page_number in misses}
+    for element in elements:
+        text = str(element).strip()
+        if text:
+            subset_page = getattr(element.metadata, "page_number", None) or 1
+            texts[misses[subset_page - 1]].append(text)
+    
+    # Time is split evenly; the batch size tells how it was measured
+    ocr_time = (time.time() - start_time) / len(misses)
+    for page_number in misses:
+        result = {
+            "text": "\n".join(texts[page_number]),
+            "page_number": page_number,
+            "ocr_time": ocr_time,
+            "from_cache": False,
+            "batch_size": len(misses),
+        }
+        save_to_cache(
+            ocr_cache_key(pdf_digest, page_number, content_digests.get(page_number), strategy),
+            result,
+        )
+        results[page_number] = result
     
-    # Try to determine page count by attempting to extract pages until failure
-    max_pages = 1000  # Safety limit
-    page_results = []
-    pages_processed = 0
-    text_extracted_pages = 0
-    ocr_pages = 0
-    total_ocr_time = 0.0
-    cache_hits = 0
-    
-    # Process pages sequentially to determine count and extraction method
-    for page_num in range(max_pages):
-        try:
-            # Try native text extraction first
-            native_text, success = extract_page_native_text(pdf_path, page_num)
-            
-            if success and is_text_valid(native_text):
-                # Native text is valid
-                page_results.append({
-                    "page_number": page_num,
-                    "text": native_text,
-                    "extraction_method": "native",
-                })
-                text_extracted_pages += 1
-                pages_processed += 1
-            else:
-                # Need OCR
-                ocr_result = extract_page_with_ocr(pdf_path, page_num, pdf_bytes)
-                page_results.append({
-                    "page_number": page_num,
-                    "text": ocr_result.get("text", ""),
-                    "extraction_method": "ocr",
-                    "ocr_time": ocr_result.get("ocr_time", 0.0),
-                    "from_cache": ocr_result.get("from_cache", False),
-                })
-                ocr_pages += 1
-                total_ocr_time += ocr_result.get("ocr_time", 0.0)
-                if ocr_result.get("from_cache"):
-                    cache_hits += 1
-                pages_processed += 1
-                
-        except Exception as e:
-            # Likely reached end of document
-            logger.debug(f"Stopped at page {page_num}: {e}")
-            break
+    logger.debug(f"Batched OCR of {len(misses)} pages of {pdf_path.name}: {ocr_time * len(misses):.2f}s")
+    return results
+
+
+def ocr_batches(page_numbers: List[int], batch_size: Optional[int] = None) -> List[List[int]]:
+    """Split the pages that need OCR into batches of at most settings.ocr_batch_size."""
+    batch_size = max(1, batch_size or settings.ocr_batch_size)
+    return [page_numbers[i:i + batch_size] for i in range(0, len(page_numbers), batch_size)]
+
+
+def plan_ocr(reason: str) -> Dict[str, str]:
+    """Decision for a page without usable native text.
+    
+    With full-sheet OCR disabled only the title-block region is read.
+    """
+    strategy = "ocr" if settings.full_sheet_ocr else "carimbo_roi"
+    return {"strategy": strategy, "reason": reason}
+
+
+def plan_page(page: Dict[str, Any]) -> Dict[str, str]:
+    """Extraction decision (strategy and reason) for a page manifest entry."""
+    decision = classify_page(page)
+    if decision["strategy"] == "native":
+        return decision
+    return plan_ocr(decision["reason"])
+
+
+def native_page_result(
+    page_number: int,
+    text: str,
+    elements: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Build the per-page record for a page extracted from its text layer."""
+    page_result = {
+        "page_number": page_number,
+        "text": text,
+        "extraction_method": "native",
+    }
+    if elements:
+        page_result["elements"] = elements
+    return page_result
+
+
+def ocr_page_result(page_number: int, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the per-page record for a page extracted with OCR."""
+    page_result = {
+        "page_number": page_number,
+        "text": ocr_result.get("text", ""),
+        "extraction_method": "ocr",
+        "ocr_time": ocr_result.get("ocr_time", 0.0),
+        "from_cache": ocr_result.get("from_cache", False),
+    }
+    if ocr_result.get("cache_tier"):
+        page_result["cache_tier"] = ocr_result["cache_tier"]
+    if ocr_result.get("batch_size"):
+        page_result["batch_size"] = ocr_result["batch_size"]
+    if ocr_result.get("error"):
+        page_result["error"] = ocr_result["error"]
+    return page_result
+
+
+def roi_page_result(page_number: int, roi_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the per-page record for a page where only the carimbo region was read."""
+    page_result = {
+        "page_number": page_number,
+        "text": roi_result.get("text", ""),
+        "extraction_method": "carimbo_roi",
+        "ocr_time": roi_result.get("time", 0.0),
+        "from_cache": roi_result.get("from_cache", False),
+    }
+    if roi_result.get("error"):
+        page_result["error"] = roi_result["error"]
+    return page_result
+
+
+def save_hybrid_json(result: Dict[str, Any], output_dir: Path, pdf_path: Path) -> Path:
+    """Save the file-level result of the hybrid pipeline next to the other outputs."""
+    output_json = output_dir / f"{pdf_path.stem}_optimized.json"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_json, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+    return output_json
+
+
+def build_hybrid_result(
+    pdf_path: Path,
+    manifest: Dict[str, Any],
+    page_results: List[Dict[str, Any]],
+    output_dir: Path,
+    decisions: Optional[Dict[int, Dict[str, str]]] = None,
+    save_json: bool = True,
+) -> Dict[str, Any]:
+    """Assemble the file-level result from per-page records and save it.
+    
+    Args:
+        pdf_path: Path to PDF file
+        manifest: Page manifest of the PDF
+        page_results: Per-page records (any order)
+        output_dir: Directory for output files
+        decisions: Extraction decision of each page (strategy and reason)
+        save_json: Save the file JSON; false when the caller completes the
+            result first (table stage) and saves it afterwards
+        
+    Returns:
+        Dict with extracted data and metrics
+    """
+    page_results = sorted(page_results, key=lambda r: r["page_number"])
+    decisions = decisions or {}
+    
+    pages_processed = len(page_results)
+    ocr_results = [r for r in page_results if r.get("extraction_method") == "ocr"]
+    text_extracted_pages = sum(1 for r in page_results if r.get("extraction_method") == "native")
+    roi_pages = sum(1 for r in page_results if r.get("extraction_method") == "carimbo_roi")
+    reused_pages = sum(1 for r in page_results if r.get("reused"))
+    ocr_pages = len(ocr_results)
+    cache_hits = sum(1 for r in ocr_results if r.get("from_cache"))
+    batched_ocr_pages = sum(1 for r in ocr_results if r.get("batch_size", 1) > 1 and not r.get("from_cache"))
+    memory_cache_hits = sum(1 for r in ocr_results if r.get("cache_tier") == "memory")
+    peak_rss_values = [r["peak_rss_mb"] for r in page_results if r.get("peak_rss_mb") is not None]
+    disk_cache_hits = cache_hits - memory_cache_hits
+    total_ocr_time = sum(r.get("ocr_time", 0.0) for r in ocr_results)
     
     # Combine all page texts
     all_text_elements = []
@@ -275,20 +432,37 @@ def extract_pdf_hybrid(
     
     for page_result in page_results:
         page_text = page_result.get("text", "")
-        if page_text:
+        decision = decisions.get(page_result["page_number"], {})
+        if page_result.get("elements"):
+            # Text-layer lines keep their own records (and coordinates)
+            for element in page_result["elements"]:
+                all_text_elements.append({
+                    "type": element["type"],
+                    "text": element["text"],
+                    "metadata": {
+                        **element["metadata"],
+                        "page_number": page_result["page_number"],
+                        "extraction_method": page_result.get("extraction_method"),
+                        "extraction_reason": decision.get("reason"),
+                    },
+                })
+        elif page_text:
             all_text_elements.append({
                 "type": "text",
                 "text": page_text,
                 "metadata": {
                     "page_number": page_result.get("page_number"),
                     "extraction_method": page_result.get("extraction_method"),
+                    "extraction_reason": decision.get("reason"),
                 },
             })
     
-    # Extract carimbo from full text
-    from memorial_maker.extract.unstructured_extract import extract_carimbo_from_text
-    full_text = "\n".join([item["text"] for item in all_text_elements])
-    carimbo_info = extract_carimbo_from_text(full_text)
+    # Pages with coordinates get a spatial index; the carimbo of each page is
+    # read from its title-block region and every field is voted across pages
+    from memorial_maker.extract.carimbo_roi import carimbo_of_pages, page_carimbos
+    indexes = build_page_indexes(all_text_elements)
+    carimbo_pages = page_carimbos(all_text_elements, indexes)
+    carimbo_info = carimbo_of_pages(carimbo_pages)
     
     # Build result
     result = {
@@ -296,29 +470,45 @@ def extract_pdf_hybrid(
         "total_elements": len(all_text_elements),
         "text": all_text_elements,
         "tables": all_tables,
+        "pages": build_pages(indexes),
         "metadata": {
             "total_pages": pages_processed,
             "text_extracted_pages": text_extracted_pages,
             "ocr_pages": ocr_pages,
+            "carimbo_roi_pages": roi_pages,
             "cache_hits": cache_hits,
             "total_ocr_time": total_ocr_time,
+            "file_digest": manifest.get("file_digest"),
+            "page_manifest": manifest["pages"],
+            "failed_pages": [r["page_number"] for r in page_results if r.get("error")],
+            "extraction_decisions": [
+                {"page_number": page_number, **decision}
+                for page_number, decision in sorted(decisions.items())
+            ],
         },
         "carimbo": carimbo_info,
+        "carimbo_pages": carimbo_pages,
         "metrics": {
             "total_pages": pages_processed,
             "text_extracted_pages": text_extracted_pages,
             "ocr_pages": ocr_pages,
+            "carimbo_roi_pages": roi_pages,
+            "reused_pages": reused_pages,
             "cache_hits": cache_hits,
             "cache_hit_rate": cache_hits / ocr_pages if ocr_pages > 0 else 0.0,
+            "batched_ocr_pages": batched_ocr_pages,
+            "memory_cache_hits": memory_cache_hits,
+            "disk_cache_hits": disk_cache_hits,
+            "peak_rss_mb": max(peak_rss_values) if peak_rss_values else None,
+            "peak_rss_mb_by_page": {
+                r["page_number"]: r["peak_rss_mb"] for r in page_results if r.get("peak_rss_mb") is not None
+            },
             "total_ocr_time": total_ocr_time,
         },
     }
     
-    # Save JSON
-    output_json = output_dir / f"{pdf_path.stem}_optimized.json"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    with open(output_json, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    if save_json:
+        save_hybrid_json(result, output_dir, pdf_path)
     
     logger.info(
         f"Extracted {pages_processed} pages: {text_extracted_pages} native, "
@@ -328,155 +518,112 @@ def extract_pdf_hybrid(
     return result
 
 
-def extract_all_pdfs_optimized(
-    pdf_dir: Path,
+def extract_pdf_hybrid(
+    pdf_path: Path,
     output_dir: Path,
-    progress_callback: Optional[Callable[[int, int], None]] = None,
-) -> List[Dict[str, Any]]:
-    """Extract content from all PDFs using optimized parallel extraction.
+) -> Dict[str, Any]:
+    """Extract content from PDF using hybrid approach (text-first, OCR fallback).
     
     Args:
-        pdf_dir: Directory containing PDF files
+        pdf_path: Path to PDF file
         output_dir: Directory for output files
-        progress_callback: Optional callback for tracking progress (current, total)
         
     Returns:
-        List of extraction results
+        Dict with extracted data and metrics
     """
-    pdf_files = list(pdf_dir.glob("*.pdf"))
-    logger.info(f"Found {len(pdf_files)} PDFs in {pdf_dir}")
-    print(f"🔍 Encontrados {len(pdf_files)} PDFs em {pdf_dir}")  # Direct print for Streamlit
-    
-    if not pdf_files:
-        print("⚠️ Nenhum PDF encontrado!")
-        return []
+    logger.info(f"Extracting with hybrid approach: {pdf_path.name}")
     
-    results = []
+    # Open the PDF once to learn page count, text layers and image coverage
+    manifest = build_page_manifest(pdf_path)
     
-    # SOLUÇÃO DEFINITIVA: Usar 'spawn' em vez de 'fork' para ProcessPoolExecutor
-    # Fork() causa deadlock com bibliotecas que usam threads (PyTorch, OpenCV, etc)
-    # Spawn cria processos completamente novos, evitando herança de estado perigoso
+    # Classify pages up front so OCR pages never go through the fast partitioner
+    decisions = {page["page_number"]: plan_page(page) for page in manifest["pages"]}
     
-    # Determine number of workers
-    # Use CPU count but cap at 4 to balance speed and memory usage
-    max_workers = min(os.cpu_count() or 2, 4)
-    logger.info(f"Starting parallel extraction with {max_workers} workers using spawn context")
-    print(f"⚙️ Iniciando extração paralela com {max_workers} workers (modo spawn - seguro)")
+    # Native text of all text-layer pages comes back from one pass over the file;
+    # Unstructured is only needed for the pages that go to OCR
+    native_pages = [n for n, d in decisions.items() if d["strategy"] == "native"]
+    native_elements: Dict[int, List[Dict[str, Any]]] = {}
+    if native_pages:
+        native_elements = extract_native_elements_by_page(pdf_path, native_pages)
     
-    start_time = time.time()
-    
-    # Criar contexto de multiprocessing com spawn (não fork)
-    mp_context = multiprocessing.get_context('spawn')
-    
-    # Criar Manager para Queue compartilhada (para logs dos workers)
-    manager = multiprocessing.Manager()
-    log_queue = manager.Queue()
-    
-    # Thread para ler logs da queue em background
-    import threading
-    stop_log_thread = threading.Event()
-    
-    def log_reader():
-        """Lê mensagens da fila de log e imprime."""
-        while not stop_log_thread.is_set():
-            try:
-                msg = log_queue.get(timeout=0.5)
-                print(msg)
-            except:
-                continue  # Timeout ou fila vazia
-    
-    log_thread = threading.Thread(target=log_reader, daemon=True)
-    log_thread.start()
-    
-    # Use ProcessPoolExecutor com contexto spawn para paralelismo seguro
-    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
-        # Submit all tasks com a queue de log
-        future_to_file = {
-            executor.submit(extract_pdf_hybrid_wrapper, pdf_path, output_dir, log_queue): pdf_path
-            for pdf_path in pdf_files
-        }
+    page_results = []
+    ocr_pages = []
+    for page in manifest["pages"]:
+        page_num = page["page_number"]
         
-        # Process results as they complete
-        completed_count = 0
-        total_files = len(pdf_files)
+        if decisions[page_num]["strategy"] == "native":
+            elements = native_elements.get(page_num, [])
+            native_text = elements_text(elements)
+            if is_text_valid(native_text):
+                page_results.append(native_page_result(page_num, native_text, elements))
+                continue
+            decisions[page_num] = plan_ocr("native_text_invalid")
         
-        # TIMEOUT: Se um worker travar, detectamos aqui
-        TIMEOUT_PER_PDF = 300  # 5 minutos por PDF (bem generoso)
+        if decisions[page_num]["strategy"] == "carimbo_roi":
+            from memorial_maker.extract.carimbo_roi import extract_carimbo_roi
+            roi_result = extract_carimbo_roi(pdf_path, page, file_digest=manifest["file_digest"])
+            page_results.append(roi_page_result(page_num, roi_result))
+            continue
         
-        for future in as_completed(future_to_file, timeout=TIMEOUT_PER_PDF * len(pdf_files)):
-            pdf_path = future_to_file[future]
-            try:
-                # Timeout individual por future
-                result = future.result(timeout=TIMEOUT_PER_PDF)
-                results.append(result)
-                logger.info(f"Completed extraction for: {pdf_path.name}")
-                print(f"✅ Concluído: {pdf_path.name} ({completed_count + 1}/{total_files})")
-            except TimeoutError:
-                logger.error(f"TIMEOUT extracting {pdf_path.name} after {TIMEOUT_PER_PDF}s")
-                print(f"⏱️ TIMEOUT: {pdf_path.name} travou após {TIMEOUT_PER_PDF}s")
-                results.append({
-                    "filename": pdf_path.name,
-                    "error": f"Timeout after {TIMEOUT_PER_PDF}s",
-                    "text": [],
-                    "tables": [],
-                    "metadata": {},
-                    "carimbo": {}
-                })
-            except Exception as e:
-                logger.error(f"Failed to extract {pdf_path.name}: {e}")
-                print(f"❌ Erro ao extrair {pdf_path.name}: {e}")
-                # Add a dummy error result so we don't lose track of the file
-                results.append({
-                    "filename": pdf_path.name,
-                    "error": str(e),
-                    "text": [],
-                    "tables": [],
-                    "metadata": {},
-                    "carimbo": {}
-                })
-            
-            completed_count += 1
-            if progress_callback:
-                try:
-                    progress_callback(completed_count, total_files)
-                except Exception as e:
-                    logger.error(f"Error in progress callback: {e}")
-                    print(f"⚠️ Erro no callback de progresso: {e}")
-    
-    # Para thread de logs
-    stop_log_thread.set()
-    log_thread.join(timeout=2)
-    
-    total_time = time.time() - start_time
-    
-    # Aggregate metrics
-    total_pages = sum(r.get("metrics", {}).get("total_pages", 0) for r in results)
-    total_text_pages = sum(r.get("metrics", {}).get("text_extracted_pages", 0) for r in results)
-    total_ocr_pages = sum(r.get("metrics", {}).get("ocr_pages", 0) for r in results)
-    total_cache_hits = sum(r.get("metrics", {}).get("cache_hits", 0) for r in results)
-    total_ocr_time = sum(r.get("metrics", {}).get("total_ocr_time", 0.0) for r in results)
+        ocr_pages.append(page_num)
     
-    logger.info(
-        f"Total extraction ({total_time:.2f}s): {total_pages} pages ({total_text_pages} native, {total_ocr_pages} OCR), "
-        f"{(total_cache_hits/total_ocr_pages*100) if total_ocr_pages > 0 else 0:.1f}% cache hits, "
-        f"{total_ocr_time:.2f}s accumulated OCR time"
-    )
+    # Pages that need OCR go through the partitioner in batches
+    content_digests = {page["page_number"]: page.get("content_digest") for page in manifest["pages"]}
+    for batch in ocr_batches(ocr_pages):
+        ocr_results = extract_pages_with_ocr(
+            pdf_path, batch, manifest["file_digest"], content_digests
+        )
+        for page_num in batch:
+            page_results.append(ocr_page_result(page_num, ocr_results[page_num]))
     
-    # Print summary for Streamlit
-    print(f"\n📊 Extração concluída em {total_time:.2f}s:")
-    print(f"   • {total_pages} páginas processadas")
-    print(f"   • {total_text_pages} páginas com texto nativo")
-    print(f"   • {total_ocr_pages} páginas com OCR")
-    if total_ocr_pages > 0:
-        print(f"   • {(total_cache_hits/total_ocr_pages*100):.1f}% cache hits")
-        print(f"   • {total_ocr_time:.2f}s tempo total de OCR")
+    return build_hybrid_result(pdf_path, manifest, page_results, output_dir, decisions)
+
+
+def iter_extract_pdfs_optimized(
+    pdf_files: List[Path],
+    output_dir: Path,
+    event_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    incremental: Optional[ExtractionManifest] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Extract PDFs yielding page and file events as they complete.
     
-    # Save consolidated JSON
-    consolidated_json = output_dir / "all_extractions_optimized.json"
-    with open(consolidated_json, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    Consumers can start normalising early pages while OCR of later pages is
+    still running. See scheduler.iter_scheduled_extraction for the event format.
+    Runs the hybrid strategy of ExtractionEngine on the warm pool.
     
-    logger.info(f"Consolidated extraction saved: {consolidated_json}")
-    print(f"💾 Extração salva em: {consolidated_json}")
+    Args:
+        pdf_files: PDFs to extract
+        output_dir: Directory for output files
+        event_callback: Optional listener for worker events (see extract.events)
+        incremental: Manifest of the previous run (unchanged files and pages are reused)
+        
+    Yields:
+        Page and file event dicts
+    """
+    from memorial_maker.extract.engine import ExtractionEngine
     
-    return results
+    engine = ExtractionEngine(strategy="hybrid", executor="warm_pool")
+    yield from engine.iter_extract(pdf_files, output_dir, event_callback, incremental)
+
+
+def extract_all_pdfs_optimized(
+    pdf_dir: Path,
+    output_dir: Path,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Extract content from all PDFs using optimized parallel extraction.
+    
+    Runs the hybrid strategy of ExtractionEngine on the warm pool.
+    
+    Args:
+        pdf_dir: Directory containing PDF files
+        output_dir: Directory for output files
+        progress_callback: Optional callback called as pages complete (current, total)
+        
+    Returns:
+        List of extraction results
+    """
+    from memorial_maker.extract.engine import ExtractionEngine
+    
+    engine = ExtractionEngine(strategy="hybrid", executor="warm_pool")
+    return engine.extract_dir(pdf_dir, output_dir, progress_callback)
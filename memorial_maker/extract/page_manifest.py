@@ -0,0 +1,258 @@
+"""Single-pass page manifest for PDF files.
+
+Opens each PDF once and records, for every page, the information the hybrid
+pipeline needs to plan its work: page count, dimensions, text-layer presence,
+image coverage and a digest of the page content used as OCR cache key. Nothing
+here invokes the Unstructured partitioner.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, Any, Tuple
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+    PdfReader = None
+
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.ocr_cache import file_digest
+
+logger = get_logger("extract.manifest")
+
+# Operators we care about. Everything else (paths, colours, text positioning) is
+# skipped by the regex engine, which keeps the scan linear and in C even for the
+# multi-megabyte content streams of CAD exports.
+OPERATOR_RE = re.compile(rb"(cm|Do|TJ|Tj|q|Q|'|\")(?=[\s\[(</]|$)")
+NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+NAME_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s*$")
+STRING_RE = re.compile(rb"\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>")
+
+TEXT_OPERATORS = {b"Tj", b"TJ", b"'", b'"'}
+OPERATOR_PREFIX = b" \t\r\n\f\x00])>"
+
+# Operands of cm/Do never need more than this many bytes of look-behind
+OPERAND_WINDOW = 256
+
+# Nested form XObjects deeper than this are ignored (CAD exports rarely go past 3)
+MAX_FORM_DEPTH = 8
+
+IDENTITY_MATRIX = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Page classification thresholds. MIN_NATIVE_CHARS mirrors the minimum length of
+# is_text_valid; a fully rasterised page whose text layer is sparser than
+# MIN_TEXT_DENSITY glyphs per square inch is treated as a scan (stamp-only or
+# watermark text layers).
+MIN_NATIVE_CHARS = 50
+SCANNED_IMAGE_COVERAGE = 0.9
+MIN_TEXT_DENSITY = 1.0
+
+
+def _multiply(m1: Tuple[float, ...], m2: Tuple[float, ...]) -> Tuple[float, ...]:
+    """Multiply two PDF affine matrices (m1 applied first, then m2)."""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2,
+        a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2,
+        c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2,
+        e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _count_string_chars(segment: bytes) -> int:
+    """Approximate number of glyphs in the string operands of a segment."""
+    count = 0
+    for match in STRING_RE.finditer(segment):
+        token = match.group(0)
+        if token[:1] == b"(":
+            count += len(token) - 2
+        else:
+            count += len(re.sub(rb"\s", b"", token[1:-1])) // 2
+    return count
+
+
+def _walk_content(
+    data: bytes,
+    resources: Any,
+    ctm: Tuple[float, ...],
+    stats: Dict[str, Any],
+    depth: int = 0,
+) -> None:
+    """Scan a decoded content stream collecting text and image statistics.
+
+    Args:
+        data: Decoded content stream bytes
+        resources: Resources dictionary in effect for the stream
+        ctm: Current transformation matrix on entry
+        stats: Accumulator dict (text_chars, image_count, image_area, hasher)
+        depth: Form XObject nesting depth
+    """
+    if not data or depth > MAX_FORM_DEPTH:
+        return
+
+    stats["hasher"].update(data)
+
+    xobjects = {}
+    if resources is not None:
+        xobjects = resources.get_object().get("/XObject") or {}
+        xobjects = xobjects.get_object()
+
+    stack = []
+    current = ctm
+    segment_start = 0
+
+    for match in OPERATOR_RE.finditer(data):
+        start = match.start()
+        if start > 0 and data[start - 1] not in OPERATOR_PREFIX:
+            continue
+
+        operator = match.group(1)
+        window = data[max(segment_start, start - OPERAND_WINDOW):start]
+
+        if operator == b"q":
+            stack.append(current)
+        elif operator == b"Q":
+            if stack:
+                current = stack.pop()
+        elif operator == b"cm":
+            numbers = NUMBER_RE.findall(window)[-6:]
+            if len(numbers) == 6:
+                current = _multiply(tuple(float(n) for n in numbers), current)
+        elif operator in TEXT_OPERATORS:
+            stats["text_chars"] += _count_string_chars(data[segment_start:start])
+        elif operator == b"Do":
+            name_match = NAME_RE.search(window)
+            xobject = xobjects.get("/" + name_match.group(1).decode("latin-1")) if name_match else None
+            if xobject is not None:
+                _draw_xobject(xobject.get_object(), current, resources, stats, depth)
+
+        segment_start = match.end()
+
+
+def _draw_xobject(
+    xobject: Any,
+    ctm: Tuple[float, ...],
+    resources: Any,
+    stats: Dict[str, Any],
+    depth: int,
+) -> None:
+    """Account for an image or form XObject painted with the given CTM."""
+    subtype = xobject.get("/Subtype")
+
+    if subtype == "/Image":
+        # Raw (still encoded) image data is enough to identify the image
+        stats["hasher"].update(getattr(xobject, "_data", None) or xobject.get_data())
+        a, b, c, d, _, _ = ctm
+        stats["image_count"] += 1
+        stats["image_area"] += abs(a * d - b * c)
+    elif subtype == "/Form":
+        matrix = xobject.get("/Matrix")
+        form_ctm = ctm
+        if matrix is not None and len(matrix) == 6:
+            form_ctm = _multiply(tuple(float(v) for v in matrix), ctm)
+        _walk_content(
+            xobject.get_data(),
+            xobject.get("/Resources") or resources,
+            form_ctm,
+            stats,
+            depth + 1,
+        )
+
+
+def describe_page(page: Any, page_number: int) -> Dict[str, Any]:
+    """Build the manifest entry for a single page.
+
+    Args:
+        page: pypdf page object
+        page_number: Page number (0-indexed)
+
+    Returns:
+        Dict with page dimensions, text-layer and image statistics
+    """
+    width = float(page.mediabox.width)
+    height = float(page.mediabox.height)
+    page_area = width * height
+
+    rotation = int(page.get("/Rotate", 0) or 0)
+
+    stats = {"text_chars": 0, "image_count": 0, "image_area": 0.0, "hasher": hashlib.sha256()}
+    stats["hasher"].update(f"{width}x{height}@{rotation}".encode())
+    try:
+        contents = page.get_contents()
+        if contents is not None:
+            _walk_content(contents.get_data(), page.get("/Resources"), IDENTITY_MATRIX, stats)
+    except Exception as e:
+        logger.warning(f"Could not parse content stream of page {page_number}: {e}")
+
+    image_coverage = min(stats["image_area"] / page_area, 1.0) if page_area > 0 else 0.0
+
+    return {
+        "page_number": page_number,
+        "width": width,
+        "height": height,
+        "rotation": rotation,
+        "has_text_layer": stats["text_chars"] > 0,
+        "text_chars": stats["text_chars"],
+        "image_count": stats["image_count"],
+        "image_coverage": image_coverage,
+        "content_digest": stats["hasher"].hexdigest(),
+    }
+
+
+def classify_page(page: Dict[str, Any]) -> Dict[str, str]:
+    """Decide how a page should be extracted from its manifest statistics alone.
+
+    Args:
+        page: Page manifest entry
+
+    Returns:
+        Dict with "strategy" ("native" or "ocr") and a short "reason"
+    """
+    if not page["has_text_layer"]:
+        return {"strategy": "ocr", "reason": "no_text_layer"}
+
+    if page["text_chars"] < MIN_NATIVE_CHARS:
+        return {"strategy": "ocr", "reason": "sparse_text_layer"}
+
+    area = (page["width"] / 72.0) * (page["height"] / 72.0)
+    density = page["text_chars"] / area if area > 0 else 0.0
+    if page["image_coverage"] >= SCANNED_IMAGE_COVERAGE and density < MIN_TEXT_DENSITY:
+        return {"strategy": "ocr", "reason": "scanned_page"}
+
+    return {"strategy": "native", "reason": "text_layer"}
+
+
+def build_page_manifest(pdf_path: Path) -> Dict[str, Any]:
+    """Open a PDF once and describe all of its pages.
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        Dict with filename, file_digest, total_pages and a list of per-page entries
+    """
+    if not PYPDF_AVAILABLE:
+        raise ImportError("pypdf não está instalado. Execute: pip install unstructured[pdf]")
+
+    reader = PdfReader(str(pdf_path))
+    pages = [describe_page(page, i) for i, page in enumerate(reader.pages)]
+
+    manifest = {
+        "filename": pdf_path.name,
+        "file_digest": file_digest(pdf_path),
+        "total_pages": len(pages),
+        "pages": pages,
+    }
+
+    logger.debug(
+        f"Manifest for {pdf_path.name}: {len(pages)} pages, "
+        f"{sum(1 for p in pages if p['has_text_layer'])} with text layer"
+    )
+    return manifest
+
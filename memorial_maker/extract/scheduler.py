@@ -0,0 +1,531 @@
+"""Page-level task scheduler for batch PDF extraction.
+
+Breaks every PDF of a batch into page tasks, orders them longest-first by an
+estimated cost and feeds them to a worker pool. Page records are streamed to the
+caller as they complete, and per-file results are rebuilt in page order once all
+pages of a file are done, so one large sheet no longer keeps a single worker busy
+while the others sit idle.
+"""
+
+import time
+from concurrent.futures import Executor, Future, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator, Set
+
+from memorial_maker.config import settings
+from memorial_maker.extract import events
+from memorial_maker.extract.carimbo_roi import extract_carimbo_roi, parse_region
+from memorial_maker.extract.incremental import ExtractionManifest, page_digests, page_records_from_result
+from memorial_maker.extract.native_text import elements_text
+from memorial_maker.extract.optimized_extract import (
+    build_hybrid_result,
+    extract_native_elements_by_page,
+    extract_page_with_ocr,
+    extract_pages_with_ocr,
+    is_text_valid,
+    native_page_result,
+    ocr_batches,
+    ocr_page_result,
+    plan_ocr,
+    plan_page,
+    roi_page_result,
+)
+from memorial_maker.extract.page_manifest import build_page_manifest
+from memorial_maker.extract.supervisor import MemoryLimitExceeded, TaskTimeout, WorkerCrashed
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("extract.scheduler")
+
+# Reading a text layer costs a small fraction of rendering + OCR of the same area
+NATIVE_COST_FACTOR = 0.05
+
+# Time budget of a task: start-up allowance plus seconds per unit of estimated cost
+# (an A1 raster sheet on hi_res gets ~5 minutes, a text-layer file ~1 minute)
+TASK_BUDGET_BASE = 60.0
+SECONDS_PER_COST = 0.15
+
+# Executors that cannot kill a task (threads) are policed by the scheduler after
+# this extra grace, so a supervised pool always gets to act first
+DEADLINE_GRACE = 30.0
+
+# Strategy retried when a task times out or its worker dies; None = give up
+FALLBACK_KIND = {"native": "ocr", "ocr": "ocr_only"}
+
+
+def estimate_page_cost(page: Dict[str, Any], strategy: str) -> float:
+    """Estimate the relative cost of extracting a page.
+
+    Args:
+        page: Page manifest entry
+        strategy: "native", "ocr", "ocr_only" or "carimbo_roi"
+
+    Returns:
+        Relative cost (page area in square inches, weighted by extraction path)
+    """
+    area = (page["width"] / 72.0) * (page["height"] / 72.0)
+    if strategy == "native":
+        return area * NATIVE_COST_FACTOR
+    if strategy == "carimbo_roi":
+        x0, y0, x1, y1 = parse_region(settings.carimbo_region)
+        area *= (x1 - x0) * (y1 - y0)
+    # Rasterised content makes layout detection and OCR slower
+    return area * (1.0 + page["image_coverage"])
+
+
+def task_budget(task: Dict[str, Any]) -> float:
+    """Time budget in seconds for a task, derived from its estimated cost."""
+    return (TASK_BUDGET_BASE + task["cost"] * SECONDS_PER_COST) * settings.task_budget_scale
+
+
+def make_ocr_task(
+    pdf_path: Path,
+    manifest: Dict[str, Any],
+    page: Dict[str, Any],
+    kind: str = "ocr",
+) -> Dict[str, Any]:
+    """Create an OCR task for a single page.
+
+    Kinds: "ocr" (hi_res on the whole sheet), "ocr_only" (OCR without layout
+    detection, the timeout fallback) and "carimbo_roi" (title block only).
+    """
+    task = {
+        "kind": kind,
+        "pdf_path": str(pdf_path),
+        "page_numbers": [page["page_number"]],
+        "file_digest": manifest.get("file_digest"),
+        "content_digest": page.get("content_digest"),
+        "cost": estimate_page_cost(page, kind),
+    }
+    if kind == "carimbo_roi":
+        task["page"] = page
+    return task
+
+
+def make_ocr_batch_task(
+    pdf_path: Path,
+    manifest: Dict[str, Any],
+    pages: List[Dict[str, Any]],
+    kind: str = "ocr",
+) -> Dict[str, Any]:
+    """Create one OCR task for several pages of a file (a single partitioner call)."""
+    if len(pages) == 1:
+        return make_ocr_task(pdf_path, manifest, pages[0], kind)
+    return {
+        "kind": kind,
+        "pdf_path": str(pdf_path),
+        "page_numbers": [page["page_number"] for page in pages],
+        "file_digest": manifest.get("file_digest"),
+        "content_digests": {page["page_number"]: page.get("content_digest") for page in pages},
+        "cost": sum(estimate_page_cost(page, kind) for page in pages),
+    }
+
+
+def build_page_tasks(
+    manifests: Dict[Path, Dict[str, Any]],
+    decisions: Dict[Path, Dict[int, Dict[str, str]]],
+    skip: Optional[Dict[Path, Set[int]]] = None,
+) -> List[Dict[str, Any]]:
+    """Break a batch of PDFs into tasks ordered longest-first.
+
+    Pages classified as native are grouped into one native task per file (a
+    single pass reads them all); OCR pages are grouped per file into batches of
+    settings.ocr_batch_size pages (one partitioner call each) and every carimbo
+    region page becomes its own task.
+
+    Args:
+        manifests: Page manifest of each PDF, keyed by path
+        decisions: plan_page decision of each page, keyed by path and page number
+        skip: Pages that need no task (reused from a previous run), keyed by path
+
+    Returns:
+        List of task dicts sorted by descending estimated cost
+    """
+    tasks = []
+    skip = skip or {}
+
+    for pdf_path, manifest in manifests.items():
+        file_decisions = decisions[pdf_path]
+        pages = [p for p in manifest["pages"] if p["page_number"] not in skip.get(pdf_path, set())]
+        native_pages = [
+            p for p in pages
+            if file_decisions[p["page_number"]]["strategy"] == "native"
+        ]
+        if native_pages:
+            tasks.append({
+                "kind": "native",
+                "pdf_path": str(pdf_path),
+                "page_numbers": [p["page_number"] for p in native_pages],
+                "cost": sum(estimate_page_cost(p, "native") for p in native_pages),
+            })
+
+        ocr_pages: Dict[str, List[Dict[str, Any]]] = {}
+        for page in pages:
+            strategy = file_decisions[page["page_number"]]["strategy"]
+            if strategy == "carimbo_roi":
+                tasks.append(make_ocr_task(pdf_path, manifest, page, strategy))
+            elif strategy != "native":
+                ocr_pages.setdefault(strategy, []).append(page)
+
+        by_number = {page["page_number"]: page for page in pages}
+        for strategy, strategy_pages in ocr_pages.items():
+            for batch in ocr_batches([page["page_number"] for page in strategy_pages]):
+                tasks.append(make_ocr_batch_task(
+                    pdf_path, manifest, [by_number[n] for n in batch], strategy
+                ))
+
+    tasks.sort(key=lambda t: t["cost"], reverse=True)
+    return tasks
+
+
+def run_page_task(task: Dict[str, Any]) -> Any:
+    """Execute a page task inside a worker process.
+
+    Start, finish and failure are reported on the worker's event channel.
+
+    Args:
+        task: Task dict built by build_page_tasks
+
+    Returns:
+        Text-layer element records by page for native tasks, OCR results by
+        page for batched OCR tasks, OCR result dict for single-page OCR and
+        carimbo region tasks
+    """
+    pdf_path = Path(task["pdf_path"])
+    page_number = task["page_numbers"][0]
+    details = {"task_kind": task["kind"], "filename": pdf_path.name, "page_numbers": task["page_numbers"]}
+
+    events.emit(events.TASK_STARTED, **details)
+    start_time = time.time()
+    try:
+        if task["kind"] == "native":
+            outcome = extract_native_elements_by_page(pdf_path, task["page_numbers"])
+        elif task["kind"] == "carimbo_roi":
+            outcome = extract_carimbo_roi(pdf_path, task["page"], file_digest=task.get("file_digest"))
+        elif "content_digests" in task:
+            outcome = extract_pages_with_ocr(
+                pdf_path, task["page_numbers"], task.get("file_digest"), task["content_digests"],
+                strategy="ocr_only" if task["kind"] == "ocr_only" else "hi_res",
+            )
+        else:
+            outcome = extract_page_with_ocr(
+                pdf_path, page_number, task.get("file_digest"), task.get("content_digest"),
+                strategy="ocr_only" if task["kind"] == "ocr_only" else "hi_res",
+            )
+    except Exception as e:
+        events.emit(events.TASK_FAILED, error=str(e), **details)
+        raise
+
+    events.emit(events.TASK_FINISHED, elapsed=time.time() - start_time, **details)
+    return outcome
+
+
+def iter_scheduled_extraction(
+    pdf_files: List[Path],
+    output_dir: Path,
+    executor: Executor,
+    incremental: Optional[ExtractionManifest] = None,
+    save_json: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Extract a batch of PDFs, yielding results as soon as they are available.
+
+    Two kinds of events are yielded:
+
+    - ``{"event": "page", "pdf_path", "filename", "page", "completed_pages", "total_pages"}``
+      for every page record, in completion order;
+    - ``{"event": "file", "pdf_path", "filename", "result", "completed_files", "total_files"}``
+      once all pages of a file are done (or the file could not be read). Files
+      taken unchanged from a previous run carry ``"reused": True``.
+
+    Args:
+        pdf_files: PDFs to extract
+        output_dir: Directory for output files
+        executor: Worker pool that runs the page tasks
+        incremental: Manifest of the previous run; unchanged files and pages are
+            reused from it instead of being extracted
+        save_json: Save each file JSON as its result is built (see build_hybrid_result)
+
+    Yields:
+        Page and file event dicts
+    """
+    manifests: Dict[Path, Dict[str, Any]] = {}
+    decisions: Dict[Path, Dict[int, Dict[str, str]]] = {}
+    failed: Dict[Path, Dict[str, Any]] = {}
+    reused_files: Dict[Path, Dict[str, Any]] = {}
+    reused_pages: Dict[Path, List[Dict[str, Any]]] = {}
+
+    for pdf_path in pdf_files:
+        try:
+            if incremental is not None:
+                previous = incremental.unchanged_result(pdf_path)
+                if previous is not None:
+                    reused_files[pdf_path] = previous
+                    continue
+
+            manifests[pdf_path] = build_page_manifest(pdf_path)
+            decisions[pdf_path] = {
+                page["page_number"]: plan_page(page) for page in manifests[pdf_path]["pages"]
+            }
+
+            if incremental is not None:
+                previous = incremental.previous_result(pdf_path.name)
+                unchanged = incremental.unchanged_pages(pdf_path.name, page_digests(manifests[pdf_path]))
+                if previous and unchanged:
+                    records, previous_decisions = page_records_from_result(previous, unchanged)
+                    decisions[pdf_path].update(previous_decisions)
+                    reused_pages[pdf_path] = records
+                    incremental.reused_pages += len(records)
+                    logger.info(
+                        f"{pdf_path.name}: reusing {len(records)} unchanged pages, "
+                        f"extracting {manifests[pdf_path]['total_pages'] - len(records)}"
+                    )
+        except Exception as e:
+            logger.error(f"Failed to read {pdf_path.name}: {e}")
+            failed[pdf_path] = error_result(pdf_path, str(e))
+
+    page_results: Dict[Path, List[Dict[str, Any]]] = {pdf_path: [] for pdf_path in manifests}
+    remaining: Dict[Path, int] = {
+        pdf_path: manifest["total_pages"] for pdf_path, manifest in manifests.items()
+    }
+    total_files = len(pdf_files)
+    total_pages = sum(remaining.values())
+    progress = {"files": 0, "pages": 0}
+
+    def file_event(pdf_path: Path, result: Dict[str, Any], reused: bool = False) -> Dict[str, Any]:
+        progress["files"] += 1
+        event = {
+            "event": "file",
+            "pdf_path": str(pdf_path),
+            "filename": pdf_path.name,
+            "result": result,
+            "completed_files": progress["files"],
+            "total_files": total_files,
+        }
+        if reused:
+            event["reused"] = True
+        return event
+
+    def finish_pages(pdf_path: Path, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        batch = []
+        for record in records:
+            progress["pages"] += 1
+            batch.append({
+                "event": "page",
+                "pdf_path": str(pdf_path),
+                "filename": pdf_path.name,
+                "page": record,
+                "completed_pages": progress["pages"],
+                "total_pages": total_pages,
+            })
+
+        page_results[pdf_path].extend(records)
+        remaining[pdf_path] -= len(records)
+        if remaining[pdf_path] == 0:
+            result = build_hybrid_result(
+                pdf_path, manifests[pdf_path], page_results[pdf_path], output_dir,
+                decisions[pdf_path], save_json,
+            )
+            logger.info(f"Completed extraction for: {pdf_path.name} ({progress['files'] + 1}/{total_files})")
+            batch.append(file_event(pdf_path, result))
+        return batch
+
+    for pdf_path, result in failed.items():
+        yield file_event(pdf_path, result)
+
+    for pdf_path, result in reused_files.items():
+        logger.info(f"Reusing previous result of {pdf_path.name}")
+        yield file_event(pdf_path, result, reused=True)
+
+    # Files without pages are already complete
+    for pdf_path, manifest in manifests.items():
+        if manifest["total_pages"] == 0:
+            yield from finish_pages(pdf_path, [])
+
+    for pdf_path, records in reused_pages.items():
+        yield from finish_pages(pdf_path, records)
+
+    tasks = build_page_tasks(
+        manifests, decisions,
+        {pdf_path: {r["page_number"] for r in records} for pdf_path, records in reused_pages.items()},
+    )
+    logger.info(f"Scheduling {len(tasks)} page tasks for {len(manifests)} PDFs")
+
+    pending: Dict[Future, Dict[str, Any]] = {}
+    deadlines: Dict[Future, float] = {}
+
+    def submit(task: Dict[str, Any]):
+        budget = task_budget(task)
+        if hasattr(executor, "submit_with_budget"):
+            future = executor.submit_with_budget(budget, run_page_task, task)
+        else:
+            future = executor.submit(run_page_task, task)
+        pending[future] = task
+        deadlines[future] = time.monotonic() + budget + DEADLINE_GRACE
+
+    def retry_or_fail(pdf_path: Path, task: Dict[str, Any], reason: str) -> List[Dict[str, Any]]:
+        """Resubmit the pages of a timed-out/crashed task on the fallback strategy."""
+        next_kind = FALLBACK_KIND.get(task["kind"])
+        if next_kind is None:
+            logger.error(f"{task['kind']} task for {pdf_path.name} failed ({reason}), no fallback left")
+            return finish_pages(pdf_path, [
+                ocr_page_result(n, {"error": f"{task['kind']} {reason}"}) for n in task["page_numbers"]
+            ])
+
+        logger.warning(f"{task['kind']} task for {pdf_path.name} failed ({reason}), retrying as {next_kind}")
+        manifest = manifests[pdf_path]
+        for page_number in task["page_numbers"]:
+            if next_kind == "ocr":
+                decision = plan_ocr(f"{task['kind']}_{reason}")
+            else:
+                decision = {"strategy": next_kind, "reason": f"{task['kind']}_{reason}"}
+            decisions[pdf_path][page_number] = decision
+            submit(make_ocr_task(pdf_path, manifest, manifest["pages"][page_number], decision["strategy"]))
+        return []
+
+    for task in tasks:
+        submit(task)
+
+    while pending:
+        timeout = max(0.0, min(deadlines.values()) - time.monotonic())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            task = pending.pop(future)
+            deadlines.pop(future)
+            pdf_path = Path(task["pdf_path"])
+
+            try:
+                outcome = future.result()
+            except TaskTimeout:
+                yield from retry_or_fail(pdf_path, task, "timeout")
+                continue
+            except MemoryLimitExceeded:
+                yield from retry_or_fail(pdf_path, task, "memory")
+                continue
+            except WorkerCrashed:
+                yield from retry_or_fail(pdf_path, task, "crash")
+                continue
+            except Exception as e:
+                logger.error(f"Failed {task['kind']} task for {pdf_path.name}: {e}")
+                yield from finish_pages(pdf_path, [
+                    ocr_page_result(n, {"error": str(e)}) for n in task["page_numbers"]
+                ])
+                continue
+
+            # Peak RSS measured by a supervised worker while running the task
+            peak_rss = (getattr(future, "worker_stats", None) or {}).get("peak_rss_mb")
+
+            if task["kind"] in ("ocr", "ocr_only"):
+                if "content_digests" in task:
+                    records = [ocr_page_result(n, outcome[n]) for n in task["page_numbers"]]
+                else:
+                    records = [ocr_page_result(task["page_numbers"][0], outcome)]
+                yield from finish_pages(pdf_path, [with_peak_rss(r, peak_rss) for r in records])
+                continue
+
+            if task["kind"] == "carimbo_roi":
+                record = roi_page_result(task["page_numbers"][0], outcome)
+                yield from finish_pages(pdf_path, [with_peak_rss(record, peak_rss)])
+                continue
+
+            # Native task: keep valid pages, send the rest to OCR
+            records = []
+            manifest = manifests[pdf_path]
+            for page_number in task["page_numbers"]:
+                elements = outcome.get(page_number, [])
+                native_text = elements_text(elements)
+                if is_text_valid(native_text):
+                    records.append(with_peak_rss(
+                        native_page_result(page_number, native_text, elements), peak_rss
+                    ))
+                else:
+                    # The classifier was wrong about this page; record why it moved
+                    decision = plan_ocr("native_text_invalid")
+                    decisions[pdf_path][page_number] = decision
+                    submit(make_ocr_task(
+                        pdf_path, manifest, manifest["pages"][page_number], decision["strategy"]
+                    ))
+            if records:
+                yield from finish_pages(pdf_path, records)
+
+        # Executors that cannot kill a task get it abandoned past its deadline
+        now = time.monotonic()
+        for future in [f for f, deadline in deadlines.items() if deadline <= now]:
+            task = pending.pop(future)
+            deadlines.pop(future)
+            future.cancel()
+            yield from retry_or_fail(Path(task["pdf_path"]), task, "timeout")
+
+
+def run_scheduled_extraction(
+    pdf_files: List[Path],
+    output_dir: Path,
+    executor: Executor,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Extract a batch of PDFs by scheduling page tasks on an executor.
+
+    Args:
+        pdf_files: PDFs to extract
+        output_dir: Directory for output files
+        executor: Worker pool that runs the page tasks
+        progress_callback: Optional callback called as pages complete (current, total)
+
+    Returns:
+        List of extraction results, in the same order as pdf_files
+    """
+    return collect_results(
+        iter_scheduled_extraction(pdf_files, output_dir, executor),
+        pdf_files,
+        progress_callback,
+    )
+
+
+def collect_results(
+    stream: Iterable[Dict[str, Any]],
+    pdf_files: List[Path],
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    progress_unit: str = "pages",
+) -> List[Dict[str, Any]]:
+    """Drain an extraction event stream into file results ordered like pdf_files.
+
+    Args:
+        stream: Events from iter_scheduled_extraction (or the extraction service)
+        pdf_files: PDFs of the batch, in the desired result order
+        progress_callback: Optional callback called as work completes (current, total)
+        progress_unit: "pages" (page events) or "files" (file events)
+
+    Returns:
+        List of extraction results
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    progress_event = "page" if progress_unit == "pages" else "file"
+
+    for event in stream:
+        if event["event"] == progress_event and progress_callback:
+            try:
+                progress_callback(event[f"completed_{progress_unit}"], event[f"total_{progress_unit}"])
+            except Exception as e:
+                logger.error(f"Error in progress callback: {e}")
+        if event["event"] == "file":
+            results[event["pdf_path"]] = event["result"]
+
+    return [results[str(pdf_path)] for pdf_path in pdf_files if str(pdf_path) in results]
+
+
+def with_peak_rss(record: Dict[str, Any], peak_rss: Optional[float]) -> Dict[str, Any]:
+    """Attach the worker's peak RSS (MB) to a page record, when it was measured."""
+    if peak_rss is not None:
+        record["peak_rss_mb"] = round(peak_rss, 1)
+    return record
+
+
+def error_result(pdf_path: Path, error: str) -> Dict[str, Any]:
+    """Build the placeholder result for a file that could not be extracted."""
+    return {
+        "filename": pdf_path.name,
+        "error": error,
+        "text": [],
+        "tables": [],
+        "metadata": {},
+        "carimbo": {},
+    }
@@ -0,0 +1,290 @@
+"""Per-page spatial index over extracted text.
+
+Text elements that carry coordinates (text-layer lines from
+``extract.native_text`` or Unstructured elements with ``coordinates``
+metadata) are bucketed into a uniform grid over the sheet. A box query only
+visits the cells the box overlaps, so questions such as "text inside the title
+block" or "labels near this legend symbol" cost a handful of cell lookups
+instead of a scan over every line of the sheet.
+
+Boxes are ``(x0, y0, x1, y1)`` in PDF points with the origin at the top-left
+corner of the displayed sheet, the same space as the element coordinates.
+
+This module also builds the ``pages`` structure stored in extraction results::
+
+    [{"page_number": 0, "width": 2409.4, "height": 2267.6,
+      "pavimento": "PAVIMENTO TIPO",
+      "blocks": [{"text": "AP. 101", "bbox": [x0, y0, x1, y1], "font_size": 8.0}]}]
+"""
+
+import math
+import re
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("extract.spatial_index")
+
+Box = Tuple[float, float, float, float]
+
+# Cells per side of the grid (grid is GRID_CELLS x GRID_CELLS over the sheet)
+GRID_CELLS = 32
+
+# Sheet titles such as "PLANTA BAIXA PAVIMENTO TIPO" name the floor
+PAVIMENTO_TITLE_RE = re.compile(r"^\s*PLANTA\s+(?:BAIXA\s+)?(?:D[OA]\s+)?(.+?)\s*$", re.IGNORECASE)
+PAVIMENTO_WORD_RE = re.compile(r"PAVIMENTO|PAV\.|T[ÉE]RREO|SUBSOLO|COBERTURA|MEZANINO|TIPO|GARAGEM", re.IGNORECASE)
+
+
+def element_bbox(element: Dict[str, Any]) -> Optional[Box]:
+    """Bounding box of an element record from its coordinates metadata (None if absent)."""
+    coordinates = (element.get("metadata") or {}).get("coordinates")
+    if not coordinates or not coordinates.get("points"):
+        return None
+    xs = [point[0] for point in coordinates["points"]]
+    ys = [point[1] for point in coordinates["points"]]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _intersects(a: Box, b: Box) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _center_inside(box: Box, region: Box) -> bool:
+    cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    return region[0] <= cx <= region[2] and region[1] <= cy <= region[3]
+
+
+def _distance(a: Box, b: Box) -> float:
+    dx = max(b[0] - a[2], a[0] - b[2], 0.0)
+    dy = max(b[1] - a[3], a[1] - b[3], 0.0)
+    return math.hypot(dx, dy)
+
+
+class PageSpatialIndex:
+    """Índice espacial em grade uniforme dos elementos de texto de uma página."""
+
+    def __init__(
+        self,
+        elements: Iterable[Dict[str, Any]],
+        width: Optional[float] = None,
+        height: Optional[float] = None,
+        cells: int = GRID_CELLS,
+    ):
+        """Indexa os elementos que têm coordenadas.
+
+        Args:
+            elements: Registros de elementos ({"type", "text", "metadata"})
+            width: Largura da folha em pontos (padrão: layout_width dos elementos)
+            height: Altura da folha em pontos (padrão: layout_height dos elementos)
+            cells: Número de células por lado da grade
+        """
+        self.elements: List[Dict[str, Any]] = []
+        self.boxes: List[Box] = []
+        for element in elements:
+            box = element_bbox(element)
+            if box is None:
+                continue
+            if width is None or height is None:
+                coordinates = element["metadata"]["coordinates"]
+                width = width or coordinates.get("layout_width")
+                height = height or coordinates.get("layout_height")
+            self.elements.append(element)
+            self.boxes.append(box)
+
+        # Sheet size unknown (no layout size): fall back to the extent of the text
+        self.width = float(width or max((b[2] for b in self.boxes), default=1.0) or 1.0)
+        self.height = float(height or max((b[3] for b in self.boxes), default=1.0) or 1.0)
+        self.cells = cells
+        self._cell_w = self.width / cells
+        self._cell_h = self.height / cells
+
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, box in enumerate(self.boxes):
+            for cell in self._cells(box):
+                self._grid.setdefault(cell, []).append(i)
+
+    @classmethod
+    def from_page(cls, page: Dict[str, Any]) -> "PageSpatialIndex":
+        """Rebuild the index of a page from its "blocks" (see build_pages)."""
+        elements = []
+        for block in page.get("blocks", []):
+            x0, y0, x1, y1 = block["bbox"]
+            elements.append({
+                "type": "text",
+                "text": block["text"],
+                "metadata": {
+                    "font_size": block.get("font_size"),
+                    "coordinates": {"points": ((x0, y0), (x0, y1), (x1, y1), (x1, y0))},
+                },
+            })
+        return cls(elements, page.get("width"), page.get("height"))
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def _col(self, x: float) -> int:
+        return min(self.cells - 1, max(0, int(x // self._cell_w)))
+
+    def _row(self, y: float) -> int:
+        return min(self.cells - 1, max(0, int(y // self._cell_h)))
+
+    def _cells(self, box: Box) -> Iterable[Tuple[int, int]]:
+        for col in range(self._col(box[0]), self._col(box[2]) + 1):
+            for row in range(self._row(box[1]), self._row(box[3]) + 1):
+                yield (col, row)
+
+    def _candidates(self, box: Box) -> List[int]:
+        seen = set()
+        for cell in self._cells(box):
+            seen.update(self._grid.get(cell, ()))
+        return sorted(seen)
+
+    def query(self, box: Box, contained: bool = False) -> List[Dict[str, Any]]:
+        """Elements overlapping a box, in content order.
+
+        Args:
+            box: (x0, y0, x1, y1) in points, top-left origin
+            contained: Only elements whose centre lies inside the box
+
+        Returns:
+            Element records
+        """
+        test = _center_inside if contained else _intersects
+        return [self.elements[i] for i in self._candidates(box) if test(self.boxes[i], box)]
+
+    def region_box(self, region: Tuple[float, float, float, float]) -> Box:
+        """Convert a region given as fractions of the sheet into a box in points."""
+        x0, y0, x1, y1 = region
+        return (x0 * self.width, y0 * self.height, x1 * self.width, y1 * self.height)
+
+    def query_region(self, region: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+        """Elements whose centre lies in a region given as fractions of the sheet."""
+        return self.query(self.region_box(region), contained=True)
+
+    def near(self, box: Box, distance: float) -> List[Dict[str, Any]]:
+        """Elements within a distance (in points) of a box, nearest first."""
+        x0, y0, x1, y1 = box
+        grown = (x0 - distance, y0 - distance, x1 + distance, y1 + distance)
+        hits = [
+            (_distance(self.boxes[i], box), i) for i in self._candidates(grown)
+            if _distance(self.boxes[i], box) <= distance
+        ]
+        return [self.elements[i] for _, i in sorted(hits)]
+
+    def cluster(self, seed: Box, gap: float, limit: int = 500) -> Box:
+        """Grow a box from a seed over the text blocks that touch it.
+
+        Blocks closer than ``gap`` to a block already in the cluster join it, so
+        a legend or schedule heading grows into the box of the whole table
+        (the blank margin around it stops the growth).
+
+        Args:
+            seed: Box to start from (e.g. a table heading)
+            gap: Largest distance between neighbouring blocks, in points
+            limit: Largest number of blocks in the cluster
+
+        Returns:
+            Bounding box of the cluster
+        """
+        members = set()
+        frontier = [seed]
+        x0, y0, x1, y1 = seed
+        while frontier and len(members) < limit:
+            box = frontier.pop()
+            grown = (box[0] - gap, box[1] - gap, box[2] + gap, box[3] + gap)
+            for i in self._candidates(grown):
+                if i in members or _distance(self.boxes[i], box) > gap:
+                    continue
+                members.add(i)
+                frontier.append(self.boxes[i])
+                bx0, by0, bx1, by1 = self.boxes[i]
+                x0, y0, x1, y1 = min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1)
+        return (x0, y0, x1, y1)
+
+    def text_in(self, box: Box) -> str:
+        """Text of the elements centred in a box, in reading order (top to bottom, left to right)."""
+        hits = [
+            (round(self.boxes[i][1]), self.boxes[i][0], self.elements[i]["text"])
+            for i in self._candidates(box) if _center_inside(self.boxes[i], box)
+        ]
+        return "\n".join(text for _, _, text in sorted(hits))
+
+
+def group_elements_by_page(
+    elements: Iterable[Dict[str, Any]],
+    one_indexed: bool = False,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Group element records by page (0-indexed).
+
+    Args:
+        elements: Element records
+        one_indexed: Page numbers in the metadata start at 1 (Unstructured elements)
+    """
+    pages: Dict[int, List[Dict[str, Any]]] = {}
+    offset = 1 if one_indexed else 0
+    for element in elements:
+        page_number = (element.get("metadata") or {}).get("page_number")
+        if page_number is None:
+            page_number = offset
+        pages.setdefault(page_number - offset, []).append(element)
+    return pages
+
+
+def build_page_indexes(
+    elements: Iterable[Dict[str, Any]],
+    one_indexed: bool = False,
+) -> Dict[int, PageSpatialIndex]:
+    """Spatial index of every page that has text with coordinates."""
+    indexes = {}
+    for page_number, page_elements in group_elements_by_page(elements, one_indexed).items():
+        index = PageSpatialIndex(page_elements)
+        if len(index):
+            indexes[page_number] = index
+    return indexes
+
+
+def detect_pavimento(index: PageSpatialIndex) -> Optional[str]:
+    """Floor named by the sheet title ("PLANTA BAIXA <pavimento>").
+
+    The title is the drawing caption set in the largest font, so the candidate
+    with the largest font size wins over references in notes and legends.
+    """
+    best = None
+    for element in index.elements:
+        match = PAVIMENTO_TITLE_RE.match(element["text"])
+        if not match or not PAVIMENTO_WORD_RE.search(match.group(1)):
+            continue
+        size = element["metadata"].get("font_size") or 0.0
+        if best is None or size > best[0]:
+            best = (size, match.group(1).strip())
+    return best[1] if best else None
+
+
+def build_pages(indexes: Dict[int, PageSpatialIndex]) -> List[Dict[str, Any]]:
+    """Build the per-page "pages"/"blocks" structure of an extraction result.
+
+    Only pages with coordinates have an index; pages read by OCR have no layout.
+
+    Args:
+        indexes: Spatial index of each page (see build_page_indexes)
+
+    Returns:
+        List of page dicts (page_number, width, height, pavimento, blocks)
+    """
+    pages = []
+    for page_number, index in sorted(indexes.items()):
+        pages.append({
+            "page_number": page_number,
+            "width": index.width,
+            "height": index.height,
+            "pavimento": detect_pavimento(index),
+            "blocks": [
+                {
+                    "text": element["text"],
+                    "bbox": [round(v, 2) for v in box],
+                    "font_size": element["metadata"].get("font_size"),
+                }
+                for element, box in zip(index.elements, index.boxes)
+            ],
+        })
+    return pages
@@ -0,0 +1,418 @@
+"""Supervised process pool with per-task time budgets.
+
+``concurrent.futures.ProcessPoolExecutor`` cannot cancel a task once it runs:
+a worker stuck on a pathological sheet keeps its slot (and the executor's
+shutdown) forever. This pool owns its worker processes and talks to each one
+over a pipe, so the dispatcher thread always knows which task a worker is
+running and since when. A task that exceeds its budget gets its worker killed
+and replaced, and its future fails with :class:`TaskTimeout`; a worker that
+dies mid-task fails its future with :class:`WorkerCrashed`. Callers decide how
+to retry (see the fallback strategies in ``extract.scheduler``).
+"""
+
+import collections
+import itertools
+import pickle
+import threading
+import time
+from concurrent.futures import Executor, Future
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from memorial_maker.extract import events
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.memory import peak_rss_mb, process_rss_mb, reset_peak_rss
+
+logger = get_logger("extract.supervisor")
+
+# Seconds to wait for a worker to exit on its own before killing it
+JOIN_TIMEOUT = 5.0
+
+# How often busy workers' RSS is sampled when a ceiling is set
+RSS_CHECK_INTERVAL = 1.0
+
+# Idle workers above this fraction of the ceiling are recycled before the next task
+RSS_RECYCLE_FRACTION = 0.8
+
+
+class TaskTimeout(Exception):
+    """A task exceeded its time budget and its worker was killed."""
+
+
+class WorkerCrashed(Exception):
+    """The worker process running a task exited unexpectedly."""
+
+
+class MemoryLimitExceeded(WorkerCrashed):
+    """The worker running a task went over the RSS ceiling and was killed."""
+
+
+def _portable_exception(error: BaseException) -> BaseException:
+    """Return the exception itself if it survives pickling, else a RuntimeError copy."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def worker_main(
+    conn: Any,
+    initializer: Optional[Callable] = None,
+    initargs: Tuple = (),
+    max_tasks: int = 0,
+) -> None:
+    """Worker process loop: run tasks received on ``conn`` until told to stop.
+
+    Protocol (parent -> worker): ``(task_id, fn, args, kwargs)`` or ``None`` to stop.
+    Protocol (worker -> parent): ``("ready",)`` once initialised, then
+    ``(task_id, ok, value, stats)`` for each task, where stats holds the task's
+    wall time and peak RSS; ``("event", record)`` at any time (see
+    ``extract.events``).
+    """
+    # Task code may emit events from its own threads; every write takes this lock
+    send_lock = threading.Lock()
+    events.set_event_channel(conn, send_lock)
+    if initializer is not None:
+        initializer(*initargs)
+    with send_lock:
+        conn.send(("ready",))
+
+    completed = 0
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        task_id, fn, args, kwargs = message
+        reset_peak_rss()
+        start_time = time.time()
+        try:
+            ok, value = True, fn(*args, **kwargs)
+        except BaseException as e:
+            ok, value = False, _portable_exception(e)
+        stats = {"elapsed": time.time() - start_time, "peak_rss_mb": peak_rss_mb()}
+
+        with send_lock:
+            try:
+                conn.send((task_id, ok, value, stats))
+            except Exception as e:
+                # Result could not be pickled
+                conn.send((task_id, False, RuntimeError(f"Unpicklable task result: {e}"), stats))
+
+        completed += 1
+        if max_tasks and completed >= max_tasks:
+            break  # Recycled by the parent
+    conn.close()
+
+
+class _Worker:
+    """Estado de um processo worker no lado do pai."""
+
+    def __init__(self, process: Any, conn: Any):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        self.entry: Optional[Dict[str, Any]] = None
+        self.deadline: Optional[float] = None
+        self.completed = 0
+
+
+class SupervisedPool(Executor):
+    """Pool de processos supervisionado com orçamento de tempo por tarefa."""
+
+    def __init__(
+        self,
+        max_workers: int,
+        mp_context: Any,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        max_tasks_per_worker: int = 0,
+        max_rss_mb: float = 0,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """Inicializa pool.
+
+        Args:
+            max_workers: Número de processos
+            mp_context: Contexto de multiprocessing (spawn)
+            initializer: Função executada em cada worker ao iniciar
+            initargs: Argumentos do initializer
+            max_tasks_per_worker: Tarefas antes de reciclar um worker (0 = nunca)
+            max_rss_mb: Memória residente máxima por worker em MB (0 = sem limite)
+            on_event: Recebe os eventos emitidos nos workers (ver extract.events),
+                na thread do dispatcher
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.workers_started = 0
+        self.tasks_killed = 0
+        self.workers_recycled_for_memory = 0
+        self._context = mp_context
+        self._initializer = initializer
+        self._initargs = initargs
+        self._on_event = on_event
+        self._pending: Deque[Dict[str, Any]] = collections.deque()
+        self._workers: List[_Worker] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._cancel_on_shutdown = False
+        self._wake_reader, self._wake_writer = mp_context.Pipe(duplex=False)
+        self._thread = threading.Thread(target=self._dispatch_loop, name="supervised-pool", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ API
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Submete tarefa sem orçamento de tempo."""
+        return self.submit_with_budget(None, fn, *args, **kwargs)
+
+    def submit_with_budget(self, budget: Optional[float], fn: Callable, *args, **kwargs) -> Future:
+        """Submete tarefa que será interrompida após ``budget`` segundos de execução."""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._pending.append({
+                "id": next(self._ids),
+                "future": future,
+                "call": (fn, args, kwargs),
+                "budget": budget,
+            })
+        self._wake()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Encerra o pool depois das tarefas enviadas (como concurrent.futures.Executor).
+
+        Com cancel_futures, as tarefas pendentes são canceladas e as em execução
+        interrompidas (workers encerrados).
+        """
+        with self._lock:
+            self._shutdown = True
+            self._cancel_on_shutdown = cancel_futures
+        self._wake()
+        if wait:
+            self._thread.join()
+
+    # ----------------------------------------------------------- dispatcher
+
+    def _wake(self) -> None:
+        try:
+            self._wake_writer.send_bytes(b"!")
+        except OSError:
+            pass
+
+    def _start_worker(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=worker_main,
+            args=(child_conn, self._initializer, self._initargs, self.max_tasks_per_worker),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self.workers_started += 1
+        return _Worker(process, parent_conn)
+
+    def _stop_worker(self, worker: _Worker, kill: bool = False) -> None:
+        if kill:
+            worker.process.kill()
+        else:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        worker.process.join(JOIN_TIMEOUT)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.conn.close()
+
+    def _fail(self, worker: _Worker, error: BaseException) -> None:
+        """Fail the task a worker was running (if any)."""
+        if worker.entry is not None and not worker.entry["future"].done():
+            worker.entry["future"].set_exception(error)
+        worker.entry = None
+        worker.deadline = None
+
+    def _retiring(self, worker: _Worker) -> bool:
+        """Worker reached its task limit and is about to exit on its own."""
+        return bool(self.max_tasks_per_worker) and worker.completed >= self.max_tasks_per_worker
+
+    def _assign(self, worker: _Worker) -> None:
+        """Hand the next pending task to an idle worker."""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                entry = self._pending.popleft()
+            if not entry["future"].set_running_or_notify_cancel():
+                continue  # Cancelled while queued
+            fn, args, kwargs = entry["call"]
+            try:
+                worker.conn.send((entry["id"], fn, args, kwargs))
+            except Exception as e:
+                entry["future"].set_exception(_portable_exception(e))
+                continue
+            worker.entry = entry
+            worker.deadline = time.monotonic() + entry["budget"] if entry["budget"] else None
+            return
+
+    def _handle_reply(self, worker: _Worker) -> bool:
+        """Read one message from a worker; False once its pipe is closed (worker gone)."""
+        try:
+            message = worker.conn.recv()
+        except (EOFError, OSError):
+            return False
+
+        if message[0] == "ready":
+            worker.ready = True
+            return True
+        if message[0] == "event":
+            if self._on_event is not None:
+                try:
+                    self._on_event(message[1])
+                except Exception as e:
+                    logger.error(f"Error handling worker event: {e}")
+            return True
+
+        task_id, ok, value, stats = message
+        entry = worker.entry
+        worker.entry = None
+        worker.deadline = None
+        worker.completed += 1
+        if entry is None or entry["id"] != task_id or entry["future"].done():
+            return True
+        # Futures carry no metadata slot; callers read this attribute if present
+        entry["future"].worker_stats = stats
+        if ok:
+            entry["future"].set_result(value)
+        else:
+            entry["future"].set_exception(value)
+        return True
+
+    def _dispatch_loop(self) -> None:
+        try:
+            self._run()
+        except Exception as e:
+            logger.error(f"Supervised pool dispatcher failed: {e}")
+        finally:
+            self._close()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                shutting_down = self._shutdown
+                has_pending = bool(self._pending)
+
+            if shutting_down:
+                if self._cancel_on_shutdown:
+                    return
+                if not has_pending and not any(w.entry for w in self._workers):
+                    return
+
+            # Keep the pool at full size (dead and recycled workers are replaced)
+            while (not shutting_down or has_pending) and len(self._workers) < self.max_workers:
+                self._workers.append(self._start_worker())
+
+            for worker in self._workers:
+                if worker.ready and worker.entry is None and not self._retiring(worker):
+                    self._assign(worker)
+
+            now = time.monotonic()
+            deadlines = [w.deadline for w in self._workers if w.deadline is not None]
+            if self.max_rss_mb and any(w.entry for w in self._workers):
+                deadlines.append(now + RSS_CHECK_INTERVAL)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+
+            handles = [self._wake_reader]
+            for worker in self._workers:
+                handles.extend([worker.conn, worker.process.sentinel])
+            ready = wait_connections(handles, timeout=timeout)
+
+            if self._wake_reader in ready:
+                while self._wake_reader.poll():
+                    self._wake_reader.recv_bytes()
+
+            # Workers whose pipe hit EOF are gone even if the sentinel is not ready yet
+            lost = set()
+            for worker in self._workers:
+                if worker.conn in ready and not self._handle_reply(worker):
+                    lost.add(id(worker))
+
+            now = time.monotonic()
+            for worker in list(self._workers):
+                if id(worker) in lost or worker.process.sentinel in ready or not worker.process.is_alive():
+                    # Drain the reply and events sent right before exiting (recycling);
+                    # at EOF poll() stays true, so stop at the first failed read
+                    while worker.conn.poll():
+                        if not self._handle_reply(worker):
+                            break
+                    if worker.entry is not None:
+                        logger.error(
+                            f"Worker {worker.process.pid} exited with code "
+                            f"{worker.process.exitcode} while running a task"
+                        )
+                        self._fail(worker, WorkerCrashed(
+                            f"Worker {worker.process.pid} exited with code {worker.process.exitcode}"
+                        ))
+                    # Replaced at the top of the loop
+                    self._stop_worker(worker, kill=worker.process.is_alive())
+                    self._workers.remove(worker)
+
+                elif worker.deadline is not None and now >= worker.deadline:
+                    budget = worker.entry["budget"]
+                    logger.warning(f"Task exceeded {budget:.0f}s budget, killing worker {worker.process.pid}")
+                    self.tasks_killed += 1
+                    self._fail(worker, TaskTimeout(f"Task exceeded its {budget:.0f}s budget"))
+                    self._stop_worker(worker, kill=True)
+                    self._workers.remove(worker)
+
+                elif self.max_rss_mb:
+                    self._check_memory(worker)
+
+    def _check_memory(self, worker: _Worker) -> None:
+        """Kill a busy worker over the RSS ceiling; recycle an idle one close to it."""
+        rss = process_rss_mb(worker.process.pid)
+        if rss is None:
+            return
+
+        if worker.entry is not None and rss > self.max_rss_mb:
+            logger.warning(
+                f"Worker {worker.process.pid} using {rss:.0f} MB (limit {self.max_rss_mb:.0f} MB), killing it"
+            )
+            self.tasks_killed += 1
+            self._fail(worker, MemoryLimitExceeded(
+                f"Worker used {rss:.0f} MB, above the {self.max_rss_mb:.0f} MB limit"
+            ))
+            self._stop_worker(worker, kill=True)
+            self._workers.remove(worker)
+
+        elif worker.entry is None and worker.ready and rss > self.max_rss_mb * RSS_RECYCLE_FRACTION:
+            logger.info(f"Recycling worker {worker.process.pid} ({rss:.0f} MB resident)")
+            self.workers_recycled_for_memory += 1
+            self._stop_worker(worker)
+            self._workers.remove(worker)
+
+    def _close(self) -> None:
+        """Stop all workers and fail whatever is left."""
+        for worker in self._workers:
+            running = worker.entry is not None
+            self._fail(worker, WorkerCrashed("Pool shut down"))
+            self._stop_worker(worker, kill=running)
+        self._workers.clear()
+
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        for entry in pending:
+            entry["future"].cancel()
+
+        self._wake_reader.close()
+        self._wake_writer.close()
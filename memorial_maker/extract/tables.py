@@ -0,0 +1,344 @@
+"""Table extraction stage.
+
+Running ``partition_pdf(infer_table_structure=True)`` on whole sheets makes the
+layout model look for tables across an A0/A1 drawing, most of which is floor
+plan. Tables on these sheets are the legend, the revision box and the sheet
+list, and each of them starts with a heading ("SIMBOLOGIA / LEGENDA",
+"QUADRO DE CONTROLE DE PROJETO", "LISTA DE PRANCHAS"...). This stage finds
+those headings on the page layout (``pages``/``blocks`` of the text result;
+font sizes of the text layer, or line heights of the boxes for Unstructured
+elements, which carry no font size), grows each one into the box of its table with the page's spatial index and
+runs table detection on that crop only. Pages without layout (OCR pages) are
+flagged when their text has such a heading and are read whole.
+
+Each region is one task, so regions of all pages and files run in parallel on
+the extraction executor. Results are cached per page content and region in the
+table cache, apart from the OCR text cache.
+"""
+
+import io
+import re
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+try:
+    from unstructured.partition.pdf import partition_pdf
+    UNSTRUCTURED_AVAILABLE = True
+except ImportError:
+    UNSTRUCTURED_AVAILABLE = False
+    partition_pdf = None
+
+from memorial_maker.config import settings
+from memorial_maker.extract import events
+from memorial_maker.extract.spatial_index import PageSpatialIndex
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.ocr_cache import file_digest as compute_file_digest
+from memorial_maker.utils.ocr_cache import get_cache_key, get_table_cache
+from memorial_maker.utils.pdf_crop import Region, crop_page_pdf
+
+logger = get_logger("extract.tables")
+
+# Headings that open a table on a drawing sheet
+TABLE_HEADING_RE = re.compile(
+    r"^\s*(?:SIMBOLOGIA|LEGENDA|QUADRO|TABELA|LISTA|QUANTITATIVO|RESUMO|PLANILHA)\b",
+    re.IGNORECASE,
+)
+
+# Blocks closer than this many (median) font sizes belong to the same table
+TABLE_GAP = 3.0
+# Regions with fewer blocks than this are captions, not tables
+MIN_TABLE_BLOCKS = 4
+# Time budget of a region task (hi_res layout on a crop)
+TABLE_TASK_BUDGET = 120.0
+
+FULL_PAGE: Region = (0.0, 0.0, 1.0, 1.0)
+
+
+def table_strategies() -> List[str]:
+    """Extraction strategies that run the table stage (settings.table_strategies)."""
+    return [name.strip() for name in settings.table_strategies.split(",") if name.strip()]
+
+
+def _block_sizes(index: PageSpatialIndex) -> List[float]:
+    """Text size of each block of a page.
+
+    The font size when the extraction has one (text layer); otherwise
+    (Unstructured elements, in PixelSpace) the line height of the block's box.
+    """
+    sizes = [e["metadata"].get("font_size") or 0.0 for e in index.elements]
+    if any(sizes):
+        return sizes
+    return [
+        (box[3] - box[1]) / (element["text"].count("\n") + 1)
+        for element, box in zip(index.elements, index.boxes)
+    ]
+
+
+def find_table_regions(index: PageSpatialIndex) -> List[Region]:
+    """Regions of a page that hold a table, as fractions of the sheet.
+
+    A heading is a block starting with a table word and set larger than the
+    page's body text (see _block_sizes); its table is the cluster of blocks
+    around it.
+
+    Args:
+        index: Spatial index of the page
+
+    Returns:
+        List of (x0, y0, x1, y1) regions (top-left origin), overlapping ones merged
+    """
+    sizes = _block_sizes(index)
+    if not sizes:
+        return []
+    body_size = statistics.median(sizes) or 1.0
+    gap = TABLE_GAP * body_size
+
+    boxes = []
+    for element, box, size in zip(index.elements, index.boxes, sizes):
+        if size <= body_size or not TABLE_HEADING_RE.match(element["text"]):
+            continue
+        cluster = index.cluster(box, gap)
+        if len(index.query(cluster, contained=True)) < MIN_TABLE_BLOCKS:
+            continue
+        # Table rules usually sit a little outside the text
+        boxes.append((cluster[0] - gap, cluster[1] - gap, cluster[2] + gap, cluster[3] + gap))
+
+    merged: List[List[float]] = []
+    for box in sorted(boxes):
+        for other in merged:
+            if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]:
+                other[:] = [min(other[0], box[0]), min(other[1], box[1]),
+                            max(other[2], box[2]), max(other[3], box[3])]
+                break
+        else:
+            merged.append(list(box))
+
+    return [
+        (
+            round(max(0.0, x0 / index.width), 4),
+            round(max(0.0, y0 / index.height), 4),
+            round(min(1.0, x1 / index.width), 4),
+            round(min(1.0, y1 / index.height), 4),
+        )
+        for x0, y0, x1, y1 in merged
+    ]
+
+
+def _ocr_pages_with_tables(result: Dict[str, Any], pages_with_layout: Iterable[int]) -> List[int]:
+    """Pages of a hybrid result read by OCR whose text has a table heading."""
+    skip = set(pages_with_layout)
+    flagged = set()
+    for element in result.get("text", []):
+        metadata = element.get("metadata") or {}
+        page_number = metadata.get("page_number")
+        if metadata.get("extraction_method") != "ocr" or page_number in skip:
+            continue
+        if any(TABLE_HEADING_RE.match(line) for line in element["text"].splitlines()):
+            flagged.add(page_number)
+    return sorted(flagged)
+
+
+def plan_table_tasks(pdf_path: Path, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Table region tasks of an extraction result.
+
+    Args:
+        pdf_path: Path to PDF file
+        result: Extraction result of the file (hybrid or Unstructured)
+
+    Returns:
+        List of task dicts, one per region
+    """
+    metadata = result.get("metadata") or {}
+    content_digests = {
+        page["page_number"]: page.get("content_digest") for page in metadata.get("page_manifest", [])
+    }
+
+    regions: List[Tuple[int, Region]] = []
+    for page in result.get("pages", []):
+        for region in find_table_regions(PageSpatialIndex.from_page(page)):
+            regions.append((page["page_number"], region))
+    pages_with_layout = [page["page_number"] for page in result.get("pages", [])]
+    for page_number in _ocr_pages_with_tables(result, pages_with_layout):
+        regions.append((page_number, FULL_PAGE))
+
+    if not regions:
+        return []
+
+    file_digest = metadata.get("file_digest")
+    if file_digest is None and any(content_digests.get(n) is None for n, _ in regions):
+        file_digest = compute_file_digest(pdf_path)
+
+    return [
+        {
+            "kind": "table",
+            "pdf_path": str(pdf_path),
+            "page_numbers": [page_number],
+            "region": region,
+            "file_digest": file_digest,
+            "content_digest": content_digests.get(page_number),
+        }
+        for page_number, region in regions
+    ]
+
+
+def table_cache_key(task: Dict[str, Any]) -> str:
+    """Cache key of a table region: page content, region and table model."""
+    region = ",".join(map(str, task["region"]))
+    return get_cache_key(
+        task["file_digest"],
+        task["page_numbers"][0],
+        f"{settings.ocr_config_version}:tables:{settings.unstructured_model_name}:{region}",
+        task.get("content_digest"),
+    )
+
+
+def run_table_task(task: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Detect the tables of one page region inside a worker.
+
+    Args:
+        task: Task dict built by plan_table_tasks
+
+    Returns:
+        Table records ({"type": "table", "text", "html", "metadata"})
+    """
+    if not UNSTRUCTURED_AVAILABLE:
+        raise ImportError("Unstructured não está instalado. Esta dependência é obrigatória para tabelas.")
+
+    pdf_path = Path(task["pdf_path"])
+    page_number = task["page_numbers"][0]
+    cache = get_table_cache()
+    cache_key = table_cache_key(task)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached["tables"]
+
+    details = {"task_kind": "table", "filename": pdf_path.name, "page_numbers": task["page_numbers"]}
+    events.emit(events.TASK_STARTED, **details)
+    start_time = time.time()
+    try:
+        if tuple(task["region"]) == FULL_PAGE:
+            from memorial_maker.extract.incremental import subset_pdf
+            data = subset_pdf(pdf_path, [page_number])
+        else:
+            data = crop_page_pdf(pdf_path, page_number, tuple(task["region"]))
+        elements = partition_pdf(
+            file=io.BytesIO(data),
+            strategy="hi_res",
+            infer_table_structure=True,
+            languages=["por"],
+            model_name=settings.unstructured_model_name,
+        )
+    except Exception as e:
+        events.emit(events.TASK_FAILED, error=str(e), **details)
+        raise
+
+    tables = [
+        {
+            "type": "table",
+            "text": str(element),
+            "html": getattr(element.metadata, "text_as_html", None),
+            "metadata": {
+                "page_number": page_number + 1,
+                "filename": pdf_path.name,
+                "table_region": list(task["region"]),
+            },
+        }
+        for element in elements
+        if type(element).__name__ == "Table"
+    ]
+    cache.set(cache_key, {"tables": tables})
+
+    events.emit(events.TASK_FINISHED, elapsed=time.time() - start_time, **details)
+    return tables
+
+
+def merge_tables(result: Dict[str, Any], page_numbers: Iterable[int], tables: List[Dict[str, Any]]) -> None:
+    """Replace the tables of the given pages (0-indexed) of a result with the stage output."""
+    pages = set(page_numbers)
+    kept = [
+        t for t in result.get("tables", [])
+        if ((t.get("metadata") or {}).get("page_number") or 1) - 1 not in pages
+    ]
+    combined = kept + tables
+    combined.sort(key=lambda t: (t.get("metadata") or {}).get("page_number") or 0)
+    result["tables"] = combined
+    result["total_elements"] = len(result.get("text", [])) + len(combined)
+
+
+def iter_with_tables(
+    stream: Iterable[Dict[str, Any]],
+    executor: Executor,
+) -> Iterator[Dict[str, Any]]:
+    """Run the table stage on the results of an extraction event stream.
+
+    Page events pass through. The table regions of a file are submitted to the
+    executor as soon as its file event arrives, while other files are still
+    being extracted; the file event is held back until its tables are merged
+    into the result. Files reused from a previous run keep their tables.
+
+    Args:
+        stream: Page/file events (see scheduler.iter_scheduled_extraction)
+        executor: Worker pool that runs the region tasks
+
+    Yields:
+        The same events, file results with their tables
+    """
+    pending: Dict[Future, str] = {}
+    held: Dict[str, Dict[str, Any]] = {}
+
+    def submit(task: Dict[str, Any]) -> Future:
+        if hasattr(executor, "submit_with_budget"):
+            return executor.submit_with_budget(
+                TABLE_TASK_BUDGET * settings.task_budget_scale, run_table_task, task
+            )
+        return executor.submit(run_table_task, task)
+
+    def release(finished: List[Future]) -> Iterator[Dict[str, Any]]:
+        for future in finished:
+            filename = pending.pop(future)
+            entry = held[filename]
+            try:
+                entry["tables"].extend(future.result())
+            except Exception as e:
+                logger.warning(f"Table detection failed for {filename}: {e}")
+            entry["remaining"] -= 1
+            if entry["remaining"] == 0:
+                del held[filename]
+                event = entry["event"]
+                merge_tables(event["result"], entry["pages"], entry["tables"])
+                print(f"📋 {filename}: {len(entry['tables'])} tabelas")
+                yield event
+
+    for event in stream:
+        result = event.get("result") or {}
+        if event["event"] != "file" or event.get("reused") or result.get("error"):
+            yield event
+            continue
+
+        try:
+            tasks = plan_table_tasks(Path(event["pdf_path"]), result)
+        except Exception as e:
+            logger.warning(f"Could not plan table regions of {event['filename']}: {e}")
+            tasks = []
+        if not tasks:
+            yield event
+            continue
+
+        logger.info(f"{event['filename']}: {len(tasks)} table regions")
+        held[event["filename"]] = {
+            "event": event,
+            "remaining": len(tasks),
+            "tables": [],
+            "pages": {task["page_numbers"][0] for task in tasks},
+        }
+        for task in tasks:
+            pending[submit(task)] = event["filename"]
+
+        yield from release([f for f in list(pending) if f.done()])
+
+    while pending:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        yield from release(list(done))
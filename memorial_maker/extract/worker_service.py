@@ -0,0 +1,425 @@
+"""Long-lived extraction worker service with a warm OCR pool.
+
+Spawned workers import Unstructured and load the hi_res layout model once, in
+the pool initializer, and are recycled after ``settings.ocr_worker_max_pages``
+page tasks to bound memory growth. Workers are supervised (see
+``extract.supervisor``): a task that overruns its time budget or the RSS
+ceiling (``settings.ocr_worker_max_rss_mb``) gets its worker killed and
+replaced, and the worker count is capped by available memory. The pool can be used in-process (the
+Streamlit app keeps it between clicks) or behind a local IPC listener so that
+the UI and batch scripts share the same warm workers:
+
+    python -m memorial_maker.extract.worker_service
+
+Requests are pickled, so a client that authenticates can run code in the
+service. The authentication key is random, created on the first start in
+``settings.ocr_service_key_file`` (readable by its owner only), and the
+service refuses the public default key of earlier versions. Paths sent by
+clients must lie under ``settings.ocr_service_root``.
+"""
+
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Executor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Iterator
+
+from memorial_maker.config import settings
+from memorial_maker.extract import events
+from memorial_maker.extract.supervisor import SupervisedPool, TaskTimeout, WorkerCrashed
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.memory import recommended_workers
+
+logger = get_logger("extract.worker_service")
+
+# Set inside each worker once its models are loaded
+_WORKER_WARM = False
+
+# Public default authkey of earlier versions; never accepted
+INSECURE_AUTHKEYS = {"memorial-maker"}
+
+
+def warm_up_worker(model_name: Optional[str] = None) -> None:
+    """Pool initializer: import Unstructured and preload the layout model."""
+    global _WORKER_WARM
+
+    start_time = time.time()
+    try:
+        from unstructured.partition.pdf import partition_pdf  # noqa: F401
+        from unstructured_inference.models.base import get_model
+
+        # get_model caches the model at module level, so later hi_res calls reuse it
+        get_model(model_name or settings.unstructured_model_name)
+        _WORKER_WARM = True
+        logger.info(f"Worker {os.getpid()} warm in {time.time() - start_time:.1f}s")
+        events.emit(events.WORKER_READY, elapsed=time.time() - start_time)
+    except Exception as e:
+        logger.warning(f"Worker {os.getpid()} could not preload models: {e}")
+
+
+def ping_worker() -> Dict[str, Any]:
+    """Health-check task executed inside a worker."""
+    return {"pid": os.getpid(), "warm": _WORKER_WARM}
+
+
+class WarmPool(Executor):
+    """Pool de processos persistente com modelos pré-carregados."""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pages_per_worker: Optional[int] = None):
+        """Inicializa pool.
+
+        Args:
+            max_workers: Número de workers (padrão: settings.ocr_workers)
+            max_pages_per_worker: Tarefas antes de reciclar um worker
+                (padrão: settings.ocr_worker_max_pages)
+        """
+        # CPU count and available memory cap the configured worker count
+        self.max_workers = recommended_workers(max_workers or settings.ocr_workers)
+        self.max_pages_per_worker = max_pages_per_worker or settings.ocr_worker_max_pages
+        self.tasks_submitted = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+        # One dispatcher for the pool's lifetime; restarted workers report to it too
+        self.events = events.EventDispatcher()
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> SupervisedPool:
+        """Cria pool supervisionado com contexto spawn e reciclagem de workers."""
+        logger.info(f"Starting warm pool with {self.max_workers} workers")
+        return SupervisedPool(
+            self.max_workers,
+            self._context,
+            initializer=warm_up_worker,
+            initargs=(settings.unstructured_model_name,),
+            max_tasks_per_worker=self.max_pages_per_worker,
+            max_rss_mb=settings.ocr_worker_max_rss_mb,
+            on_event=self.events.dispatch,
+        )
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Submete tarefa ao pool."""
+        return self.submit_with_budget(None, fn, *args, **kwargs)
+
+    def submit_with_budget(self, budget: Optional[float], fn: Callable, *args, **kwargs):
+        """Submete tarefa com orçamento de tempo; o worker é substituído se estourar."""
+        with self._lock:
+            self.tasks_submitted += 1
+            executor = self._executor
+        return executor.submit_with_budget(budget, fn, *args, **kwargs)
+
+    def health_check(self, timeout: float = 30.0) -> Dict[str, Any]:
+        """Verifica se os workers respondem e se os modelos estão carregados.
+
+        Args:
+            timeout: Tempo máximo de espera pela resposta dos workers
+
+        Returns:
+            Dicionário com status do pool
+        """
+        status = {
+            "alive": False,
+            "workers": self.max_workers,
+            "tasks_submitted": self.tasks_submitted,
+            "uptime": time.time() - self.started_at,
+            "responses": [],
+        }
+        try:
+            futures = [
+                self._executor.submit_with_budget(timeout, ping_worker) for _ in range(self.max_workers)
+            ]
+            status["responses"] = [f.result(timeout=timeout) for f in futures]
+            status["alive"] = True
+        except (FuturesTimeoutError, TaskTimeout, WorkerCrashed) as e:
+            logger.error(f"Warm pool health check timed out: {e}")
+            status["error"] = str(e)
+        except Exception as e:
+            logger.error(f"Warm pool health check failed: {e}")
+            status["error"] = str(e)
+        status["warm"] = any(r.get("warm") for r in status["responses"])
+        return status
+
+    def restart(self) -> None:
+        """Descarta os workers atuais e inicia um pool novo."""
+        with self._lock:
+            old_executor = self._executor
+            self._executor = self._create_executor()
+            self.started_at = time.time()
+        old_executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Encerra o pool (ver SupervisedPool.shutdown)."""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+_warm_pool: Optional[WarmPool] = None
+_warm_pool_lock = threading.Lock()
+_warm_pool_suspect = False
+
+
+def get_warm_pool() -> WarmPool:
+    """Retorna o pool persistente do processo, criando-o na primeira chamada.
+
+    O health check só roda depois de um erro (ver report_warm_pool_error): um
+    pool ocupado com outro lote não responde dentro do prazo e não deve ser
+    recriado no meio do lote.
+    """
+    global _warm_pool, _warm_pool_suspect
+    with _warm_pool_lock:
+        if _warm_pool is None:
+            _warm_pool = WarmPool()
+        elif _warm_pool_suspect:
+            if not _warm_pool.health_check(timeout=settings.ocr_service_health_timeout)["alive"]:
+                logger.warning("Warm pool unhealthy, restarting workers")
+                _warm_pool.restart()
+        _warm_pool_suspect = False
+        return _warm_pool
+
+
+def report_warm_pool_error(error: BaseException) -> None:
+    """Marca o pool persistente para um health check na próxima chamada de get_warm_pool."""
+    global _warm_pool_suspect
+    logger.warning(f"Extraction on the warm pool failed, checking its health on next use: {error}")
+    _warm_pool_suspect = True
+
+
+def get_service_address() -> tuple:
+    """Endereço local do serviço de extração."""
+    return (settings.ocr_service_host, settings.ocr_service_port)
+
+
+def service_authkey(create: bool = False) -> bytes:
+    """Chave de autenticação do serviço de extração.
+
+    Usa settings.ocr_service_authkey quando definida; senão lê o arquivo de
+    chave, que o serviço cria com uma chave aleatória no primeiro start.
+
+    Args:
+        create: Cria o arquivo de chave se ele não existir (só o serviço)
+
+    Raises:
+        ValueError: Chave padrão pública configurada
+        PermissionError: Arquivo de chave legível por outros usuários
+        FileNotFoundError: Arquivo de chave inexistente (serviço nunca iniciado)
+    """
+    if settings.ocr_service_authkey:
+        if settings.ocr_service_authkey in INSECURE_AUTHKEYS:
+            raise ValueError("OCR_SERVICE_AUTHKEY usa a chave padrão pública; defina outra ou deixe vazia")
+        return settings.ocr_service_authkey.encode()
+
+    path = Path(settings.ocr_service_key_file)
+    if create and not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # Created by a concurrent start
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            logger.info(f"Extraction service key created at {path}")
+
+    if os.stat(path).st_mode & 0o077:
+        raise PermissionError(f"Arquivo de chave do serviço {path} acessível por outros usuários (use chmod 600)")
+    return path.read_text().strip().encode()
+
+
+def check_service_path(path: str) -> Path:
+    """Caminho de uma requisição, recusado se estiver fora de settings.ocr_service_root."""
+    resolved = Path(path).resolve()
+    root = Path(settings.ocr_service_root).resolve()
+    if not resolved.is_relative_to(root):
+        raise PermissionError(f"Caminho fora da raiz do serviço ({root}): {path}")
+    return resolved
+
+
+def _handle_connection(
+    conn, pool: WarmPool, stop_event: threading.Event, address: tuple, authkey: bytes
+) -> None:
+    """Atende requisições de um cliente até a conexão fechar."""
+    from memorial_maker.extract.incremental import ExtractionManifest, pipeline_signature
+    from memorial_maker.extract.scheduler import iter_scheduled_extraction
+
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+
+            op = request.get("op")
+
+            if op == "ping":
+                conn.send({"event": "pong", "status": pool.health_check()})
+
+            elif op == "extract":
+                try:
+                    pdf_files = [check_service_path(p) for p in request["pdf_files"]]
+                    output_dir = check_service_path(request["output_dir"])
+                    incremental = None
+                    if request.get("incremental"):
+                        incremental = ExtractionManifest(
+                            check_service_path(request["incremental"]), pipeline_signature("optimized")
+                        )
+                    # Page and file events are forwarded as soon as they are produced
+                    for event in iter_scheduled_extraction(pdf_files, output_dir, pool, incremental):
+                        conn.send(event)
+                    conn.send({"event": "done"})
+                except Exception as e:
+                    logger.error(f"Extraction job failed: {e}")
+                    conn.send({"event": "error", "error": str(e)})
+
+            elif op == "shutdown":
+                conn.send({"event": "bye"})
+                stop_event.set()
+                # Wake up the accept() loop in serve() so it can see the stop flag
+                try:
+                    Client(address, authkey=authkey).close()
+                except (OSError, AuthenticationError):
+                    pass
+                break
+
+            else:
+                conn.send({"event": "error", "error": f"Unknown op: {op}"})
+    finally:
+        conn.close()
+
+
+def serve(address: Optional[tuple] = None) -> None:
+    """Executa o serviço de extração até receber 'shutdown'.
+
+    Args:
+        address: (host, porta) para escutar (padrão: settings)
+    """
+    address = address or get_service_address()
+    # Before starting workers: a missing or unsafe key stops the service here
+    authkey = service_authkey(create=True)
+    pool = WarmPool()
+    stop_event = threading.Event()
+
+    # Warm the workers before accepting jobs
+    logger.info(f"Warm pool status: {pool.health_check(timeout=600)}")
+
+    listener = Listener(address, authkey=authkey)
+    logger.info(f"Extraction service listening on {address[0]}:{address[1]}")
+    print(f"🚀 Serviço de extração ouvindo em {address[0]}:{address[1]}")
+
+    try:
+        while not stop_event.is_set():
+            try:
+                conn = listener.accept()
+            except AuthenticationError as e:
+                logger.warning(f"Rejected connection: {e}")
+                continue
+            if stop_event.is_set():
+                conn.close()
+                break
+            threading.Thread(
+                target=_handle_connection,
+                args=(conn, pool, stop_event, address, authkey),
+                daemon=True,
+            ).start()
+    finally:
+        listener.close()
+        pool.shutdown(cancel_futures=True)
+
+
+class ExtractionServiceClient:
+    """Cliente do serviço de extração local."""
+
+    def __init__(self, address: Optional[tuple] = None):
+        """Inicializa cliente.
+
+        Args:
+            address: (host, porta) do serviço (padrão: settings)
+        """
+        self.address = address or get_service_address()
+
+    def _connect(self):
+        return Client(self.address, authkey=service_authkey())
+
+    def ping(self) -> Optional[Dict[str, Any]]:
+        """Retorna o status do pool do serviço, ou None se indisponível."""
+        try:
+            with self._connect() as conn:
+                conn.send({"op": "ping"})
+                return conn.recv().get("status")
+        except (OSError, EOFError, AuthenticationError):
+            return None
+
+    def iter_extract(
+        self,
+        pdf_files: List[Path],
+        output_dir: Path,
+        incremental_json: Optional[Path] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Submete um lote de PDFs ao serviço e devolve os eventos à medida que chegam.
+
+        Args:
+            pdf_files: PDFs a extrair (caminhos acessíveis pelo serviço)
+            output_dir: Diretório de saída
+            incremental_json: JSON consolidado da execução anterior, para reaproveitar
+                arquivos e páginas sem alteração (ver extract.incremental)
+
+        Yields:
+            Eventos de página e de arquivo (ver scheduler.iter_scheduled_extraction)
+        """
+        # The service sees absolute paths; events are reported with the caller's paths
+        originals = {str(Path(p).resolve()): str(p) for p in pdf_files}
+
+        with self._connect() as conn:
+            conn.send({
+                "op": "extract",
+                "pdf_files": list(originals),
+                "output_dir": str(Path(output_dir).resolve()),
+                "incremental": str(Path(incremental_json).resolve()) if incremental_json else None,
+            })
+            while True:
+                message = conn.recv()
+                event = message.get("event")
+                if event in ("page", "file"):
+                    message["pdf_path"] = originals.get(message["pdf_path"], message["pdf_path"])
+                    yield message
+                elif event == "done":
+                    return
+                else:
+                    raise RuntimeError(f"Extraction service error: {message.get('error')}")
+
+    def extract(
+        self,
+        pdf_files: List[Path],
+        output_dir: Path,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Submete um lote de PDFs ao serviço e aguarda os resultados.
+
+        Args:
+            pdf_files: PDFs a extrair (caminhos acessíveis pelo serviço)
+            output_dir: Diretório de saída
+            progress_callback: Função opcional para reportar progresso por página (current, total)
+
+        Returns:
+            Lista de resultados de extração
+        """
+        from memorial_maker.extract.scheduler import collect_results
+
+        return collect_results(self.iter_extract(pdf_files, output_dir), pdf_files, progress_callback)
+
+    def shutdown(self) -> None:
+        """Pede ao serviço para encerrar."""
+        with self._connect() as conn:
+            conn.send({"op": "shutdown"})
+            conn.recv()
+
+
+if __name__ == "__main__":
+    from memorial_maker.utils.logging import setup_logging
+
+    setup_logging()
+    serve()
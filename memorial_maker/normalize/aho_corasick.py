@@ -0,0 +1,149 @@
+"""Aho–Corasick automaton for multi-pattern search.
+
+All patterns are compiled into one trie with failure links, so a single scan
+of a text reports every occurrence of every pattern in O(len(text) + matches),
+whatever the number of patterns. ``CanonicalMapper`` uses it to find the
+variants of ``CANONICAL_KEYS`` in a line instead of testing each variant in
+turn.
+
+Matches are filtered to whole words (see ``find``) and resolved leftmost-longest:
+in "cabo coaxial rg6" the variant "coaxial rg6" wins over "rg6", and "tv col"
+does not match inside "tv coletiva".
+"""
+
+from collections import deque
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+# (start, end, value) of a match; text[start:end] is the pattern
+Match = Tuple[int, int, Any]
+
+# Characters that continue a number ("1/2" is not a match inside "11/20" or "1/2,5")
+NUMBER_CHARS = "/,."
+
+
+def _continues(edge: str, neighbour: str) -> bool:
+    """Whether a neighbouring character continues the word or number at a pattern edge."""
+    if edge.isdigit():
+        return neighbour.isalnum() or neighbour in NUMBER_CHARS
+    return edge.isalnum() and neighbour.isalnum()
+
+
+class AhoCorasick:
+    """Autômato de Aho–Corasick sobre um conjunto fixo de padrões."""
+
+    def __init__(self, patterns: Dict[str, Any]):
+        """Compila os padrões.
+
+        Args:
+            patterns: Dicionário padrão -> valor devolvido nas ocorrências
+        """
+        # State 0 is the root; each state has its transitions, failure link and
+        # the (length, value) of the patterns that end there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self._edges: Dict[str, Tuple[str, str]] = {}
+
+        for pattern, value in patterns.items():
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(pattern), value))
+            self._edges[pattern] = (pattern[0], pattern[-1])
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        """Set the failure links and fold them into the transitions.
+
+        States are visited breadth-first, so the failure state of a state is
+        complete before the state itself. Copying its transitions turns the
+        trie into a DFA: the scan never follows failure links, it does one dict
+        lookup per character (characters of no pattern go back to the root).
+        """
+        order = []
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                # Patterns ending at the failure state also end here
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [{} for _ in order]
+        for state in order:
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+
+    def __len__(self) -> int:
+        return len(self._edges)
+
+    def iter_matches(self, text: str) -> Iterator[Match]:
+        """Every occurrence of every pattern, overlapping ones included, by end position."""
+        delta, out = self._delta, self._out
+        state = 0
+        for i, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if out[state]:
+                for length, value in out[state]:
+                    yield (i + 1 - length, i + 1, value)
+
+    def find(self, text: str, whole_words: bool = True) -> List[Match]:
+        """Non-overlapping matches, leftmost-longest, in text order.
+
+        Args:
+            text: Text to scan (already normalised like the patterns)
+            whole_words: Drop matches that start or end inside a word or number
+                ("tel" in "hotel", "1/2" in "11/20"); a boundary is only checked
+                where the pattern starts or ends with a letter or digit
+
+        Returns:
+            List of (start, end, value)
+        """
+        matches = []
+        for start, end, value in self.iter_matches(text):
+            if whole_words:
+                first, last = self._edges[text[start:end]]
+                if start > 0 and _continues(first, text[start - 1]):
+                    continue
+                if end < len(text) and _continues(last, text[end]):
+                    continue
+            matches.append((start, end, value))
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        last_end = 0
+        for match in matches:
+            if match[0] >= last_end:
+                selected.append(match)
+                last_end = match[1]
+        return selected
+
+    def find_values(self, text: str, whole_words: bool = True) -> List[Any]:
+        """Values of the matches of a text (see find), in text order."""
+        return [value for _, _, value in self.find(text, whole_words)]
+
+
+def substring_index(patterns: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+    """Map every substring of the patterns to the value of the first pattern containing it.
+
+    Answers "is this text part of some pattern?" with one dict lookup.
+    """
+    index: Dict[str, Any] = {}
+    for pattern, value in patterns:
+        for i in range(len(pattern)):
+            for j in range(i + 1, len(pattern) + 1):
+                index.setdefault(pattern[i:j], value)
+    return index
@@ -1,18 +1,139 @@
 """Mapeamento para chaves canônicas e normalização."""
 
 import re
-from typing import Dict, List, Optional, Any
-from memorial_maker.config import CANONICAL_KEYS, REGEX_PATTERNS
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+from memorial_maker.config import CANONICAL_KEYS, REGEX_PATTERNS, settings
+from memorial_maker.normalize.aho_corasick import AhoCorasick, substring_index
 from memorial_maker.utils.logging import get_logger
 
 logger = get_logger("normalize.canonical")
 
 
+def _line_pattern(pattern: str, flags: int = 0) -> "re.Pattern":
+    r"""Compila um padrão de linha para uso num buffer com várias linhas.
+    
+    \s vira [^\S\n]: espaços continuam casando, mas nenhum casamento
+    atravessa o fim de uma linha.
+    """
+    return re.compile(pattern.replace(r"\s", r"[^\S\n]"), flags)
+
+
+# Padrões lidos em cada linha pelo ItemExtractor (grupo 1 = valor)
+LINE_PATTERNS = {
+    "quantidade": _line_pattern(r"(\d+)\s*(?:un|unid|unidades?|pontos?|pçs?)", re.IGNORECASE),
+    "altura": _line_pattern(REGEX_PATTERNS["altura"]),
+    "diametro_mm": _line_pattern(REGEX_PATTERNS["diametro_mm"]),
+    "diametro_pol": _line_pattern(REGEX_PATTERNS["diametro_pol"]),
+    "divisor": _line_pattern(REGEX_PATTERNS["divisor"]),
+}
+
+CABOS = ("cat6", "rg6_u90", "cci2")
+
+
+def _line_starts(lines: List[str]) -> List[int]:
+    """Posição de início de cada linha no buffer com as linhas unidas por quebra de linha."""
+    return [0] + list(accumulate(len(line) + 1 for line in lines))[:-1]
+
+
+class LineMemo:
+    """Memo limitado (LRU) da análise de cada linha normalizada.
+    
+    As pranchas de um projeto repetem a mesma legenda ("PONTO RJ-45 H=0,30m",
+    "CABO CAT6"), então a maior parte das linhas já foi analisada. Os
+    resultados são devolvidos sem cópia; quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, max_entries: int):
+        """Inicializa memo.
+        
+        Args:
+            max_entries: Número máximo de linhas guardadas (0 = sem memo)
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(
+        self,
+        keys: List[str],
+        compute: Callable[[List[str]], List[Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """Resultado de cada chave, calculando de uma vez só as que faltam.
+        
+        Args:
+            keys: Linhas normalizadas (podem se repetir)
+            compute: Função que analisa uma lista de linhas distintas
+            
+        Returns:
+            Resultado de cada chave, na ordem de keys
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    results[key] = entry
+        
+        if missing:
+            results.update(zip(missing, compute(missing)))
+        
+        with self._lock:
+            for key in missing:
+                self._entries[key] = results[key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            # Repetições dentro do mesmo lote também contam como acerto
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return [results[key] for key in keys]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_line_memo: Optional[LineMemo] = None
+
+
+def get_line_memo() -> LineMemo:
+    """Memo de linhas do processo, compartilhado por ItemExtractor e normalize_all_items."""
+    global _line_memo
+    if _line_memo is None:
+        _line_memo = LineMemo(settings.line_memo_size)
+    return _line_memo
+
+
 class CanonicalMapper:
     """Mapeia termos variados para chaves canônicas."""
 
-    def __init__(self):
-        """Inicializa mapeador."""
+    def __init__(self, memo: Optional[LineMemo] = None):
+        """Inicializa mapeador.
+        
+        Args:
+            memo: Memo da análise de linhas (padrão: o memo do processo); todo
+                mapeador usa as mesmas chaves, então o memo pode ser compartilhado
+        """
+        self.memo = memo if memo is not None else get_line_memo()
         self.canonical_map = CANONICAL_KEYS
         self.regex_patterns = REGEX_PATTERNS
         
@@ -21,66 +142,128 @@ class CanonicalMapper:
         for canonical, variants in self.canonical_map.items():
             for variant in variants:
                 self.reverse_map[variant.lower()] = canonical
+        
+        # Autômato com todas as variantes (busca de todas numa passada) e
+        # índice dos trechos de variantes (termos curtos como "tv ass")
+        self.automaton = AhoCorasick(self.reverse_map)
+        self.fragments = substring_index(self.reverse_map.items())
 
     def normalize_text(self, text: str) -> str:
         """Normaliza texto para busca."""
-        text = text.lower()
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        return text
+        return " ".join(text.lower().split())
 
-    def find_canonical(self, text: str) -> Optional[str]:
-        """Encontra chave canônica para um termo.
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """Análise de um texto (ver analyze_lines), pelo memo de linhas."""
+        return self.memo.resolve([self.normalize_text(text)], self.analyze_lines)[0]
+
+    def analyze_lines(self, lines: List[str]) -> List[Dict[str, Any]]:
+        """Analisa linhas normalizadas, numa passada por padrão.
+        
+        As linhas são unidas num só buffer; cada padrão de LINE_PATTERNS e o
+        autômato das variantes varrem o buffer uma vez, e cada ocorrência é
+        atribuída à sua linha por busca binária nos inícios de linha. Como em
+        re.search por linha, vale a primeira ocorrência de cada padrão na linha.
         
         Args:
-            text: Termo a normalizar
+            lines: Linhas já normalizadas (ver normalize_text)
             
         Returns:
-            Chave canônica ou None
+            Para cada linha: chaves canônicas citadas ("canonical"), chave do termo
+            ("match", ver find_canonical), quantidade, altura_m, mm, polegadas e divisor
         """
-        text_norm = self.normalize_text(text)
+        buffer = "\n".join(lines)
+        starts = _line_starts(lines)
         
-        # Busca exata
-        if text_norm in self.reverse_map:
-            return self.reverse_map[text_norm]
+        groups: Dict[str, List[Optional[str]]] = {}
+        for name, pattern in LINE_PATTERNS.items():
+            column: List[Optional[str]] = [None] * len(lines)
+            for match in pattern.finditer(buffer):
+                i = bisect_right(starts, match.start()) - 1
+                if column[i] is None:
+                    column[i] = match.group(1)
+            groups[name] = column
         
-        # Busca parcial
-        for variant, canonical in self.reverse_map.items():
-            if variant in text_norm or text_norm in variant:
-                return canonical
+        canonical: List[List[str]] = [[] for _ in lines]
+        for start, _, key in self.automaton.find(buffer):
+            hits = canonical[bisect_right(starts, start) - 1]
+            if key not in hits:
+                hits.append(key)
         
-        return None
+        results = []
+        for i, line in enumerate(lines):
+            altura = groups["altura"][i]
+            results.append({
+                "canonical": canonical[i],
+                "match": self._match(line, canonical[i]),
+                "quantidade": int(groups["quantidade"][i]) if groups["quantidade"][i] else None,
+                "altura_m": float(altura.replace(",", ".")) if altura else None,
+                "mm": int(groups["diametro_mm"][i]) if groups["diametro_mm"][i] else None,
+                "polegadas": groups["diametro_pol"][i],
+                "divisor": f"div_1_{groups['divisor'][i]}" if groups["divisor"][i] else None,
+            })
+        return results
 
-    def extract_diametro(self, text: str) -> Optional[Dict[str, Any]]:
-        """Extrai diâmetro em mm e polegadas."""
-        result = {}
+    def find_all_canonical(self, text: str) -> List[str]:
+        """Encontra todas as chaves canônicas citadas num texto, numa passada.
         
-        # Milímetros
-        match = re.search(self.regex_patterns["diametro_mm"], text)
-        if match:
-            result["mm"] = int(match.group(1))
+        Variantes são casadas como palavras inteiras; entre variantes
+        sobrepostas vale a mais longa (ex.: "coaxial rg6" e não "rg6").
         
-        # Polegadas
-        match = re.search(self.regex_patterns["diametro_pol"], text)
-        if match:
-            result["polegadas"] = match.group(1)
+        Args:
+            text: Texto a processar (ex.: uma linha)
+            
+        Returns:
+            Chaves canônicas na ordem do texto, sem repetição
+        """
+        return self._canonical_keys(self.normalize_text(text))
+
+    def _canonical_keys(self, line: str) -> List[str]:
+        """Chaves canônicas citadas numa linha normalizada, na ordem do texto."""
+        return list(dict.fromkeys(key for _, _, key in self.automaton.find(line)))
+
+    def _match(self, line: str, canonical: List[str]) -> Optional[str]:
+        """Chave do termo de uma linha normalizada, dadas as chaves citadas nela."""
+        if line in self.reverse_map:
+            return self.reverse_map[line]
+        if canonical:
+            return canonical[0]
+        return self.fragments.get(line) if line else None
+
+    def find_canonical(self, text: str) -> Optional[str]:
+        """Encontra chave canônica para um termo.
         
+        Busca exata; depois a primeira variante citada no texto; depois o
+        termo como parte de uma variante. Só o autômato roda (sem os padrões
+        de LINE_PATTERNS da análise completa).
+        
+        Args:
+            text: Termo a normalizar
+            
+        Returns:
+            Chave canônica ou None
+        """
+        line = self.normalize_text(text)
+        if line in self.reverse_map:
+            return self.reverse_map[line]
+        return self._match(line, self._canonical_keys(line))
+
+    def extract_diametro(self, text: str) -> Optional[Dict[str, Any]]:
+        """Extrai diâmetro em mm e polegadas (ver analyze_lines)."""
+        analysis = self.analyze(text)
+        result = {}
+        if analysis["mm"] is not None:
+            result["mm"] = analysis["mm"]
+        if analysis["polegadas"] is not None:
+            result["polegadas"] = analysis["polegadas"]
         return result if result else None
 
     def extract_altura(self, text: str) -> Optional[float]:
-        """Extrai altura em metros."""
-        match = re.search(self.regex_patterns["altura"], text)
-        if match:
-            altura_str = match.group(1).replace(",", ".")
-            return float(altura_str)
-        return None
+        """Extrai altura em metros (ver analyze_lines)."""
+        return self.analyze(text)["altura_m"]
 
     def extract_divisor(self, text: str) -> Optional[str]:
-        """Extrai tipo de divisor (1/2, 1/3, etc.)."""
-        match = re.search(self.regex_patterns["divisor"], text)
-        if match:
-            return f"div_1_{match.group(1)}"
-        return None
+        """Extrai tipo de divisor (1/2, 1/3, etc.), sem diferenciar maiúsculas (ver analyze_lines)."""
+        return self.analyze(text)["divisor"]
 
     def extract_data(self, text: str) -> Optional[str]:
         """Extrai data no formato DD/MM/AAAA."""
@@ -107,18 +290,19 @@ class CanonicalMapper:
         """
         normalized = {}
         
+        # Chaves e valores se repetem em todos os itens: busca pelo memo de linhas
         for key, value in raw_item.items():
             if not value:
                 continue
             
             # Tenta mapear chave
-            canonical_key = self.find_canonical(key)
+            canonical_key = self.analyze(key)["match"]
             if canonical_key:
                 key = canonical_key
             
             # Tenta mapear valor (para tipos de pontos, cabos, etc.)
             if isinstance(value, str):
-                canonical_value = self.find_canonical(value)
+                canonical_value = self.analyze(value)["match"]
                 if canonical_value:
                     value = canonical_value
             
@@ -130,9 +314,13 @@ class CanonicalMapper:
 class ItemExtractor:
     """Extrai itens estruturados de texto/tabelas."""
 
-    def __init__(self):
-        """Inicializa extrator."""
-        self.mapper = CanonicalMapper()
+    def __init__(self, memo: Optional[LineMemo] = None):
+        """Inicializa extrator.
+        
+        Args:
+            memo: Memo da análise de linhas (padrão: o memo do processo)
+        """
+        self.mapper = CanonicalMapper(memo)
 
     def extract_from_text(self, text: str, page_context: Dict = None) -> List[Dict[str, Any]]:
         """Extrai itens de texto livre.
@@ -144,21 +332,66 @@ class ItemExtractor:
         Returns:
             Lista de itens extraídos
         """
+        return self.extract_batch([(text, page_context)])
+
+    def extract_batch(self, documents: Iterable[Tuple[str, Optional[Dict]]]) -> List[Dict[str, Any]]:
+        """Extrai itens de vários textos (ex.: todos os PDFs de um projeto) de uma vez.
+        
+        As linhas de todos os textos são processadas juntas (ver match_lines) e
+        cada texto passa pela mesma máquina de estados de extract_from_text,
+        começando sem item aberto.
+        
+        Args:
+            documents: Pares (texto, contexto da página)
+            
+        Returns:
+            Itens extraídos, na ordem dos textos
+        """
+        lines: List[str] = []
+        segments = []
+        for text, page_context in documents:
+            start = len(lines)
+            lines.extend(line.strip() for line in text.split("\n") if line.strip())
+            segments.append((start, len(lines), page_context))
+        
+        features = self.match_lines(lines)
+        items = []
+        for start, end, page_context in segments:
+            items.extend(self._items_from_features(features, start, end, page_context))
+        return items
+
+    def match_lines(self, lines: List[str]) -> List[Dict[str, Any]]:
+        """Análise de cada linha (ver CanonicalMapper.analyze_lines).
+        
+        Linhas já vistas vêm do memo; as novas são analisadas juntas, num lote.
+        
+        Args:
+            lines: Linhas (sem quebras de linha)
+            
+        Returns:
+            Resultado de cada linha
+        """
+        keys = [self.mapper.normalize_text(line) for line in lines]
+        return self.mapper.memo.resolve(keys, self.mapper.analyze_lines)
+
+    def _items_from_features(
+        self,
+        features: List[Dict[str, Any]],
+        start: int,
+        end: int,
+        page_context: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        """Máquina de estados dos itens sobre as linhas start..end de match_lines."""
         items = []
-        lines = text.split("\n")
         
         current_item = {}
         if page_context:
             current_item["pavimento"] = page_context.get("pavimento")
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
+        for line in features[start:end]:
             # Detecta tipo de ponto
-            tipo = self.mapper.find_canonical(line)
-            if tipo and tipo.startswith("point_"):
+            tipo = next((hit for hit in line["canonical"] if hit.startswith("point_")), None)
+            if tipo:
                 if current_item.get("tipo"):
                     items.append(current_item.copy())
                 current_item = {"tipo": tipo}
@@ -166,31 +399,29 @@ class ItemExtractor:
                     current_item["pavimento"] = page_context.get("pavimento")
             
             # Extrai quantidade
-            match = re.search(r"(\d+)\s*(?:un|unid|unidades?|pontos?|pçs?)", line.lower())
-            if match:
-                current_item["quantidade"] = int(match.group(1))
+            if line["quantidade"] is not None:
+                current_item["quantidade"] = line["quantidade"]
             
             # Extrai altura
-            altura = self.mapper.extract_altura(line)
-            if altura:
-                current_item["altura_m"] = altura
+            if line["altura_m"]:
+                current_item["altura_m"] = line["altura_m"]
             
             # Extrai diâmetro
-            diam = self.mapper.extract_diametro(line)
-            if diam:
-                current_item.update(diam)
+            if line["mm"] is not None:
+                current_item["mm"] = line["mm"]
+            if line["polegadas"] is not None:
+                current_item["polegadas"] = line["polegadas"]
             
-            # Extrai cabo
-            cabo = self.mapper.find_canonical(line)
-            if cabo and cabo in ["cat6", "rg6_u90", "cci2"]:
-                if "cabos" not in current_item:
-                    current_item["cabos"] = []
-                current_item["cabos"].append(cabo)
+            # Extrai cabos
+            for cabo in line["canonical"]:
+                if cabo in CABOS:
+                    if "cabos" not in current_item:
+                        current_item["cabos"] = []
+                    current_item["cabos"].append(cabo)
             
             # Extrai divisor
-            divisor = self.mapper.extract_divisor(line)
-            if divisor:
-                current_item["divisor"] = divisor
+            if line["divisor"]:
+                current_item["divisor"] = line["divisor"]
         
         # Adiciona último item
         if current_item.get("tipo"):
@@ -234,16 +465,24 @@ class ItemExtractor:
         return items
 
 
-def normalize_all_items(raw_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def normalize_all_items(
+    raw_items: List[Dict[str, Any]],
+    memo: Optional[LineMemo] = None,
+    memo_stats: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
     """Normaliza lista de itens.
     
     Args:
         raw_items: Itens brutos
+        memo: Memo da análise de linhas (padrão: o memo do processo, o mesmo do ItemExtractor)
+        memo_stats: Acertos/análises ("hits", "misses") do memo na extração dos
+            itens (ver stage.extract_raw_items), somados aos desta chamada no log
         
     Returns:
         Itens normalizados
     """
-    mapper = CanonicalMapper()
+    mapper = CanonicalMapper(memo)
+    hits, misses = mapper.memo.hits, mapper.memo.misses
     normalized = []
     
     for item in raw_items:
@@ -251,7 +490,13 @@ def normalize_all_items(raw_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]
         if norm_item.get("tipo"):  # Só inclui se tiver tipo identificado
             normalized.append(norm_item)
     
-    logger.info(f"Normalizados {len(normalized)} itens de {len(raw_items)} brutos")
+    hits = mapper.memo.hits - hits + (memo_stats or {}).get("hits", 0)
+    misses = mapper.memo.misses - misses + (memo_stats or {}).get("misses", 0)
+    logger.info(
+        f"Normalizados {len(normalized)} itens de {len(raw_items)} brutos "
+        f"(memo de linhas: {hits / (hits + misses) if hits + misses else 0.0:.0%} de acertos, "
+        f"{hits} acertos/{misses} análises)"
+    )
     return normalized
 
 
@@ -1,11 +1,13 @@
 """Consolidação e agregação de dados extraídos."""
 
 import json
+import re
 import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Any
 from collections import defaultdict
 
+from memorial_maker.extract.carimbo import carimbo_consensus
 from memorial_maker.utils.logging import get_logger
 
 logger = get_logger("normalize.consolidate")
@@ -91,32 +93,45 @@ class DataConsolidator:
             }
         }
         
-        # Coleta dados de todos os carimbos extraídos
+        # Coleta o carimbo de cada folha (página); resultados sem carimbo por
+        # página contam como uma folha
         carimbos = []
         for extraction in extractions:
-            carimbo = extraction.get("carimbo", {})
-            if carimbo:
-                carimbos.append(carimbo)
+            pages = extraction.get("carimbo_pages")
+            if pages:
+                carimbos.extend(page["carimbo"] for page in pages)
+            elif extraction.get("carimbo"):
+                carimbos.append(extraction["carimbo"])
         
         if not carimbos:
             logger.warning("Nenhum carimbo extraído dos PDFs")
             return obra
         
-        # Usa o carimbo mais completo (com mais campos preenchidos)
-        carimbo_principal = max(carimbos, key=lambda c: len([v for v in c.values() if v]))
+        # Cada campo é votado entre as folhas: uma leitura errada em uma folha
+        # perde para as demais
+        consensus = carimbo_consensus(carimbos)
+        
+        def value(field: str) -> str:
+            return consensus[field]["value"] if field in consensus else ""
         
         # Preenche dados da obra
-        obra["empreendimento"] = carimbo_principal.get("empreendimento", "")
-        obra["construtora"] = carimbo_principal.get("construtora", "")
-        obra["endereco"] = carimbo_principal.get("endereco", "")
+        obra["empreendimento"] = value("empreendimento")
+        obra["construtora"] = value("construtora")
+        obra["endereco"] = value("endereco")
         
         # Preenche dados do carimbo (apenas campos relevantes)
-        obra["carimbo"]["projeto"] = carimbo_principal.get("projeto", "")
-        obra["carimbo"]["revisao"] = carimbo_principal.get("revisao", "")
-        obra["carimbo"]["data"] = carimbo_principal.get("data", "")
-        obra["carimbo"]["autor"] = carimbo_principal.get("autor", "")
+        obra["carimbo"]["projeto"] = value("projeto")
+        obra["carimbo"]["revisao"] = value("revisao")
+        obra["carimbo"]["data"] = value("data")
+        obra["carimbo"]["autor"] = value("autor")
         # Removido: escala e arquivo (não devem aparecer no memorial)
         
+        # Fração das folhas que concordam com cada valor
+        obra["confianca"] = {field: entry["confidence"] for field, entry in consensus.items()}
+        doubtful = [field for field, entry in consensus.items() if entry["confidence"] < 0.5]
+        if doubtful:
+            logger.warning(f"Carimbo sem consenso entre as folhas: {', '.join(doubtful)}")
+        
         logger.info(f"Dados da obra extraídos: {obra['empreendimento'] or '(vazio)'}")
         
         return obra
@@ -180,14 +195,15 @@ class DataConsolidator:
         """Extrai informações de salas técnicas."""
         salas = []
         
-        # Busca keywords de sala técnica/monitoramento
-        keywords = ["sala de monitoramento", "sala técnica", "er", "ef", "rack"]
+        # Busca keywords de sala técnica/monitoramento (palavras inteiras: "er"
+        # e "ef" são siglas e não podem casar dentro de outras palavras)
+        keywords = re.compile(r"\b(?:sala de monitoramento|sala técnica|er|ef|rack)\b")
         
         for extraction in extractions:
             for page in extraction.get("pages", []):
                 for block in page.get("blocks", []):
                     text = block.get("text", "").lower()
-                    if any(kw in text for kw in keywords):
+                    if keywords.search(text):
                         # Encontrou menção a sala técnica
                         salas.append({
                             "nome": "Sala de Monitoramento",
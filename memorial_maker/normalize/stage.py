@@ -0,0 +1,160 @@
+"""Estágio de normalização: itens de todas as extrações de um projeto.
+
+O texto de cada extração e o de cada uma das suas tabelas são documentos
+independentes para o ItemExtractor (cada um começa sem item aberto), então o
+trabalho, só regex e CPU, é dividido entre processos. Documentos consecutivos
+são agrupados em tarefas de até ``CHUNK_CHARS`` caracteres; cada tarefa roda
+``ItemExtractor.extract_batch`` num worker, com o memo de linhas do worker, e
+os itens são juntados na ordem das tarefas. O resultado é o mesmo de uma
+execução serial: arquivos na ordem das extrações e, em cada arquivo, o texto e
+depois as tabelas, em ordem de página.
+
+Uso em scripts::
+
+    extractions = json.load(open("extraido/all_extractions.json"))
+    items = normalize_extractions(extractions)
+"""
+
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from memorial_maker.config import settings
+from memorial_maker.extract.unstructured_extract import extract_text_from_elements
+from memorial_maker.normalize.canonical_map import ItemExtractor, get_line_memo, normalize_all_items
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("normalize.stage")
+
+Document = Tuple[str, Dict[str, Any]]
+
+# Caracteres de texto por tarefa; abaixo disso o custo de enviar a tarefa a
+# outro processo supera o da própria análise
+CHUNK_CHARS = 500_000
+
+
+def plan_documents(extractions: Iterable[Dict[str, Any]]) -> List[Document]:
+    """Documentos (texto, contexto) das extrações, em ordem de arquivo e página.
+
+    Args:
+        extractions: Resultados da extração (ver ExtractionEngine.extract_dir)
+
+    Returns:
+        Para cada extração, o texto de todos os elementos e depois o de cada tabela
+    """
+    documents: List[Document] = []
+    for extraction in extractions:
+        filename = extraction.get("filename", "")
+        documents.append((extract_text_from_elements(extraction), {"filename": filename}))
+
+        tables = sorted(
+            extraction.get("tables", []),
+            key=lambda t: (t.get("metadata") or {}).get("page_number") or 0,
+        )
+        for table in tables:
+            documents.append((table.get("text", ""), {
+                "filename": filename,
+                "source": "table",
+                "page_number": (table.get("metadata") or {}).get("page_number"),
+            }))
+    return documents
+
+
+def chunk_documents(documents: List[Document], max_chars: int = CHUNK_CHARS) -> List[List[Document]]:
+    """Agrupa documentos consecutivos em tarefas de até max_chars caracteres.
+
+    Um documento maior que max_chars fica sozinho na sua tarefa; a ordem dos
+    documentos é mantida.
+    """
+    chunks: List[List[Document]] = []
+    current: List[Document] = []
+    size = 0
+    for document in documents:
+        if current and size + len(document[0]) > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(document)
+        size += len(document[0])
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def run_normalize_task(documents: List[Document]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Extrai os itens de uma tarefa (dentro de um worker).
+
+    Args:
+        documents: Documentos da tarefa (ver chunk_documents)
+
+    Returns:
+        Itens brutos, na ordem dos documentos, e os acertos/análises ("hits",
+        "misses") do memo de linhas do worker nesta tarefa
+    """
+    memo = get_line_memo()
+    hits, misses = memo.hits, memo.misses
+    items = ItemExtractor(memo).extract_batch(documents)
+    return items, {"hits": memo.hits - hits, "misses": memo.misses - misses}
+
+
+def extract_raw_items(
+    extractions: Iterable[Dict[str, Any]],
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    memo_stats: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """Itens brutos de todas as extrações, com as tarefas distribuídas entre processos.
+
+    Args:
+        extractions: Resultados da extração
+        executor: Executor das tarefas (padrão: pool de processos criado para esta chamada)
+        max_workers: Processos do pool padrão (padrão: settings.normalize_workers)
+        memo_stats: Recebe a soma dos acertos/análises ("hits", "misses") do memo
+            de linhas de todas as tarefas, em qualquer processo
+
+    Returns:
+        Itens brutos, na mesma ordem de uma execução serial
+    """
+    chunks = chunk_documents(plan_documents(extractions), CHUNK_CHARS)
+    workers = min(max_workers or settings.normalize_workers, len(chunks))
+
+    if executor is None and workers <= 1:
+        # Uma tarefa só (ou pool desativado): no próprio processo, com o memo compartilhado
+        outputs = [run_normalize_task(chunk) for chunk in chunks]
+    else:
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futures = [executor.submit(run_normalize_task, chunk) for chunk in chunks]
+            # Resultados lidos na ordem de envio, não de conclusão
+            outputs = [future.result() for future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
+        logger.info(f"Itens extraídos de {len(chunks)} tarefas em paralelo")
+
+    if memo_stats is not None:
+        for _, stats in outputs:
+            for name in ("hits", "misses"):
+                memo_stats[name] = memo_stats.get(name, 0) + stats[name]
+    return [item for items, _ in outputs for item in items]
+
+
+def normalize_extractions(
+    extractions: Iterable[Dict[str, Any]],
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Itens normalizados de todas as extrações de um projeto.
+
+    Args:
+        extractions: Resultados da extração
+        executor: Executor das tarefas (ver extract_raw_items)
+        max_workers: Processos do pool padrão (padrão: settings.normalize_workers)
+
+    Returns:
+        Itens normalizados, em ordem de arquivo e página
+    """
+    memo_stats: Dict[str, int] = {}
+    raw_items = extract_raw_items(extractions, executor, max_workers, memo_stats)
+    return normalize_all_items(raw_items, memo_stats=memo_stats)
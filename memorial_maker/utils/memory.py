@@ -0,0 +1,103 @@
+"""Process memory helpers used to size and police the extraction pool.
+
+Reads Linux ``/proc`` directly so no extra dependency is needed; psutil is used
+when installed and ``/proc`` is not available.
+"""
+
+import os
+from typing import Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    psutil = None
+
+from memorial_maker.config import settings
+from memorial_maker.utils.logging import get_logger
+
+logger = get_logger("utils.memory")
+
+MB = 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_rss_mb(pid: int) -> Optional[float]:
+    """Current resident set size of a process, in MB (None if unknown)."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / MB
+    except (OSError, ValueError, IndexError):
+        pass
+    if PSUTIL_AVAILABLE:
+        try:
+            return psutil.Process(pid).memory_info().rss / MB
+        except Exception:
+            return None
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS counter of the current process (Linux 4.0+)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the current process since start or last reset, in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is in KB on Linux (never reset)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except (ImportError, OSError):
+        return None
+
+
+def available_memory_mb() -> Optional[float]:
+    """Memory available for new processes without swapping, in MB (None if unknown)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    if PSUTIL_AVAILABLE:
+        return psutil.virtual_memory().available / MB
+    return None
+
+
+def recommended_workers(requested: int) -> int:
+    """Cap a requested worker count by CPU count and available memory.
+
+    Args:
+        requested: Desired number of workers
+
+    Returns:
+        Number of workers that fits in the machine (at least 1)
+    """
+    workers = min(max(1, requested), os.cpu_count() or 1)
+
+    available = available_memory_mb()
+    if available is not None and settings.ocr_worker_mem_mb > 0:
+        by_memory = max(1, int(available // settings.ocr_worker_mem_mb))
+        if by_memory < workers:
+            logger.warning(
+                f"Limiting OCR workers to {by_memory} ({available:.0f} MB available, "
+                f"~{settings.ocr_worker_mem_mb} MB per worker)"
+            )
+            workers = by_memory
+
+    return workers
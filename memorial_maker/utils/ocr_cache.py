@@ -2,8 +2,23 @@
 
 import hashlib
 import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
 
 from memorial_maker.config import settings
 from memorial_maker.utils.logging import get_logger
@@ -11,55 +26,506 @@ from memorial_maker.utils.logging import get_logger
 logger = get_logger("utils.ocr_cache")
 
 
-def get_cache_key(pdf_bytes: bytes, page_number: int, config_version: str) -> str:
+# Chunk size used when streaming PDFs through the hash
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    """Compute the SHA256 digest of a file by streaming it in chunks.
+    
+    Args:
+        path: File to hash
+        
+    Returns:
+        Hex digest of the file contents
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_cache_key(
+    file_digest: str,
+    page_number: int,
+    config_version: str,
+    content_digest: Optional[str] = None,
+) -> str:
     """Generate cache key for a PDF page.
     
+    When the page's own content digest is known the key is derived from it
+    alone, so an unchanged sheet still hits the cache after the PDF is
+    re-exported or the page moves to another position. Otherwise the key
+    falls back to the file digest plus page number.
+    
     Args:
-        pdf_bytes: Raw PDF file bytes
+        file_digest: Digest of the whole PDF (see file_digest)
         page_number: Page number (0-indexed)
         config_version: OCR configuration version
+        content_digest: Digest of the page content stream and its images
         
     Returns:
         SHA256 hash string as cache key
     """
-    content = pdf_bytes + str(page_number).encode() + config_version.encode()
-    return hashlib.sha256(content).hexdigest()
+    if content_digest:
+        content = f"page:{content_digest}:{config_version}"
+    else:
+        content = f"file:{file_digest}:{page_number}:{config_version}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
 
+# Binary cache encoding: MAGIC + flags byte + 4-byte big-endian payload length
+# (uncompressed) + payload. The payload is compact UTF-8 JSON, or msgpack when
+# installed, and is zlib-compressed when that pays off.
+CACHE_MAGIC = b"MMC"
+FLAG_ZLIB = 0x01
+FLAG_MSGPACK = 0x02
+CACHE_HEADER = struct.Struct(">3sBI")
+COMPRESS_MIN_BYTES = 256
+COMPRESS_LEVEL = 6
 
-def get_cache_path(cache_key: str) -> Path:
-    """Get file path for a cache key.
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """Encode an OCR result in the compact binary cache format.
     
     Args:
-        cache_key: Cache key (hash string)
+        result: Result dict to encode
         
     Returns:
-        Path to cache file
+        Encoded bytes
     """
-    cache_dir = settings.ocr_cache_dir
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    return cache_dir / f"{cache_key}.json"
+    flags = 0
+    if MSGPACK_AVAILABLE:
+        payload = msgpack.packb(result, use_bin_type=True)
+        flags |= FLAG_MSGPACK
+    else:
+        payload = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    length = len(payload)
+    if length >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(payload, COMPRESS_LEVEL)
+        if len(compressed) < length:
+            payload = compressed
+            flags |= FLAG_ZLIB
+    
+    return CACHE_HEADER.pack(CACHE_MAGIC, flags, length) + payload
 
 
-def load_from_cache(cache_key: str) -> Optional[Dict[str, Any]]:
-    """Load OCR result from cache.
+def decode_result(data: bytes) -> Dict[str, Any]:
+    """Decode a cached OCR result (binary format or legacy JSON text).
     
     Args:
-        cache_key: Cache key
+        data: Bytes produced by encode_result, or plain JSON
         
     Returns:
-        Cached result dict or None if not found
+        Decoded result dict
+    """
+    if not data.startswith(CACHE_MAGIC):
+        return json.loads(data)
+    
+    _, flags, length = CACHE_HEADER.unpack_from(data)
+    payload = data[CACHE_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload, bufsize=length)
+    if flags & FLAG_MSGPACK:
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("Cache entry encoded with msgpack, but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+class CacheBackend(ABC):
+    """Interface for persistent OCR result storage."""
+    
+    @abstractmethod
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a key, or None."""
+    
+    @abstractmethod
+    def set(self, cache_key: str, result: Dict[str, Any]) -> None:
+        """Store a result under a key."""
+    
+    @abstractmethod
+    def clear(self) -> int:
+        """Remove every entry and return how many were removed."""
+
+
+class JsonDirCache(CacheBackend):
+    """One file per entry inside a directory (legacy layout, ``<key>.json``).
+    
+    Entries are written with the binary encoding of encode_result, like the
+    SQLite backend; plain JSON files from older versions are still read.
     """
-    cache_path = get_cache_path(cache_key)
     
-    if not cache_path.exists():
-        return None
+    def __init__(self, cache_dir: Path):
+        """Initialize backend.
+        
+        Args:
+            cache_dir: Directory holding the JSON files
+        """
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def get_cache_path(self, cache_key: str) -> Path:
+        """Get file path for a cache key."""
+        return self.cache_dir / f"{cache_key}.json"
     
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        cache_path = self.get_cache_path(cache_key)
+        
+        if not cache_path.exists():
+            return None
+        
+        return decode_result(cache_path.read_bytes())
+    
+    def set(self, cache_key: str, result: Dict[str, Any]) -> None:
+        self.get_cache_path(cache_key).write_bytes(encode_result(result))
+    
+    def clear(self) -> int:
+        count = 0
+        for cache_file in self.cache_dir.glob("*.json"):
+            cache_file.unlink()
+            count += 1
+        return count
+
+
+class SQLiteCache(CacheBackend):
+    """Single-file SQLite cache (WAL) with size-bounded LRU eviction.
+    
+    Each process opens its own connection, so the cache is safe to use from
+    the extraction workers; writers are serialised by SQLite itself.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_access ON ocr_cache (last_access);
+    """
+    
+    def __init__(self, db_path: Path, max_bytes: int = 0, touch_interval: float = 60.0):
+        """Initialize backend.
+        
+        Args:
+            db_path: SQLite database file
+            max_bytes: Maximum total size of cached values (0 = unbounded)
+            touch_interval: Minimum age in seconds before a hit refreshes
+                last_access, so repeated hits stay read-only
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(self.SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection of the current thread/process."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, last_access FROM ocr_cache WHERE key = ?", (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] >= self.touch_interval:
+            conn.execute("UPDATE ocr_cache SET last_access = ? WHERE key = ?", (now, cache_key))
+        return decode_result(row[0])
+    
+    def set(self, cache_key: str, result: Dict[str, Any]) -> None:
+        self.put_raw(cache_key, encode_result(result), time.time())
+    
+    def put_raw(self, cache_key: str, value: bytes, last_access: float) -> None:
+        """Store an already-encoded value and evict if over the size limit."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cache_key, value, len(value), time.time(), last_access),
+            )
+            if self.max_bytes:
+                self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used entries until the cache fits max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM ocr_cache ORDER BY last_access"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM ocr_cache WHERE key = ?", victims)
+        logger.debug(f"Evicted {len(victims)} OCR cache entries")
+    
+    def checkpoint(self) -> None:
+        """Fold the WAL back into the main database file."""
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def total_size(self) -> int:
+        """Total size in bytes of the cached values."""
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+    
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+    
+    def clear(self) -> int:
+        conn = self._connect()
+        count = len(self)
+        conn.execute("DELETE FROM ocr_cache")
+        return count
+
+
+def migrate_json_cache(json_dir: Path, backend: SQLiteCache, remove: bool = False) -> int:
+    """Import the legacy one-file-per-page JSON cache into a SQLite backend.
+    
+    Args:
+        json_dir: Directory with ``<key>.json`` files (plain JSON or binary, see JsonDirCache)
+        backend: Destination backend
+        remove: Delete each JSON file after importing it
+        
+    Returns:
+        Number of migrated entries
+    """
+    migrated = 0
+    for cache_file in json_dir.glob("*.json"):
+        try:
+            result = decode_result(cache_file.read_bytes())
+            backend.put_raw(cache_file.stem, encode_result(result), cache_file.stat().st_mtime)
+            migrated += 1
+            if remove:
+                cache_file.unlink()
+        except Exception as e:
+            logger.warning(f"Error migrating cache file {cache_file.name}: {e}")
+    
+    logger.info(f"Migrated {migrated} OCR cache entries from {json_dir}")
+    return migrated
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory size of a cached result, in bytes."""
+    if isinstance(value, (str, bytes)):
+        return len(value) + 49
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in value)
+    return 28
+
+
+class MemoryLRU:
+    """In-process LRU of decoded results, bounded by estimated bytes.
+    
+    Results are returned without copying; callers must not mutate them.
+    """
+    
+    def __init__(self, max_bytes: int):
+        """Initialize tier.
+        
+        Args:
+            max_bytes: Maximum estimated size of the stored results
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry[0]
+    
+    def set(self, cache_key: str, result: Dict[str, Any]) -> None:
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return  # Would evict everything else for a single entry
+        
+        with self._lock:
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[cache_key] = (result, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+    
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.total_bytes = 0
+            return count
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache(CacheBackend):
+    """Memory LRU in front of a persistent backend, with per-tier counters."""
+    
+    def __init__(self, memory: MemoryLRU, disk: CacheBackend):
+        """Initialize cache.
+        
+        Args:
+            memory: In-process tier
+            disk: Persistent tier
+        """
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.stats = {
+            "memory": {"hits": 0, "misses": 0},
+            "disk": {"hits": 0, "misses": 0},
+        }
+    
+    def _count(self, tier: str, outcome: str) -> None:
+        with self._lock:
+            self.stats[tier][outcome] += 1
+    
+    def lookup(self, cache_key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Return the cached result and the tier that served it."""
+        result = self.memory.get(cache_key)
+        if result is not None:
+            self._count("memory", "hits")
+            return result, "memory"
+        self._count("memory", "misses")
+        
+        result = self.disk.get(cache_key)
+        if result is None:
+            self._count("disk", "misses")
+            return None, None
+        self._count("disk", "hits")
+        self.memory.set(cache_key, result)
+        return result, "disk"
+    
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        return self.lookup(cache_key)[0]
+    
+    def set(self, cache_key: str, result: Dict[str, Any]) -> None:
+        self.disk.set(cache_key, result)
+        self.memory.set(cache_key, result)
+    
+    def clear(self) -> int:
+        self.memory.clear()
+        return self.disk.clear()
+
+
+_disk_backend: Optional[CacheBackend] = None
+_backend: Optional[TieredCache] = None
+_table_backend: Optional[CacheBackend] = None
+
+
+def get_disk_backend() -> CacheBackend:
+    """Return the configured persistent backend (created once per process)."""
+    global _disk_backend
+    
+    if _disk_backend is None:
+        cache_dir = settings.ocr_cache_dir
+        if settings.ocr_cache_backend == "json":
+            _disk_backend = JsonDirCache(cache_dir)
+        else:
+            db_path = cache_dir / "ocr_cache.sqlite3"
+            is_new = not db_path.exists()
+            _disk_backend = SQLiteCache(db_path, max_bytes=settings.ocr_cache_max_mb * 1024 * 1024)
+            # One-time import of the legacy JSON files living in the same directory
+            if is_new and any(cache_dir.glob("*.json")):
+                migrate_json_cache(cache_dir, _disk_backend)
+    
+    return _disk_backend
+
+
+def get_cache_backend() -> TieredCache:
+    """Return the process-wide two-tier cache used by the extraction path."""
+    global _backend
+    
+    if _backend is None:
+        memory = MemoryLRU(settings.ocr_memory_cache_mb * 1024 * 1024)
+        _backend = TieredCache(memory, get_disk_backend())
+    
+    return _backend
+
+
+def get_table_cache() -> CacheBackend:
+    """Return the persistent cache of table-structure results (created once per process).
+    
+    Table HTML lives in its own store, apart from the OCR text cache, so large
+    table results neither evict page text nor share its size limit.
+    """
+    global _table_backend
+    
+    if _table_backend is None:
+        cache_dir = settings.table_cache_dir
+        if settings.ocr_cache_backend == "json":
+            _table_backend = JsonDirCache(cache_dir)
+        else:
+            _table_backend = SQLiteCache(
+                cache_dir / "table_cache.sqlite3", max_bytes=settings.ocr_cache_max_mb * 1024 * 1024
+            )
+    
+    return _table_backend
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters of each cache tier in the current process."""
+    stats = get_cache_backend().stats
+    return {tier: dict(counters) for tier, counters in stats.items()}
+
+
+def lookup_cache(cache_key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Load OCR result from cache, reporting which tier served it.
+    
+    Args:
+        cache_key: Cache key
+        
+    Returns:
+        Tuple of (cached result or None, "memory"/"disk" or None)
+    """
     try:
-        with open(cache_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return get_cache_backend().lookup(cache_key)
     except Exception as e:
         logger.warning(f"Error loading cache {cache_key}: {e}")
-        return None
+        return None, None
+
+
+def load_from_cache(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Load OCR result from cache.
+    
+    Args:
+        cache_key: Cache key
+        
+    Returns:
+        Cached result dict or None if not found
+    """
+    return lookup_cache(cache_key)[0]
 
 
 def save_to_cache(cache_key: str, result: Dict[str, Any]) -> None:
@@ -69,12 +535,8 @@ def save_to_cache(cache_key: str, result: Dict[str, Any]) -> None:
         cache_key: Cache key
         result: Result dict to cache
     """
-    cache_path = get_cache_path(cache_key)
-    
     try:
-        cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        get_cache_backend().set(cache_key, result)
         logger.debug(f"Cached OCR result: {cache_key[:16]}...")
     except Exception as e:
         logger.warning(f"Error saving cache {cache_key}: {e}")
@@ -82,11 +544,15 @@ def save_to_cache(cache_key: str, result: Dict[str, Any]) -> None:
 
 def clear_cache() -> None:
     """Clear all cached OCR results."""
-    cache_dir = settings.ocr_cache_dir
+    removed = get_cache_backend().clear()
+    logger.info(f"Cleared OCR cache: {removed} entries")
+
+
+if __name__ == "__main__":
+    # python -m memorial_maker.utils.ocr_cache migrate
+    import sys
     
-    if cache_dir.exists():
-        for cache_file in cache_dir.glob("*.json"):
-            cache_file.unlink()
-        logger.info(f"Cleared OCR cache: {len(list(cache_dir.glob('*.json')))} files")
-    else:
-        logger.info("OCR cache directory does not exist")
+    if sys.argv[1:] == ["migrate"]:
+        backend = get_disk_backend()
+        if isinstance(backend, SQLiteCache):
+            migrate_json_cache(settings.ocr_cache_dir, backend, remove=True)
@@ -0,0 +1,82 @@
+"""Page crops of PDF sheets (pypdf only).
+
+Regions are given as fractions of the displayed sheet, origin at the top-left
+corner; ``region_box`` maps them to the page's user space whatever its
+``/Rotate``, and ``crop_page_pdf`` writes a one-page PDF showing only the
+region, so renderers and partitioners work on the crop instead of the sheet.
+"""
+
+import io
+from pathlib import Path
+from typing import Any, Tuple
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+    PdfReader = None
+    PdfWriter = None
+
+Region = Tuple[float, float, float, float]
+
+
+def _display_to_user(fx: float, fy: float, rotation: int) -> Tuple[float, float]:
+    """Map a displayed fraction (top-left origin) to unrotated user-space fractions."""
+    rotation %= 360
+    if rotation == 90:
+        return fy, fx
+    if rotation == 180:
+        return 1.0 - fx, fy
+    if rotation == 270:
+        return 1.0 - fy, 1.0 - fx
+    return fx, 1.0 - fy
+
+
+def region_box(page: Any, region: Region) -> Tuple[float, float, float, float]:
+    """Convert a displayed region into a box in the page's user space.
+
+    Args:
+        page: pypdf page object
+        region: (x0, y0, x1, y1) fractions of the displayed sheet
+
+    Returns:
+        (left, bottom, right, top) in PDF points
+    """
+    mediabox = page.mediabox
+    rotation = int(page.get("/Rotate", 0) or 0)
+    x0, y0, x1, y1 = region
+
+    corners = [_display_to_user(x0, y0, rotation), _display_to_user(x1, y1, rotation)]
+    ux = sorted(c[0] for c in corners)
+    uy = sorted(c[1] for c in corners)
+
+    left, bottom = float(mediabox.left), float(mediabox.bottom)
+    width, height = float(mediabox.width), float(mediabox.height)
+    return (
+        left + ux[0] * width,
+        bottom + uy[0] * height,
+        left + ux[1] * width,
+        bottom + uy[1] * height,
+    )
+
+
+def crop_page_pdf(pdf_path: Path, page_number: int, region: Region) -> bytes:
+    """Write a one-page PDF whose visible area is only the given region.
+
+    Rasterising this instead of the full page keeps render time proportional to
+    the region (title block, table), not to the sheet.
+    """
+    reader = PdfReader(str(pdf_path))
+    writer = PdfWriter()
+    page = writer.add_page(reader.pages[page_number])
+
+    box = region_box(page, region)
+    page.mediabox.lower_left = box[:2]
+    page.mediabox.upper_right = box[2:]
+    page.cropbox.lower_left = box[:2]
+    page.cropbox.upper_right = box[2:]
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
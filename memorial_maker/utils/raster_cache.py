@@ -0,0 +1,268 @@
+"""Rasterised page cache shared by OCR, carimbo and figure extraction.
+
+Large drawing sheets are expensive to render, and every consumer used to render
+them again. Rasters are stored once per (page, DPI, region) as raw ``.npy``
+arrays that are memory-mapped on read, so cropping a title block or a figure
+out of an A0 sheet touches only the rows it needs. Tools that need an image
+file (the hi_res image partitioner) get a PNG encoded in memory from the array;
+only the array is kept on disk.
+"""
+
+import hashlib
+import io
+import os
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    Image = None
+
+try:
+    from pdf2image import convert_from_bytes, convert_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+    convert_from_bytes = None
+    convert_from_path = None
+
+from memorial_maker.config import settings
+from memorial_maker.utils.logging import get_logger
+from memorial_maker.utils.ocr_cache import file_digest as compute_file_digest
+from memorial_maker.utils.pdf_crop import Region, crop_page_pdf
+
+logger = get_logger("utils.raster_cache")
+
+RASTER_AVAILABLE = NUMPY_AVAILABLE and PIL_AVAILABLE and PDF2IMAGE_AVAILABLE
+
+# Entries younger than this (seconds) are never evicted: another worker may
+# have just written it and be about to load it
+EVICT_GRACE = 60.0
+
+
+def raster_key(
+    file_digest: Optional[str],
+    page_number: int,
+    dpi: int,
+    region: Optional[Region] = None,
+    content_digest: Optional[str] = None,
+) -> str:
+    """Generate the cache key of a page raster.
+
+    Args:
+        file_digest: SHA256 digest of the PDF file
+        page_number: Page number (0-indexed)
+        dpi: Render resolution
+        region: Region fractions (x0, y0, x1, y1) or None for the full page
+        content_digest: Digest of the page content (preferred when available)
+
+    Returns:
+        Cache key (hex digest)
+    """
+    region_part = ",".join(f"{v:.4f}" for v in region) if region else "page"
+    if content_digest:
+        source = f"page:{content_digest}"
+    else:
+        source = f"file:{file_digest}:{page_number}"
+    return hashlib.sha256(f"{source}@{dpi}:{region_part}".encode()).hexdigest()
+
+
+def crop_raster(array: Any, region: Region) -> Any:
+    """Crop a raster by region fractions (top-left origin) without copying."""
+    height, width = array.shape[:2]
+    x0, y0, x1, y1 = region
+    return array[int(y0 * height):int(round(y1 * height)), int(x0 * width):int(round(x1 * width))]
+
+
+class RasterCache:
+    """Cache de rasters de páginas em arquivos .npy mapeados em memória."""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 0):
+        """Inicializa cache.
+
+        Args:
+            cache_dir: Diretório dos arquivos
+            max_bytes: Tamanho máximo em disco (0 = sem limite)
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy não está instalado. Execute: pip install unstructured[pdf]")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached raster as a read-only memory map, or None."""
+        path = self.get_path(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        # Recency for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return array
+
+    def put(self, key: str, array: Any) -> Any:
+        """Store a raster and return it memory-mapped from the cache file.
+
+        A raster larger than the whole cache budget is not stored; it is
+        returned as is.
+        """
+        if self.max_bytes and array.nbytes > self.max_bytes:
+            logger.debug(f"Raster of {array.nbytes} bytes exceeds the cache budget, not caching it")
+            return array
+
+        path = self.get_path(key)
+        # Unique temp name so concurrent workers rendering the same page don't clash
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(array))
+        os.replace(tmp_path, path)
+
+        if self.max_bytes:
+            self._evict()
+        try:
+            return np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            # Evicted by another process in the meantime
+            return array
+
+    def total_size(self) -> int:
+        return sum(f.stat().st_size for f in self.cache_dir.glob("*") if f.is_file())
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits max_bytes.
+
+        Temp files being written and entries younger than EVICT_GRACE are
+        counted but never removed.
+        """
+        files = []
+        for f in self.cache_dir.glob("*"):
+            try:
+                stat = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, f))
+
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - EVICT_GRACE
+        for mtime, size, f in sorted(files, key=lambda item: item[0]):
+            if total <= self.max_bytes or mtime > cutoff:
+                break
+            if ".tmp." in f.name:
+                continue
+            try:
+                f.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> int:
+        count = 0
+        for f in self.cache_dir.glob("*"):
+            f.unlink()
+            count += 1
+        return count
+
+
+_raster_cache: Optional[RasterCache] = None
+
+
+def get_raster_cache() -> RasterCache:
+    """Return the process-wide raster cache."""
+    global _raster_cache
+
+    if _raster_cache is None:
+        _raster_cache = RasterCache(
+            settings.raster_cache_dir,
+            max_bytes=settings.raster_cache_max_mb * 1024 * 1024,
+        )
+    return _raster_cache
+
+
+def render_page(pdf_path: Path, page_number: int, dpi: int, region: Optional[Region] = None) -> Any:
+    """Render a page (or only a region of it) to an RGB array."""
+    if not RASTER_AVAILABLE:
+        raise ImportError("Renderização requer numpy, pillow e pdf2image. Execute: pip install unstructured[pdf]")
+
+    if region:
+        # Rendering only the crop keeps the cost proportional to the region
+        images = convert_from_bytes(crop_page_pdf(pdf_path, page_number, region), dpi=dpi)
+    else:
+        images = convert_from_path(
+            str(pdf_path), dpi=dpi, first_page=page_number + 1, last_page=page_number + 1
+        )
+    return np.asarray(images[0].convert("RGB"))
+
+
+def get_page_raster(
+    pdf_path: Path,
+    page_number: int,
+    dpi: int,
+    region: Optional[Region] = None,
+    file_digest: Optional[str] = None,
+    content_digest: Optional[str] = None,
+) -> Any:
+    """Return the raster of a page or region, rendering it only on a cache miss.
+
+    A region request is served from the full-page raster when that one is
+    already cached at the same DPI.
+
+    Args:
+        pdf_path: Path to PDF file
+        page_number: Page number (0-indexed)
+        dpi: Render resolution
+        region: Region fractions (x0, y0, x1, y1) or None for the full page
+        file_digest: SHA256 digest of the PDF (computed if no digest is given)
+        content_digest: Digest of the page content
+
+    Returns:
+        Read-only RGB array (height, width, 3)
+    """
+    if file_digest is None and content_digest is None:
+        file_digest = compute_file_digest(pdf_path)
+
+    cache = get_raster_cache()
+    key = raster_key(file_digest, page_number, dpi, region, content_digest)
+
+    array = cache.get(key)
+    if array is not None:
+        return array
+
+    if region:
+        full_page = cache.get(raster_key(file_digest, page_number, dpi, None, content_digest))
+        if full_page is not None:
+            return crop_raster(full_page, region)
+
+    logger.debug(f"Rendering page {page_number} of {pdf_path.name} at {dpi} dpi (region={region})")
+    return cache.put(key, render_page(pdf_path, page_number, dpi, region))
+
+
+def get_page_image(
+    pdf_path: Path,
+    page_number: int,
+    dpi: int,
+    file_digest: Optional[str] = None,
+    content_digest: Optional[str] = None,
+) -> io.BytesIO:
+    """Return a full page raster as an in-memory PNG, for tools that take an image file."""
+    array = get_page_raster(pdf_path, page_number, dpi, None, file_digest, content_digest)
+    image = io.BytesIO()
+    Image.fromarray(np.asarray(array)).save(image, format="PNG")
+    image.seek(0)
+    return image
@@ -0,0 +1,1092 @@
+"""Testes dos estágios de extração que não dependem do Unstructured."""
+
+import os
+import pytest
+from pathlib import Path
+
+from memorial_maker.extract.page_manifest import build_page_manifest, PYPDF_AVAILABLE
+
+PLANTAS_DIR = Path(__file__).parent.parent / "projetos_plantas"
+SAMPLE_PDF = PLANTAS_DIR / "MGAMAK_TELECOM_03_TIPO_28-04-2025.pdf"
+
+
+@pytest.mark.skipif(not PYPDF_AVAILABLE, reason="Requer pypdf")
+class TestPageManifest:
+    """Testes do manifesto de páginas."""
+    
+    def test_manifest_single_pass(self):
+        """Testa contagem de páginas e camada de texto de uma planta vetorial."""
+        manifest = build_page_manifest(SAMPLE_PDF)
+        
+        assert manifest["filename"] == SAMPLE_PDF.name
+        assert manifest["total_pages"] == len(manifest["pages"]) == 1
+        
+        page = manifest["pages"][0]
+        assert page["page_number"] == 0
+        assert page["width"] > 0 and page["height"] > 0
+        assert page["has_text_layer"]
+        assert page["text_chars"] > 0
+        assert 0.0 <= page["image_coverage"] <= 1.0
+    
+    def test_content_digest_survives_reexport(self, tmp_path):
+        """Página inalterada em um PDF re-exportado mantém o mesmo digest de conteúdo."""
+        from pypdf import PdfReader, PdfWriter
+        
+        other_pdf = PLANTAS_DIR / "MGAMAK_TELECOM_05_CORTE ESQUEMÁTICO_28-04-2025.pdf"
+        writer = PdfWriter()
+        writer.add_page(PdfReader(str(other_pdf)).pages[0])
+        writer.add_page(PdfReader(str(SAMPLE_PDF)).pages[0])
+        reexported = tmp_path / "reexportado.pdf"
+        with open(reexported, "wb") as f:
+            writer.write(f)
+        
+        original = build_page_manifest(SAMPLE_PDF)
+        combined = build_page_manifest(reexported)
+        
+        assert original["file_digest"] != combined["file_digest"]
+        assert combined["pages"][1]["content_digest"] == original["pages"][0]["content_digest"]
+        assert combined["pages"][0]["content_digest"] != original["pages"][0]["content_digest"]
+    
+    def test_manifest_all_plantas(self):
+        """Testa manifesto em todas as plantas de exemplo."""
+        for pdf_path in sorted(PLANTAS_DIR.glob("*.pdf")):
+            manifest = build_page_manifest(pdf_path)
+            assert manifest["total_pages"] >= 1
+            assert all(p["has_text_layer"] for p in manifest["pages"])
+
+
+def _fake_page(page_number, has_text_layer, width=2400.0, height=1700.0, image_coverage=0.0):
+    return {
+        "page_number": page_number,
+        "width": width,
+        "height": height,
+        "rotation": 0,
+        "has_text_layer": has_text_layer,
+        "text_chars": 500 if has_text_layer else 0,
+        "image_count": 0,
+        "image_coverage": image_coverage,
+    }
+
+
+class TestPageClassification:
+    """Testes da classificação de páginas sem chamar o particionador."""
+    
+    def test_classify_page(self):
+        """Decisão usa camada de texto, quantidade de texto e cobertura de imagem."""
+        from memorial_maker.extract.page_manifest import classify_page
+        
+        assert classify_page(_fake_page(0, True)) == {"strategy": "native", "reason": "text_layer"}
+        assert classify_page(_fake_page(0, False))["reason"] == "no_text_layer"
+        assert classify_page({**_fake_page(0, True), "text_chars": 10})["reason"] == "sparse_text_layer"
+        
+        # Escaneado com carimbo digital: muita imagem, pouco texto para a área
+        scanned = {**_fake_page(0, True, image_coverage=1.0), "text_chars": 200}
+        assert classify_page(scanned) == {"strategy": "ocr", "reason": "scanned_page"}
+    
+    def test_plantas_go_native(self):
+        """Plantas de exemplo (raster + texto CAD) devem usar texto nativo."""
+        from memorial_maker.extract.page_manifest import classify_page
+        
+        for pdf_path in sorted(PLANTAS_DIR.glob("*.pdf")):
+            for page in build_page_manifest(pdf_path)["pages"]:
+                assert classify_page(page)["strategy"] == "native"
+
+
+@pytest.mark.skipif(not PYPDF_AVAILABLE, reason="Requer pypdf")
+class TestCarimboROI:
+    """Testes da leitura do carimbo apenas pela região do selo."""
+    
+    def test_region_box_follows_rotation(self):
+        """Região no canto inferior direito da folha exibida, para cada rotação."""
+        from pypdf import PageObject
+        from pypdf.generic import NameObject, NumberObject
+        from memorial_maker.utils.pdf_crop import region_box
+        
+        page = PageObject.create_blank_page(width=1000, height=500)
+        region = (0.75, 0.7, 1.0, 1.0)
+        
+        assert region_box(page, region) == pytest.approx((750.0, 0.0, 1000.0, 150.0))
+        page[NameObject("/Rotate")] = NumberObject(90)
+        assert region_box(page, region) == pytest.approx((700.0, 375.0, 1000.0, 500.0))
+    
+    def test_native_region_text(self):
+        """Carimbo de planta com camada de texto deve ser lido da região do selo."""
+        from memorial_maker.extract.carimbo_roi import extract_carimbo_roi
+        
+        page = build_page_manifest(SAMPLE_PDF)["pages"][0]
+        result = extract_carimbo_roi(SAMPLE_PDF, page)
+        
+        assert result["method"] == "native"
+        assert "MAKAI" in result["text"]
+        assert "LISTA DE PRANCHAS" not in result["text"]  # fora do selo
+        assert result["carimbo"]
+
+
+class TestCarimboParser:
+    """Testes do parser do carimbo e do consenso entre folhas."""
+    
+    def test_labels_followed_by_values(self):
+        """Rótulos seguidos dos valores; escala só aceita valor com cara de escala."""
+        from memorial_maker.extract.carimbo import parse_carimbo
+        
+        text = "\n".join([
+            "PROJETO:", "PROJETO DE INSTALAÇÕES DE TELECOMUNICAÇÃO",
+            "CONSTRUTOR:", "MGA CONSTRUÇÕES E INCORPORAÇÕES LTDA",
+            "EDIFÍCIO:", "MAKAI",
+            "LOCAL:", "AVENIDA MAX ZAGEL, S/N, LOTE 05-A QUADRA12, CABEDELO- PB",
+            "Escala:", "ENG. EVANDRO CESAR", "INDICADAS",
+            "Desenho :", "DATA:", "27/01/2025",
+            "PROJETADO POR: ENGª GIULLIANE CAHINO",
+        ])
+        carimbo = parse_carimbo(text)
+        
+        assert carimbo["projeto"] == "PROJETO DE INSTALAÇÕES DE TELECOMUNICAÇÃO"
+        assert carimbo["construtora"] == "MGA CONSTRUÇÕES E INCORPORAÇÕES LTDA"
+        assert carimbo["empreendimento"] == "MAKAI"
+        assert carimbo["endereco"].startswith("AVENIDA MAX ZAGEL")
+        assert carimbo["escala"] == "INDICADAS"
+        assert carimbo["data"] == "27/01/2025"
+        assert carimbo["autor"] == "ENGª GIULLIANE CAHINO"
+    
+    def test_labels_on_one_line(self):
+        """Todos os rótulos numa linha: os valores seguem na mesma ordem."""
+        from memorial_maker.extract.carimbo import parse_carimbo
+        
+        text = "PROJETO: CONSTRUTOR: EDIFÍCIO: LOCAL:\nEscala:\nPROJETO X\nCONSTRUTORA Y LTDA\nEDIF Z\nRUA A, 10, CIDADE - PB\n1/100"
+        
+        assert parse_carimbo(text) == {
+            "projeto": "PROJETO X",
+            "construtora": "CONSTRUTORA Y LTDA",
+            "empreendimento": "EDIF Z",
+            "endereco": "RUA A, 10, CIDADE - PB",
+            "escala": "1/100",
+        }
+    
+    def test_consensus_outvotes_misread_sheet(self):
+        """Leitura errada em uma folha perde para as demais; confiança = fração que concorda."""
+        from memorial_maker.extract.carimbo import carimbo_consensus
+        
+        carimbos = [{"empreendimento": "MAKAI", "projeto": "PROJETO DE TELECOM"}] * 3
+        carimbos += [{"empreendimento": "Makai ", "projeto": "SUBSOLO"}, {}]
+        consensus = carimbo_consensus(carimbos)
+        
+        assert consensus["empreendimento"]["value"] == "MAKAI"
+        assert consensus["empreendimento"]["confidence"] == 1.0
+        assert consensus["projeto"]["value"] == "PROJETO DE TELECOM"
+        assert consensus["projeto"]["confidence"] == 0.75
+        assert consensus["projeto"]["sheets"] == 4
+    
+    @pytest.mark.skipif(not PYPDF_AVAILABLE, reason="Requer pypdf")
+    def test_hybrid_result_carimbo_per_page(self, tmp_path):
+        """Resultado híbrido traz o carimbo de cada página lido da região do selo."""
+        from memorial_maker.extract.native_text import PDFMINER_AVAILABLE, elements_text
+        from memorial_maker.extract.optimized_extract import (
+            build_hybrid_result, extract_native_elements_by_page, native_page_result,
+        )
+        
+        if not PDFMINER_AVAILABLE:
+            pytest.skip("Requer pdfminer.six")
+        manifest = build_page_manifest(SAMPLE_PDF)
+        elements = extract_native_elements_by_page(SAMPLE_PDF)
+        pages = [native_page_result(n, elements_text(e), e) for n, e in elements.items()]
+        decisions = {0: {"strategy": "native", "reason": "text_layer"}}
+        result = build_hybrid_result(SAMPLE_PDF, manifest, pages, tmp_path, decisions)
+        
+        assert result["carimbo_pages"][0]["page_number"] == 0
+        assert result["carimbo"]["empreendimento"] == "MAKAI"
+        assert result["carimbo"]["escala"] == "INDICADAS"
+
+
+class TestNativeText:
+    """Testes do leitor leve da camada de texto."""
+    
+    def test_text_only_stream_drops_paths(self):
+        """Operadores de desenho são descartados; objetos de texto e estado são mantidos."""
+        from memorial_maker.extract.native_text import text_only_stream
+        
+        stream = (
+            b"q 1 0 0 1 10 20 cm 0 0 m 100 100 l S 0.5 w "
+            b"BT /F1 8 Tf 5 5 Td (AP. 101) Tj ET 3 4 m 5 6 l f Q"
+        )
+        reduced = text_only_stream(stream)
+        
+        assert b"BT /F1 8 Tf 5 5 Td (AP. 101) Tj ET" in reduced
+        assert b"1 0 0 1 10 20 cm" in reduced
+        assert b" l " not in reduced and b" w" not in reduced
+        assert reduced.startswith(b"q") and reduced.endswith(b"Q")
+    
+    def test_text_only_stream_skips_strings(self):
+        """Nomes de operadores dentro de strings, comentários e imagens inline não são operadores."""
+        from memorial_maker.extract.native_text import text_only_stream
+        
+        stream = (
+            b"BT /F1 8 Tf (RUA ET AL) Tj (a \\) ET (b) BT) Tj ET\n"
+            b"% comentario ET BT\n"
+            b"BI /W 2 /H 1 ID \x00BT ET\xff EI\n"
+            b"BT (PAV. TIPO) Tj ET 0 0 m 1 1 l S"
+        )
+        reduced = text_only_stream(stream)
+        
+        assert reduced.split(b"\n") == [
+            b"BT /F1 8 Tf (RUA ET AL) Tj (a \\) ET (b) BT) Tj ET",
+            b"BT (PAV. TIPO) Tj ET",
+        ]
+    
+    @pytest.mark.skipif(not PYPDF_AVAILABLE, reason="Requer pypdf")
+    def test_elements_with_coordinates(self):
+        """Linhas da planta saem como elementos com coordenadas dentro da folha."""
+        from memorial_maker.extract.native_text import PDFMINER_AVAILABLE, extract_native_elements
+        
+        if not PDFMINER_AVAILABLE:
+            pytest.skip("Requer pdfminer.six")
+        
+        elements = extract_native_elements(SAMPLE_PDF)
+        
+        assert list(elements) == [0]
+        assert len(elements[0]) > 50
+        text = " ".join(e["text"] for e in elements[0])
+        assert "PAVIMENTO" in text.upper()
+        for element in elements[0]:
+            metadata = element["metadata"]
+            assert metadata["page_number"] == 1
+            assert metadata["filename"] == SAMPLE_PDF.name
+            coordinates = metadata["coordinates"]
+            (x0, y0), _, (x1, y1), _ = coordinates["points"]
+            assert -1 <= x0 <= x1 <= coordinates["layout_width"] + 1
+            assert -1 <= y0 <= y1 <= coordinates["layout_height"] + 1
+
+
+def _fake_element(text, x0, y0, x1, y1, font_size=8.0, page_number=0):
+    """Elemento de texto com coordenadas (origem no topo esquerdo de uma folha 1000x500)."""
+    return {"type": "text", "text": text, "metadata": {
+        "page_number": page_number,
+        "font_size": font_size,
+        "coordinates": {
+            "points": ((x0, y0), (x0, y1), (x1, y1), (x1, y0)),
+            "system": "PointSpace", "layout_width": 1000.0, "layout_height": 500.0,
+        },
+    }}
+
+
+class TestSpatialIndex:
+    """Testes do índice espacial por página."""
+    
+    def test_region_and_near_queries(self):
+        """Consultas por região e vizinhança retornam só os elementos próximos."""
+        from memorial_maker.extract.spatial_index import PageSpatialIndex
+        
+        elements = [
+            _fake_element("LISTA DE PRANCHAS", 800, 20, 950, 30),
+            _fake_element("EDIFÍCIO:", 800, 400, 850, 410),
+            _fake_element("MAKAI", 860, 400, 900, 410),
+            _fake_element("PONTO RJ-45", 100, 100, 160, 108),
+            {"type": "text", "text": "sem coordenadas", "metadata": {"page_number": 0}},
+        ]
+        index = PageSpatialIndex(elements)
+        
+        assert len(index) == 4
+        assert index.width == 1000.0 and index.height == 500.0
+        assert [e["text"] for e in index.query_region((0.75, 0.7, 1.0, 1.0))] == ["EDIFÍCIO:", "MAKAI"]
+        assert index.text_in(index.region_box((0.75, 0.7, 1.0, 1.0))) == "EDIFÍCIO:\nMAKAI"
+        assert [e["text"] for e in index.near((850, 400, 855, 410), 20)] == ["EDIFÍCIO:", "MAKAI"]
+        assert index.query((0, 0, 50, 50)) == []
+    
+    def test_pages_blocks_and_pavimento(self):
+        """Estrutura pages/blocks com o pavimento do título da folha."""
+        from memorial_maker.extract.spatial_index import build_page_indexes, build_pages
+        
+        elements = [
+            _fake_element("Vem do Térreo", 100, 100, 160, 108),
+            _fake_element("PLANTA BAIXA SUBSOLO", 800, 480, 900, 490),
+            _fake_element("PLANTA BAIXA PAVIMENTO TIPO", 300, 440, 700, 470, font_size=24.0),
+            _fake_element("PONTO RJ-45", 100, 100, 160, 108, page_number=1),
+        ]
+        pages = build_pages(build_page_indexes(elements))
+        
+        assert [p["page_number"] for p in pages] == [0, 1]
+        assert pages[0]["pavimento"] == "PAVIMENTO TIPO"
+        assert pages[1]["pavimento"] is None
+        assert pages[0]["blocks"][0] == {"text": "Vem do Térreo", "bbox": [100, 100, 160, 108], "font_size": 8.0}
+
+
+def _legend_page(page_number=0):
+    """Página com um quadro de legenda (título + linhas) e texto solto da planta."""
+    elements = [_fake_element("SIMBOLOGIA / LEGENDA", 800, 100, 900, 112, font_size=12.0)]
+    for row in range(5):
+        y = 120 + row * 12
+        elements.append(_fake_element(f"PONTO {row}", 800, y, 860, y + 8))
+    elements += [
+        _fake_element("QUADRO VDI 400x400", 100, 300, 180, 308),  # menção, não título
+        _fake_element("AP. 101", 400, 200, 430, 208),
+    ]
+    return elements
+
+
+class TestTableStage:
+    """Testes do estágio de tabelas por região."""
+    
+    def test_regions_around_table_headings(self):
+        """Só títulos de quadro viram regiões, do tamanho do bloco do quadro."""
+        from memorial_maker.extract.spatial_index import PageSpatialIndex
+        from memorial_maker.extract.tables import find_table_regions
+        
+        regions = find_table_regions(PageSpatialIndex(_legend_page()))
+        
+        assert len(regions) == 1
+        x0, y0, x1, y1 = regions[0]
+        assert 0.75 < x0 < 0.8 and 0.15 < y0 < 0.2
+        assert 0.9 < x1 < 0.95 and 0.35 < y1 <= 0.4
+    
+    def test_regions_of_unstructured_result(self):
+        """Resultado do Unstructured (sem font_size, em PixelSpace): título pela altura da linha."""
+        from memorial_maker.extract.spatial_index import build_page_indexes, build_pages
+        from memorial_maker.extract.tables import plan_table_tasks
+        
+        text = []
+        for element in _legend_page():
+            metadata = element["metadata"]
+            del metadata["font_size"]
+            metadata["page_number"] = 1
+            metadata["coordinates"] = {
+                "points": tuple((x * 4, y * 4) for x, y in metadata["coordinates"]["points"]),
+                "system": "PixelSpace", "layout_width": 4000, "layout_height": 2000,
+            }
+            text.append(element)
+        result = {"text": text, "metadata": {"file_digest": "abc"}}
+        result["pages"] = build_pages(build_page_indexes(text, one_indexed=True))
+        
+        tasks = plan_table_tasks(Path("a.pdf"), result)
+        
+        assert [task["page_numbers"] for task in tasks] == [[0]]
+        x0, y0, x1, y1 = tasks[0]["region"]
+        assert 0.75 < x0 < 0.8 and 0.15 < y0 < 0.2
+        assert 0.9 < x1 < 0.95 and 0.35 < y1 <= 0.4
+    
+    def test_table_strategies_setting(self, monkeypatch):
+        """Lista de estratégias aceita espaços e entra na assinatura do reaproveitamento."""
+        from memorial_maker.config import settings
+        from memorial_maker.extract.engine import ExtractionEngine
+        from memorial_maker.extract.incremental import pipeline_signature
+        from memorial_maker.extract import engine
+        
+        monkeypatch.setattr(engine, "TABLES_AVAILABLE", True)
+        monkeypatch.setattr(settings, "extract_tables", True)
+        monkeypatch.setattr(settings, "table_strategies", "hi_res")
+        signatures = [pipeline_signature("optimized"), pipeline_signature("unstructured", "hi_res")]
+        assert not ExtractionEngine(strategy="hybrid", executor="inline")._runs_tables()
+        
+        monkeypatch.setattr(settings, "table_strategies", "hi_res, hybrid")
+        assert ExtractionEngine(strategy="hybrid", executor="inline")._runs_tables()
+        assert ExtractionEngine(strategy="hi_res", executor="inline")._runs_tables()
+        assert signatures[0] != pipeline_signature("optimized")
+        assert signatures[1] != pipeline_signature("unstructured", "hi_res")
+    
+    def test_tables_merged_into_held_file_events(self, monkeypatch):
+        """Eventos de arquivo esperam as tabelas; páginas e arquivos reaproveitados passam direto."""
+        from memorial_maker.extract import tables
+        from memorial_maker.extract.engine import InlineExecutor
+        from memorial_maker.extract.spatial_index import build_page_indexes, build_pages
+        
+        tasks = []
+        
+        def fake_table_task(task):
+            tasks.append(task)
+            return [{"type": "table", "text": "PONTO 0 | PONTO 1",
+                     "metadata": {"page_number": task["page_numbers"][0] + 1}}]
+        
+        monkeypatch.setattr(tables, "run_table_task", fake_table_task)
+        
+        result = {
+            "filename": "a.pdf", "text": _legend_page(), "metadata": {"file_digest": "abc"},
+            "tables": [{"type": "table", "text": "antiga", "metadata": {"page_number": 1}},
+                       {"type": "table", "text": "outra página", "metadata": {"page_number": 2}}],
+        }
+        result["pages"] = build_pages(build_page_indexes(result["text"]))
+        stream = [
+            {"event": "page", "filename": "a.pdf", "page": {"page_number": 0}},
+            {"event": "file", "pdf_path": "a.pdf", "filename": "a.pdf", "result": result},
+            {"event": "file", "pdf_path": "b.pdf", "filename": "b.pdf", "result": {"pages": []}, "reused": True},
+        ]
+        
+        out = list(tables.iter_with_tables(stream, InlineExecutor()))
+        
+        assert [e["event"] for e in out] == ["page", "file", "file"]
+        assert len(tasks) == 1 and tasks[0]["file_digest"] == "abc"
+        assert [t["text"] for t in result["tables"]] == ["PONTO 0 | PONTO 1", "outra página"]
+        assert result["total_elements"] == len(result["text"]) + 2
+
+
+class TestPageScheduler:
+    """Testes do escalonador de tarefas por página."""
+    
+    def test_tasks_longest_first(self):
+        """Páginas escaneadas grandes devem vir antes das pequenas e do texto nativo."""
+        from memorial_maker.extract.page_manifest import classify_page
+        from memorial_maker.extract.scheduler import build_page_tasks
+        
+        manifests = {
+            Path("a.pdf"): {"pages": [_fake_page(0, True), _fake_page(1, False, 800, 600)]},
+            Path("b.pdf"): {"pages": [_fake_page(0, False, 3300, 2300, image_coverage=1.0)]},
+        }
+        decisions = {
+            pdf_path: {p["page_number"]: classify_page(p) for p in manifest["pages"]}
+            for pdf_path, manifest in manifests.items()
+        }
+        
+        tasks = build_page_tasks(manifests, decisions)
+        
+        assert [t["kind"] for t in tasks] == ["ocr", "ocr", "native"]
+        assert tasks[0]["pdf_path"] == "b.pdf"
+        assert [t["cost"] for t in tasks] == sorted((t["cost"] for t in tasks), reverse=True)
+    
+    def test_ocr_pages_batched_per_file(self, monkeypatch, tmp_path):
+        """Com OCR_BATCH_SIZE > 1, páginas escaneadas do mesmo PDF viram uma tarefa e voltam por página."""
+        from concurrent.futures import ThreadPoolExecutor
+        from memorial_maker.config import settings
+        from memorial_maker.extract import scheduler
+        
+        monkeypatch.setattr(settings, "ocr_batch_size", 2)
+        manifest = {"total_pages": 3, "pages": [
+            {**_fake_page(n, False), "content_digest": f"d{n}"} for n in range(3)
+        ]}
+        tasks = scheduler.build_page_tasks(
+            {Path("a.pdf"): manifest}, {Path("a.pdf"): {n: {"strategy": "ocr"} for n in range(3)}}
+        )
+        assert sorted(t["page_numbers"] for t in tasks) == [[0, 1], [2]]
+        batch = [t for t in tasks if len(t["page_numbers"]) == 2][0]
+        assert batch["content_digests"] == {0: "d0", 1: "d1"}
+        
+        def fake_task(task):
+            if "content_digests" in task:
+                return {n: {"text": f"ocr {d}", "ocr_time": 0.1, "batch_size": 2}
+                        for n, d in task["content_digests"].items()}
+            return {"text": f"ocr {task['content_digest']}", "ocr_time": 0.1}
+        
+        monkeypatch.setattr(scheduler, "build_page_manifest", lambda p: manifest)
+        monkeypatch.setattr(scheduler, "run_page_task", fake_task)
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = scheduler.run_scheduled_extraction([Path("a.pdf")], tmp_path, executor)
+        
+        assert [item["text"] for item in results[0]["text"]] == ["ocr d0", "ocr d1", "ocr d2"]
+        assert results[0]["metrics"]["batched_ocr_pages"] == 2
+    
+    def test_batched_ocr_maps_pages_and_caches_each(self, monkeypatch):
+        """Uma chamada do particionador para o lote; cada página ganha sua entrada de cache."""
+        from types import SimpleNamespace
+        from memorial_maker.extract import optimized_extract
+        
+        class FakeElement:
+            def __init__(self, text, page_number):
+                self.text = text
+                self.metadata = SimpleNamespace(page_number=page_number)
+            
+            def __str__(self):
+                return self.text
+        
+        cache = {"v1.0|cached": {"text": "do cache", "page_number": 0}}
+        calls = []
+        
+        def fake_partition(file, strategy, languages):
+            # Páginas do PDF parcial (1-indexed): 1 = página 1, 2 = página 2 do original
+            calls.append(strategy)
+            return [FakeElement("AP. 201", 1), FakeElement("AP. 301", 2)]
+        
+        monkeypatch.setattr(optimized_extract, "UNSTRUCTURED_AVAILABLE", True)
+        monkeypatch.setattr(optimized_extract, "partition_pdf", fake_partition)
+        monkeypatch.setattr(optimized_extract, "subset_pdf", lambda pdf_path, pages: b"%PDF")
+        monkeypatch.setattr(optimized_extract, "get_cache_key",
+                            lambda pdf_digest, page, version, digest: f"{version}|{digest}")
+        monkeypatch.setattr(optimized_extract, "lookup_cache", lambda key: (cache.get(key), "disk"))
+        monkeypatch.setattr(optimized_extract, "save_to_cache", cache.__setitem__)
+        
+        results = optimized_extract.extract_pages_with_ocr(
+            Path("a.pdf"), [0, 1, 2], "file", {0: "cached", 1: "p1", 2: "p2"}
+        )
+        
+        assert calls == ["hi_res"]
+        assert results[0]["from_cache"] and results[0]["text"] == "do cache"
+        assert results[1]["text"] == "AP. 201" and results[2]["text"] == "AP. 301"
+        assert results[2]["page_number"] == 2 and results[2]["batch_size"] == 2
+        assert cache["v1.0|p2"]["text"] == "AP. 301"
+    
+    def test_results_rebuilt_in_page_order(self, monkeypatch, tmp_path):
+        """Resultados por arquivo devem ser remontados na ordem das páginas."""
+        from concurrent.futures import ThreadPoolExecutor
+        from memorial_maker.extract import scheduler
+        
+        valid_text = "PONTO RJ-45 H=0,30m CABO CAT6 " * 5
+        manifests = {
+            "a.pdf": {"total_pages": 3, "pages": [
+                _fake_page(0, False), _fake_page(1, True), _fake_page(2, True),
+            ]},
+        }
+        
+        def fake_task(task):
+            if task["kind"] == "native":
+                # Página 2 tem camada de texto inválida e deve cair para OCR
+                return {
+                    1: [{"type": "text", "text": valid_text, "metadata": {"page_number": 2}}],
+                    2: [{"type": "text", "text": "x", "metadata": {"page_number": 3}}],
+                }
+            return {"text": f"ocr {task['page_numbers'][0]}", "ocr_time": 0.1}
+        
+        monkeypatch.setattr(scheduler, "build_page_manifest", lambda p: manifests[p.name])
+        monkeypatch.setattr(scheduler, "run_page_task", fake_task)
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = scheduler.run_scheduled_extraction([Path("a.pdf")], tmp_path, executor)
+        
+        assert len(results) == 1
+        pages = [item["metadata"]["page_number"] for item in results[0]["text"]]
+        methods = [item["metadata"]["extraction_method"] for item in results[0]["text"]]
+        assert pages == [0, 1, 2]
+        assert methods == ["ocr", "native", "ocr"]
+        assert results[0]["metrics"]["ocr_pages"] == 2
+        assert [d["reason"] for d in results[0]["metadata"]["extraction_decisions"]] == [
+            "no_text_layer", "text_layer", "native_text_invalid",
+        ]
+    
+    def test_streams_pages_before_file(self, monkeypatch, tmp_path):
+        """Páginas são emitidas à medida que ficam prontas, antes do resultado do arquivo."""
+        from concurrent.futures import ThreadPoolExecutor
+        from memorial_maker.extract import scheduler
+        
+        manifests = {
+            "a.pdf": {"total_pages": 2, "pages": [_fake_page(0, False), _fake_page(1, False)]},
+            "b.pdf": {"total_pages": 1, "pages": [_fake_page(0, False, 800, 600)]},
+        }
+        
+        monkeypatch.setattr(scheduler, "build_page_manifest", lambda p: manifests[p.name])
+        monkeypatch.setattr(
+            scheduler, "run_page_task",
+            lambda task: {"text": "ocr", "ocr_time": 0.1},
+        )
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            events = list(scheduler.iter_scheduled_extraction(
+                [Path("a.pdf"), Path("b.pdf")], tmp_path, executor
+            ))
+        
+        kinds = [(e["event"], e["filename"]) for e in events]
+        assert kinds.index(("file", "a.pdf")) > max(
+            i for i, k in enumerate(kinds) if k == ("page", "a.pdf")
+        )
+        assert [e["completed_pages"] for e in events if e["event"] == "page"] == [1, 2, 3]
+        assert all(e["total_pages"] == 3 for e in events if e["event"] == "page")
+        assert [e["completed_files"] for e in events if e["event"] == "file"] == [1, 2]
+    
+    def test_timeout_falls_back_to_ocr_only(self, monkeypatch, tmp_path):
+        """Página que estoura o tempo no hi_res é refeita com ocr_only."""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from memorial_maker.extract import scheduler
+        
+        manifests = {"a.pdf": {"total_pages": 1, "pages": [_fake_page(0, False)]}}
+        
+        def fake_task(task):
+            if task["kind"] == "ocr":
+                time.sleep(1.0)  # "travado"
+            return {"text": task["kind"], "ocr_time": 0.1}
+        
+        monkeypatch.setattr(scheduler, "build_page_manifest", lambda p: manifests[p.name])
+        monkeypatch.setattr(scheduler, "run_page_task", fake_task)
+        monkeypatch.setattr(scheduler, "task_budget", lambda task: 0.1)
+        monkeypatch.setattr(scheduler, "DEADLINE_GRACE", 0.0)
+        
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = scheduler.run_scheduled_extraction([Path("a.pdf")], tmp_path, executor)
+            elapsed = time.monotonic() - start
+        
+        assert elapsed < 0.9  # não esperou a tarefa travada
+        assert results[0]["text"][0]["text"] == "ocr_only"
+        assert results[0]["metadata"]["extraction_decisions"][0] == {
+            "page_number": 0, "strategy": "ocr_only", "reason": "ocr_timeout",
+        }
+    
+    def test_carimbo_only_without_full_sheet_ocr(self, monkeypatch, tmp_path):
+        """Sem OCR da folha inteira, páginas escaneadas viram tarefas do carimbo."""
+        from concurrent.futures import ThreadPoolExecutor
+        from memorial_maker.config import settings
+        from memorial_maker.extract import scheduler
+        
+        monkeypatch.setattr(settings, "full_sheet_ocr", False)
+        manifests = {"a.pdf": {"total_pages": 1, "pages": [_fake_page(0, False)]}}
+        kinds = []
+        
+        def fake_task(task):
+            kinds.append(task["kind"])
+            return {"text": "PROJETO: CONSTRUTOR: EDIFÍCIO: LOCAL:", "time": 0.2}
+        
+        monkeypatch.setattr(scheduler, "build_page_manifest", lambda p: manifests[p.name])
+        monkeypatch.setattr(scheduler, "run_page_task", fake_task)
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            results = scheduler.run_scheduled_extraction([Path("a.pdf")], tmp_path, executor)
+        
+        assert kinds == ["carimbo_roi"]
+        assert results[0]["metrics"]["carimbo_roi_pages"] == 1
+        assert results[0]["metrics"]["ocr_pages"] == 0
+
+    
+    def test_incremental_reuses_unchanged_files_and_pages(self, monkeypatch, tmp_path):
+        """Segunda execução extrai só as páginas alteradas e reaproveita o resto."""
+        import json
+        from concurrent.futures import ThreadPoolExecutor
+        from memorial_maker.extract import scheduler
+        from memorial_maker.extract.incremental import ExtractionManifest, pipeline_signature
+        from memorial_maker.utils.ocr_cache import file_digest
+        
+        pdf_a, pdf_b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+        pdf_a.write_bytes(b"rev A")
+        pdf_b.write_bytes(b"rev A")
+        consolidated = tmp_path / "all_extractions_optimized.json"
+        page_digests = {"a.pdf": ["a0", "a1"], "b.pdf": ["b0"]}
+        tasks = []
+        
+        def fake_manifest(pdf_path):
+            pages = []
+            for n, digest in enumerate(page_digests[pdf_path.name]):
+                pages.append({**_fake_page(n, False), "content_digest": digest})
+            return {"file_digest": file_digest(pdf_path), "total_pages": len(pages), "pages": pages}
+        
+        def fake_task(task):
+            tasks.append((Path(task["pdf_path"]).name, task["page_numbers"][0]))
+            return {"text": f"ocr {task['content_digest']}", "ocr_time": 0.1}
+        
+        monkeypatch.setattr(scheduler, "build_page_manifest", fake_manifest)
+        monkeypatch.setattr(scheduler, "run_page_task", fake_task)
+        
+        def run():
+            incremental = ExtractionManifest(consolidated, pipeline_signature("optimized"))
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                events = list(scheduler.iter_scheduled_extraction(
+                    [pdf_a, pdf_b], tmp_path, executor, incremental
+                ))
+            results = scheduler.collect_results(events, [pdf_a, pdf_b])
+            consolidated.write_text(json.dumps(results))
+            for result in results:
+                incremental.update_from_result(result)
+            incremental.save(["a.pdf", "b.pdf"])
+            return events, results
+        
+        run()
+        assert sorted(tasks) == [("a.pdf", 0), ("a.pdf", 1), ("b.pdf", 0)]
+        
+        # Revisão B: só a página 1 de a.pdf mudou
+        tasks.clear()
+        pdf_a.write_bytes(b"rev B")
+        page_digests["a.pdf"] = ["a0", "a1-revB"]
+        events, results = run()
+        
+        assert tasks == [("a.pdf", 1)]
+        assert [e.get("reused", False) for e in events if e["event"] == "file"] == [True, False]
+        assert [item["text"] for item in results[0]["text"]] == ["ocr a0", "ocr a1-revB"]
+        assert results[0]["metrics"]["reused_pages"] == 1
+        assert results[1]["text"][0]["text"] == "ocr b0"
+        
+        # Nada mudou: nenhuma tarefa
+        tasks.clear()
+        run()
+        assert tasks == []
+
+    
+    def test_merge_revised_pages(self):
+        """Elementos das páginas reextraídas substituem os anteriores, em ordem de página."""
+        from memorial_maker.extract.incremental import merge_page_elements
+        
+        def element(text, page):
+            return {"type": "text", "text": text, "metadata": {"page_number": page + 1}}
+        
+        previous = {"text": [element("p0", 0), element("p1 rev A", 1), element("p2", 2)], "tables": []}
+        current = {"filename": "a.pdf", "text": [element("p1 rev B", 1)], "tables": []}
+        
+        merged = merge_page_elements(previous, current, {1})
+        assert [e["text"] for e in merged["text"]] == ["p0", "p1 rev B", "p2"]
+        assert merged["total_elements"] == 3
+
+
+def _hold_memory(megabytes, seconds):
+    """Aloca memória e a mantém ocupada (executado em worker)."""
+    import time
+    block = bytearray(megabytes * 1024 * 1024)
+    time.sleep(seconds)
+    return len(block)
+
+
+def _emit_and_wait(seconds):
+    """Emite um evento e fica ocupado (executado em worker)."""
+    import time
+    from memorial_maker.extract import events
+    events.emit(events.TASK_STARTED, task_kind="ocr", filename="lenta.pdf", page_numbers=[0])
+    time.sleep(seconds)
+
+
+class TestWarmPool:
+    """Testes do pool de workers persistente."""
+    
+    def test_health_check(self):
+        """Workers devem responder ao health check e aceitar tarefas."""
+        from memorial_maker.extract.worker_service import WarmPool
+        
+        pool = WarmPool(max_workers=1, max_pages_per_worker=2)
+        try:
+            status = pool.health_check(timeout=60)
+            assert status["alive"]
+            assert status["responses"][0]["pid"] > 0
+            
+            # Worker é reciclado após 2 tarefas e o pool continua respondendo
+            assert [pool.submit(pow, 2, n).result(timeout=60) for n in range(5)] == [1, 2, 4, 8, 16]
+            assert pool.tasks_submitted == 5
+        finally:
+            pool.shutdown()
+    
+    def test_hung_task_is_killed(self):
+        """Tarefa que excede o orçamento tem o worker substituído; o pool continua."""
+        import time
+        from memorial_maker.extract.supervisor import TaskTimeout, WorkerCrashed
+        from memorial_maker.extract.worker_service import WarmPool
+        
+        pool = WarmPool(max_workers=1)
+        try:
+            assert pool.health_check(timeout=60)["alive"]
+            pid = pool.submit(os.getpid).result(timeout=60)
+            
+            with pytest.raises(TaskTimeout):
+                pool.submit_with_budget(0.5, time.sleep, 30).result(timeout=60)
+            with pytest.raises(WorkerCrashed):
+                pool.submit(os._exit, 3).result(timeout=60)
+            
+            new_pid = pool.submit(os.getpid).result(timeout=60)
+            assert new_pid != pid
+        finally:
+            pool.shutdown()
+    
+    def test_worker_killed_mid_task(self):
+        """Worker morto durante uma tarefa: a future falha e o worker é substituído."""
+        import multiprocessing
+        import signal
+        import time
+        from memorial_maker.extract.supervisor import SupervisedPool, WorkerCrashed, _Worker
+        
+        context = multiprocessing.get_context("spawn")
+        pool = SupervisedPool(1, context)
+        try:
+            pid = pool.submit(os.getpid).result(timeout=60)
+            future = pool.submit(time.sleep, 30)
+            deadline = time.monotonic() + 30
+            while not future.running() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            os.kill(pid, signal.SIGKILL)
+            
+            with pytest.raises(WorkerCrashed):
+                future.result(timeout=30)
+            assert pool.submit(os.getpid).result(timeout=60) != pid
+        finally:
+            pool.shutdown()
+        
+        # Pipe fechado: a leitura falha em vez de ficar pronta para sempre
+        parent_conn, child_conn = context.Pipe()
+        child_conn.close()
+        assert pool._handle_reply(_Worker(None, parent_conn)) is False
+    
+    def test_shutdown_waits_unless_cancelled(self):
+        """shutdown() espera as tarefas enviadas; com cancel_futures, a tarefa em execução é interrompida."""
+        import multiprocessing
+        import time
+        from memorial_maker.extract.supervisor import SupervisedPool, WorkerCrashed
+        
+        context = multiprocessing.get_context("spawn")
+        with SupervisedPool(1, context) as pool:
+            futures = [pool.submit(time.sleep, 0.2), pool.submit(pow, 2, 10)]
+        assert [f.result(timeout=0) for f in futures] == [None, 1024]
+        
+        pool = SupervisedPool(1, context)
+        running = pool.submit(time.sleep, 30)
+        queued = pool.submit(pow, 2, 10)
+        deadline = time.monotonic() + 60
+        while not running.running() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        start = time.monotonic()
+        pool.shutdown(cancel_futures=True)
+        assert time.monotonic() - start < 20
+        with pytest.raises(WorkerCrashed):
+            running.result(timeout=0)
+        assert queued.cancelled()
+    
+    def test_events_survive_killed_worker(self):
+        """Worker morto depois de emitir não bloqueia os eventos dos outros."""
+        import multiprocessing
+        import signal
+        import threading
+        from memorial_maker.extract import events
+        from memorial_maker.extract.supervisor import SupervisedPool, WorkerCrashed
+        
+        received = []
+        started = threading.Event()
+        
+        def on_event(event):
+            received.append(event)
+            if event["filename"] == "lenta.pdf":
+                started.set()
+        
+        pool = SupervisedPool(2, multiprocessing.get_context("spawn"), on_event=on_event)
+        try:
+            future = pool.submit(_emit_and_wait, 30)
+            assert started.wait(timeout=60)
+            os.kill(received[0]["pid"], signal.SIGKILL)
+            with pytest.raises(WorkerCrashed):
+                future.result(timeout=30)
+            
+            # O evento chega pelo pipe do worker antes do resultado da tarefa
+            pool.submit(events.emit, events.TASK_FINISHED, filename="planta.pdf", elapsed=1.0).result(timeout=60)
+            assert received[-1]["filename"] == "planta.pdf"
+        finally:
+            pool.shutdown()
+    
+    def test_service_key_and_paths(self, tmp_path, monkeypatch):
+        """Chave do serviço é aleatória e privada; a chave pública e caminhos fora da raiz são recusados."""
+        import stat
+        from memorial_maker.config import settings
+        from memorial_maker.extract import worker_service
+        
+        key_file = tmp_path / "runtime" / "service.key"
+        monkeypatch.setattr(settings, "ocr_service_authkey", "")
+        monkeypatch.setattr(settings, "ocr_service_key_file", key_file)
+        monkeypatch.setattr(settings, "ocr_service_root", tmp_path)
+        
+        with pytest.raises(FileNotFoundError):
+            worker_service.service_authkey()
+        key = worker_service.service_authkey(create=True)
+        assert len(key) == 64
+        assert stat.S_IMODE(key_file.stat().st_mode) == 0o600
+        assert worker_service.service_authkey() == key
+        
+        key_file.chmod(0o644)
+        with pytest.raises(PermissionError):
+            worker_service.service_authkey()
+        
+        monkeypatch.setattr(settings, "ocr_service_authkey", "memorial-maker")
+        with pytest.raises(ValueError):
+            worker_service.service_authkey()
+        
+        assert worker_service.check_service_path(str(tmp_path / "pdfs" / "a.pdf")) == tmp_path / "pdfs" / "a.pdf"
+        with pytest.raises(PermissionError):
+            worker_service.check_service_path(str(tmp_path / ".." / "outside"))
+    
+    def test_memory_ceiling(self):
+        """Worker acima do teto de RSS é morto; pico de memória vem nas estatísticas."""
+        import multiprocessing
+        from memorial_maker.extract.supervisor import MemoryLimitExceeded, SupervisedPool
+        
+        pool = SupervisedPool(1, multiprocessing.get_context("spawn"), max_rss_mb=400)
+        try:
+            future = pool.submit(_hold_memory, 50, 0.1)
+            assert future.result(timeout=60) == 50 * 1024 * 1024
+            assert future.worker_stats["peak_rss_mb"] >= 50
+            
+            with pytest.raises(MemoryLimitExceeded):
+                pool.submit(_hold_memory, 600, 30).result(timeout=60)
+            assert pool.submit(_hold_memory, 1, 0).result(timeout=60) == 1024 * 1024
+        finally:
+            pool.shutdown()
+    
+    def test_workers_capped_by_memory(self, monkeypatch):
+        """Número de workers respeita CPU e memória disponível."""
+        from memorial_maker.config import settings
+        from memorial_maker.utils import memory
+        
+        monkeypatch.setattr(memory, "available_memory_mb", lambda: 3200.0)
+        monkeypatch.setattr(settings, "ocr_worker_mem_mb", 1500)
+        monkeypatch.setattr(memory.os, "cpu_count", lambda: 8)
+        
+        assert memory.recommended_workers(4) == 2
+        assert memory.recommended_workers(1) == 1
+    
+    def test_worker_events_reach_listeners(self):
+        """Eventos emitidos nos workers chegam aos ouvintes do processo principal."""
+        import threading
+        from memorial_maker.extract import events
+        from memorial_maker.extract.worker_service import WarmPool
+        
+        received = []
+        arrived = threading.Event()
+        
+        def listener(event):
+            received.append(event)
+            if event["kind"] == events.TASK_FINISHED:
+                arrived.set()
+        
+        pool = WarmPool(max_workers=1)
+        pool.events.add_listener(listener)
+        try:
+            pool.submit(
+                events.emit, events.TASK_FINISHED,
+                task_kind="ocr", filename="planta.pdf", page_numbers=[0], elapsed=1.0,
+            ).result(timeout=60)
+            assert arrived.wait(timeout=10)
+        finally:
+            pool.shutdown()
+        
+        event = [e for e in received if e["kind"] == events.TASK_FINISHED][0]
+        assert event["filename"] == "planta.pdf"
+        assert event["pid"] != os.getpid()
+        assert events.format_event(event) == "✔️ planta.pdf página 1 (1.0s)"
+
+
+class TestExtractionEngine:
+    """Testes do motor de extração unificado."""
+    
+    def test_invalid_options(self):
+        """Estratégia ou executor desconhecidos são rejeitados."""
+        from memorial_maker.extract.engine import ExtractionEngine
+        
+        with pytest.raises(ValueError):
+            ExtractionEngine(strategy="turbo", executor="inline")
+        with pytest.raises(ValueError):
+            ExtractionEngine(strategy="fast", executor="gpu")
+    
+    def test_inline_extract_and_incremental_rerun(self, monkeypatch, tmp_path):
+        """Executor inline grava o consolidado e reaproveita arquivos na segunda execução."""
+        from memorial_maker.extract import engine
+        
+        calls = []
+        
+        def fake_extract(pdf_path, output_dir, page_numbers=None, previous_result=None, strategy=None,
+                         save_json=True, infer_tables=None):
+            calls.append((pdf_path.name, strategy))
+            return {"filename": pdf_path.name, "text": [], "tables": [], "metadata": {}, "carimbo": {}}
+        
+        monkeypatch.setattr(engine, "extract_pdf_unstructured", fake_extract)
+        pdf_dir = tmp_path / "pdfs"
+        pdf_dir.mkdir()
+        for name in ("a.pdf", "b.pdf"):
+            os.symlink(SAMPLE_PDF, pdf_dir / name)
+        out_dir = tmp_path / "out"
+        progress = []
+        
+        extraction = engine.ExtractionEngine(strategy="hi_res", executor="inline")
+        results = extraction.extract_dir(pdf_dir, out_dir, lambda c, t: progress.append((c, t)))
+        
+        assert [r["filename"] for r in results] == ["a.pdf", "b.pdf"]
+        assert calls == [("a.pdf", "hi_res"), ("b.pdf", "hi_res")]
+        assert progress == [(1, 2), (2, 2)]
+        assert (out_dir / "all_extractions.json").exists()
+        assert (out_dir / "extraction_manifest.json").exists()
+        
+        calls.clear()
+        assert [r["filename"] for r in extraction.extract_dir(pdf_dir, out_dir)] == ["a.pdf", "b.pdf"]
+        assert calls == []
+    
+    def test_failed_batch_raises(self, monkeypatch, tmp_path):
+        """Arquivos com erro voltam marcados; se todos falham, a extração levanta o erro."""
+        from memorial_maker.extract import engine
+        
+        def fake_extract(pdf_path, output_dir, page_numbers=None, previous_result=None, strategy=None,
+                         save_json=True, infer_tables=None):
+            if pdf_path.name != "ok.pdf":
+                raise ImportError("Unstructured não está instalado")
+            return {"filename": pdf_path.name, "text": [], "tables": [], "metadata": {}, "carimbo": {}}
+        
+        monkeypatch.setattr(engine, "extract_pdf_unstructured", fake_extract)
+        pdf_files = [tmp_path / "ok.pdf", tmp_path / "b.pdf"]
+        for pdf_path in pdf_files:
+            os.symlink(SAMPLE_PDF, pdf_path)
+        extraction = engine.ExtractionEngine(strategy="fast", executor="inline")
+        
+        results = extraction.extract(pdf_files, tmp_path / "out")
+        assert [bool(r.get("error")) for r in results] == [False, True]
+        
+        with pytest.raises(engine.ExtractionFailed, match="Unstructured"):
+            extraction.extract(pdf_files[1:], tmp_path / "out2")
+    
+    def test_table_stage_only_for_table_strategies(self, monkeypatch, tmp_path):
+        """Estágio de tabelas só roda no hi_res; o JSON do arquivo é gravado já com as tabelas."""
+        import json
+        from memorial_maker.config import settings
+        from memorial_maker.extract import engine
+        
+        saved = []
+        
+        def fake_extract(pdf_path, output_dir, page_numbers=None, previous_result=None, strategy=None,
+                         save_json=True, infer_tables=None):
+            saved.append((save_json, infer_tables))
+            return {"filename": pdf_path.name, "text": [], "tables": [], "metadata": {}, "carimbo": {}}
+        
+        def fake_tables(stream, executor):
+            for event in stream:
+                if event["event"] == "file":
+                    event["result"]["tables"].append({"type": "table", "text": "QUADRO"})
+                yield event
+        
+        monkeypatch.setattr(engine, "extract_pdf_unstructured", fake_extract)
+        monkeypatch.setattr(engine, "iter_with_tables", fake_tables)
+        monkeypatch.setattr(engine, "TABLES_AVAILABLE", True)
+        monkeypatch.setattr(settings, "extract_tables", True)
+        monkeypatch.setattr(settings, "table_strategies", "hi_res")
+        pdf_files = [tmp_path / "a.pdf"]
+        os.symlink(SAMPLE_PDF, pdf_files[0])
+        
+        fast = [e for e in engine.ExtractionEngine(strategy="fast", executor="inline")
+                .iter_extract(pdf_files, tmp_path / "fast") if e["event"] == "file"]
+        assert fast[0]["result"]["tables"] == [] and saved == [(True, None)]
+        
+        saved.clear()
+        hi_res = [e for e in engine.ExtractionEngine(strategy="hi_res", executor="inline")
+                  .iter_extract(pdf_files, tmp_path / "hi_res") if e["event"] == "file"]
+        assert saved == [(False, False)]
+        assert [t["text"] for t in hi_res[0]["result"]["tables"]] == ["QUADRO"]
+        written = json.loads((tmp_path / "hi_res" / "a_unstructured.json").read_text(encoding="utf-8"))
+        assert [t["text"] for t in written["tables"]] == ["QUADRO"]
+    
+    @pytest.mark.skipif(not PYPDF_AVAILABLE, reason="Requer pypdf")
+    def test_parallel_executors_do_not_deadlock(self, tmp_path):
+        """Lote grande com executor de processos e de threads termina, com eventos dos workers."""
+        import threading
+        from memorial_maker.extract import events
+        from memorial_maker.extract.engine import ExtractionEngine
+        
+        pdf_dir = tmp_path / "pdfs"
+        pdf_dir.mkdir()
+        sources = sorted(PLANTAS_DIR.glob("*.pdf"))
+        for i in range(16):
+            os.symlink(sources[i % len(sources)], pdf_dir / f"folha_{i:02d}.pdf")
+        
+        for executor in ("processes", "threads"):
+            received = []
+            outcome = {}
+            
+            def run():
+                extraction = ExtractionEngine(strategy="fast", executor=executor, max_workers=4)
+                pdf_files = sorted(pdf_dir.glob("*.pdf"))
+                outcome["results"] = [
+                    e for e in extraction.iter_extract(pdf_files, tmp_path / executor, received.append)
+                    if e["event"] == "file"
+                ]
+            
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(timeout=300)
+            
+            assert not thread.is_alive(), f"extração com {executor} travou"
+            assert len(outcome["results"]) == 16
+            assert sorted(e["completed_files"] for e in outcome["results"]) == list(range(1, 17))
+            if executor == "processes":
+                # Eventos chegam pelo canal do pool
+                assert sum(1 for e in received if e["kind"] == events.TASK_STARTED) == 16
+    
+    def test_supervised_pool_churn(self):
+        """Centenas de tarefas com reciclagem frequente de workers não travam o pool."""
+        import multiprocessing
+        from concurrent.futures import wait
+        from memorial_maker.extract.supervisor import SupervisedPool
+        
+        pool = SupervisedPool(4, multiprocessing.get_context("spawn"), max_tasks_per_worker=25)
+        try:
+            futures = [pool.submit(pow, n, 2) for n in range(300)]
+            done, not_done = wait(futures, timeout=240)
+            assert not not_done
+            assert [f.result() for f in futures] == [n * n for n in range(300)]
+        finally:
+            pool.shutdown()
@@ -0,0 +1,262 @@
+"""Testes do cache de OCR."""
+
+import os
+import time
+import pytest
+from pathlib import Path
+
+from memorial_maker.utils.ocr_cache import file_digest, get_cache_key
+
+
+class TestCacheKeys:
+    """Testes das chaves de cache."""
+    
+    def test_file_digest_streams_whole_file(self, tmp_path):
+        """Digest em blocos deve ser igual ao SHA256 do arquivo inteiro."""
+        import hashlib
+        
+        data = b"%PDF-1.7\n" + bytes(range(256)) * 10000
+        pdf_path = tmp_path / "planta.pdf"
+        pdf_path.write_bytes(data)
+        
+        assert file_digest(pdf_path) == hashlib.sha256(data).hexdigest()
+    
+    def test_page_keys(self):
+        """Chaves variam com página e versão; digest de conteúdo ignora a posição."""
+        digest = "a" * 64
+        
+        assert get_cache_key(digest, 0, "v1") != get_cache_key(digest, 1, "v1")
+        assert get_cache_key(digest, 0, "v1") != get_cache_key(digest, 0, "v2")
+        assert get_cache_key(digest, 0, "v1", "c" * 64) == get_cache_key("b" * 64, 7, "v1", "c" * 64)
+
+
+def _write_entries(db_path, prefix, count):
+    """Escreve entradas no cache a partir de outro processo."""
+    from memorial_maker.utils.ocr_cache import SQLiteCache
+    
+    cache = SQLiteCache(db_path)
+    for i in range(count):
+        cache.set(f"{prefix}{i}", {"text": f"pagina {i}", "page_number": i})
+
+
+class TestSQLiteCache:
+    """Testes do backend SQLite."""
+    
+    def test_roundtrip(self, tmp_path):
+        """Resultado salvo deve ser lido de volta igual."""
+        from memorial_maker.utils.ocr_cache import SQLiteCache
+        
+        cache = SQLiteCache(tmp_path / "cache.sqlite3")
+        result = {"text": "PONTO RJ-45 H=0,30m", "page_number": 3, "ocr_time": 1.5}
+        
+        cache.set("k1", result)
+        
+        assert cache.get("k1") == result
+        assert cache.get("k2") is None
+        assert len(cache) == 1
+        assert cache.clear() == 1
+        assert cache.get("k1") is None
+    
+    def test_lru_eviction(self, tmp_path):
+        """Entradas menos usadas recentemente saem primeiro ao exceder o limite."""
+        from memorial_maker.utils.ocr_cache import SQLiteCache
+        
+        cache = SQLiteCache(tmp_path / "cache.sqlite3", max_bytes=250, touch_interval=0)
+        payload = {"text": "x" * 80}
+        
+        cache.set("a", payload)
+        cache.set("b", payload)
+        cache.get("a")  # "a" passa a ser o mais recente
+        cache.set("c", payload)
+        
+        assert cache.get("a") == payload
+        assert cache.get("b") is None
+        assert cache.get("c") == payload
+        assert cache.total_size() <= 250
+    
+    def test_binary_encoding(self, tmp_path):
+        """Resultados são gravados comprimidos e entradas JSON antigas continuam legíveis."""
+        import json
+        from memorial_maker.utils.ocr_cache import SQLiteCache, encode_result, decode_result
+        
+        result = {"text": "PONTO RJ-45 H=0,30m\nCABO CAT6\n" * 200, "page_number": 0}
+        encoded = encode_result(result)
+        
+        assert len(encoded) < len(json.dumps(result, indent=2)) / 5
+        assert decode_result(encoded) == result
+        assert decode_result(json.dumps(result).encode("utf-8")) == result
+        
+        cache = SQLiteCache(tmp_path / "cache.sqlite3")
+        cache.put_raw("legado", json.dumps(result).encode("utf-8"), 0.0)
+        assert cache.get("legado") == result
+    
+    def test_incomplete_backend_fails_on_creation(self):
+        """Backend sem todos os métodos da interface falha ao ser criado, não no primeiro uso."""
+        from memorial_maker.utils.ocr_cache import CacheBackend
+        
+        class GetOnly(CacheBackend):
+            def get(self, cache_key):
+                return None
+        
+        with pytest.raises(TypeError):
+            GetOnly()
+    
+    def test_json_dir_binary_entries(self, tmp_path):
+        """Backend de diretório grava no formato binário e ainda lê o JSON legado."""
+        import json
+        from memorial_maker.utils.ocr_cache import CACHE_MAGIC, JsonDirCache
+        
+        cache = JsonDirCache(tmp_path / "ocr_cache")
+        result = {"text": "QUADRO QDF-01 " * 200, "page_number": 3}
+        cache.set("novo", result)
+        (tmp_path / "ocr_cache" / "legado.json").write_text(json.dumps(result, indent=2), encoding="utf-8")
+        
+        assert cache.get_cache_path("novo").read_bytes().startswith(CACHE_MAGIC)
+        assert cache.get("novo") == result
+        assert cache.get("legado") == result
+    
+    def test_migrate_json_dir(self, tmp_path):
+        """Cache JSON legado deve ser importado para o SQLite."""
+        import json
+        from memorial_maker.utils.ocr_cache import SQLiteCache, migrate_json_cache
+        
+        json_dir = tmp_path / "ocr_cache"
+        json_dir.mkdir()
+        for key in ("aaa", "bbb"):
+            (json_dir / f"{key}.json").write_text(json.dumps({"text": key}), encoding="utf-8")
+        
+        cache = SQLiteCache(tmp_path / "cache.sqlite3")
+        
+        assert migrate_json_cache(json_dir, cache, remove=True) == 2
+        assert cache.get("bbb") == {"text": "bbb"}
+        assert not list(json_dir.glob("*.json"))
+    
+    def test_concurrent_writers(self, tmp_path):
+        """Vários processos escrevendo ao mesmo tempo não devem perder entradas."""
+        import multiprocessing
+        from memorial_maker.utils.ocr_cache import SQLiteCache
+        
+        db_path = tmp_path / "cache.sqlite3"
+        SQLiteCache(db_path)
+        
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_write_entries, args=(db_path, f"p{n}_", 50)) for n in range(3)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join(timeout=60)
+            assert proc.exitcode == 0
+        
+        assert len(SQLiteCache(db_path)) == 150
+
+
+class TestTieredCache:
+    """Testes do cache em duas camadas (memória + disco)."""
+    
+    def test_memory_tier_serves_repeated_lookups(self, tmp_path):
+        """Primeira leitura vem do disco, as seguintes da memória."""
+        from memorial_maker.utils.ocr_cache import MemoryLRU, SQLiteCache, TieredCache
+        
+        disk = SQLiteCache(tmp_path / "cache.sqlite3")
+        disk.set("k1", {"text": "QUADRO QDF-01", "page_number": 0})
+        cache = TieredCache(MemoryLRU(1024 * 1024), disk)
+        
+        assert cache.lookup("k1")[1] == "disk"
+        assert cache.lookup("k1")[1] == "memory"
+        assert cache.lookup("k2") == (None, None)
+        assert cache.stats == {
+            "memory": {"hits": 1, "misses": 2},
+            "disk": {"hits": 1, "misses": 1},
+        }
+    
+    def test_memory_lru_is_byte_bounded(self):
+        """Camada em memória descarta as entradas mais antigas ao exceder o limite."""
+        from memorial_maker.utils.ocr_cache import MemoryLRU, estimate_size
+        
+        payload = {"text": "x" * 400}
+        memory = MemoryLRU(estimate_size(payload) * 2)
+        
+        memory.set("a", payload)
+        memory.set("b", payload)
+        memory.get("a")
+        memory.set("c", payload)
+        
+        assert memory.get("a") is payload
+        assert memory.get("b") is None
+        assert memory.total_bytes <= memory.max_bytes
+
+
+class TestRasterCache:
+    """Testes do cache de páginas rasterizadas."""
+    
+    def test_roundtrip_is_memory_mapped(self, tmp_path):
+        """Raster salvo volta mapeado em memória e igual ao original."""
+        import numpy as np
+        from memorial_maker.utils.raster_cache import RasterCache
+        
+        cache = RasterCache(tmp_path)
+        raster = np.arange(60 * 40 * 3, dtype=np.uint8).reshape(60, 40, 3)
+        
+        cache.put("k1", raster)
+        loaded = cache.get("k1")
+        
+        assert isinstance(loaded, np.memmap)
+        assert np.array_equal(loaded, raster)
+        assert cache.get("k2") is None
+    
+    def test_region_served_from_full_page(self, tmp_path, monkeypatch):
+        """Recorte da região usa o raster da página inteira já em cache, sem renderizar."""
+        import numpy as np
+        from memorial_maker.utils import raster_cache
+        
+        cache = raster_cache.RasterCache(tmp_path)
+        monkeypatch.setattr(raster_cache, "_raster_cache", cache)
+        monkeypatch.setattr(raster_cache, "render_page", lambda *a, **k: pytest.fail("renderizou"))
+        
+        full_page = np.zeros((100, 200, 3), dtype=np.uint8)
+        full_page[70:, 150:] = 255  # "carimbo" no canto inferior direito
+        cache.put(raster_cache.raster_key(None, 0, 200, None, "c" * 64), full_page)
+        
+        region = raster_cache.get_page_raster(
+            Path("planta.pdf"), 0, 200, (0.75, 0.7, 1.0, 1.0), content_digest="c" * 64
+        )
+        
+        assert region.shape == (30, 50, 3)
+        assert region.min() == 255
+    
+    def test_eviction(self, tmp_path):
+        """Arquivos menos usados são removidos ao exceder o limite."""
+        import numpy as np
+        from memorial_maker.utils.raster_cache import RasterCache
+        
+        raster = np.zeros((100, 100), dtype=np.uint8)
+        cache = RasterCache(tmp_path, max_bytes=25000)
+        
+        for age, key in ((300, "a"), (200, "b"), (0, "c")):
+            cache.put(key, raster)
+            # Entradas recentes ficam protegidas pelo período de carência
+            stamp = time.time() - age
+            os.utime(cache.get_path(key), (stamp, stamp))
+        
+        assert cache.total_size() <= 25000
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+    
+    def test_eviction_spares_writes_in_flight(self, tmp_path):
+        """Arquivos temporários e entradas recentes não são removidos; raster maior que o limite não é guardado."""
+        import numpy as np
+        from memorial_maker.utils.raster_cache import RasterCache
+        
+        cache = RasterCache(tmp_path, max_bytes=25000)
+        tmp_file = tmp_path / "d.123.tmp.npy"
+        tmp_file.write_bytes(b"0" * 30000)
+        old = time.time() - 300
+        os.utime(tmp_file, (old, old))
+        
+        cache.put("a", np.zeros((100, 100), dtype=np.uint8))
+        assert tmp_file.exists()
+        assert cache.get("a") is not None
+        
+        big = np.ones((200, 200), dtype=np.uint8)
+        assert np.array_equal(cache.put("big", big), big)
+        assert cache.get("big") is None
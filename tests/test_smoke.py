@@ -31,6 +31,24 @@ class TestCanonicalMapper:
         assert mapper.find_canonical("TV coletiva") == "point_tv_coletiva"
         assert mapper.find_canonical("interfone") == "point_interfone"
     
+    def test_find_all_canonical(self):
+        """Todas as chaves da linha numa passada, só palavras inteiras."""
+        mapper = CanonicalMapper()
+        
+        assert mapper.find_all_canonical("RJ45 com CAT-6 e cabo coaxial RG6") == ["point_rj45", "cat6", "rg6_u90"]
+        assert mapper.find_all_canonical("hotel 11/20") == []
+        assert mapper.find_canonical("tv ass") == "point_tv_assinatura"  # parte de uma variante
+    
+    def test_aho_corasick_leftmost_longest(self):
+        """Entre ocorrências sobrepostas vale a mais à esquerda e mais longa."""
+        from memorial_maker.normalize.aho_corasick import AhoCorasick
+        
+        automaton = AhoCorasick({"he": 1, "she": 2, "hers": 3, "his": 4})
+        
+        assert sorted(automaton.iter_matches("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 3)]
+        assert automaton.find("ushers", whole_words=False) == [(1, 4, 2)]
+        assert automaton.find("hers his", whole_words=True) == [(0, 4, 3), (5, 8, 4)]
+    
     def test_extract_diametro(self):
         """Testa extração de diâmetro."""
         mapper = CanonicalMapper()
@@ -87,6 +105,119 @@ class TestItemExtractor:
             assert items[0].get("pavimento") == "8º"
 
 
+    def test_extract_batch_same_as_per_text(self):
+        """Lote de textos dá os mesmos itens que um extract_from_text por texto."""
+        extractor = ItemExtractor()
+        
+        documents = [
+            ("RJ-45 - 4 unidades\nH=1,40m\nCabo: CAT-6\n∅25mm 3/4\"", {"pavimento": "Térreo"}),
+            ("divisor 1/3\nTV coletiva 10 pontos\nRG-06/U#90%", {"pavimento": "1º"}),
+            ("interfone 2 pçs\n\nH = 2.50 m", None),
+        ]
+        
+        expected = [item for text, context in documents for item in extractor.extract_from_text(text, context)]
+        
+        assert extractor.extract_batch(documents) == expected
+        assert expected[0] == {
+            "tipo": "point_rj45", "pavimento": "Térreo", "quantidade": 4,
+            "altura_m": 1.4, "cabos": ["cat6"], "mm": 25, "polegadas": "3/4",
+        }
+        # Nenhum casamento atravessa o fim de uma linha ("10\nun" não é quantidade)
+        assert extractor.extract_from_text("RJ-45 10\nunidade") == [{"tipo": "point_rj45"}]
+    
+    def test_extract_batch_throughput(self, record_property):
+        """Mede linhas/s da extração em lote sobre o texto real de uma planta, sem o memo de linhas."""
+        import json
+        import time
+        from memorial_maker.normalize.canonical_map import LineMemo
+        
+        sample = Path(__file__).parent.parent / "test_output" / "MGAMAK_TELECOM_01_SUBSOLO_28-04-2025_unstructured.json"
+        with open(sample, "r", encoding="utf-8") as f:
+            source = [line for item in json.load(f)["text"] for line in item["text"].split("\n")]
+        # Linhas distintas entre documentos: cada uma passa pelos padrões em lote
+        documents = [
+            ("\n".join(f"{line} f{i}" if line.strip() else line for line in source), {"pavimento": str(i)})
+            for i in range(20)
+        ]
+        lines = sum(1 for line in source if line.strip()) * len(documents)
+        
+        extractor = ItemExtractor(LineMemo(0))
+        start = time.perf_counter()
+        extractor.extract_batch(documents)
+        elapsed = time.perf_counter() - start
+        
+        lines_per_second = lines / elapsed
+        record_property("lines_per_second", round(lines_per_second))
+        assert lines_per_second > 5000
+
+
+    def test_line_memo_shared_and_bounded(self):
+        """Linhas repetidas são analisadas uma vez; extrator e normalização dividem o memo."""
+        from memorial_maker.normalize.canonical_map import LineMemo, normalize_all_items
+        
+        memo = LineMemo(max_entries=100)
+        extractor = ItemExtractor(memo)
+        legenda = "PONTO RJ-45 H=0,30m\nCABO CAT6"
+        
+        items = extractor.extract_batch([(legenda, {"pavimento": str(i)}) for i in range(10)])
+        assert memo.misses == 2 and memo.hits == 18
+        assert items[0] == {"tipo": "point_rj45", "pavimento": "0", "altura_m": 0.3, "cabos": ["cat6"]}
+        
+        # Chaves e valores dos itens passam pelo mesmo memo
+        normalize_all_items(items, memo)
+        assert memo.hits > 18 + len(items)
+        
+        bounded = LineMemo(max_entries=2)
+        ItemExtractor(bounded).extract_from_text("rj-45\ncat6\ninterfone")
+        assert len(bounded) == 2
+
+
+class TestNormalizeStage:
+    """Testes do estágio de normalização em processos."""
+    
+    @staticmethod
+    def _extractions():
+        extractions = []
+        for n in range(3):
+            extractions.append({
+                "filename": f"planta_{n}.pdf",
+                "text": [{"text": f"PONTO RJ-45 H=0,{n + 1}0m\nCABO CAT6", "metadata": {"page_number": 1}}],
+                "tables": [
+                    {"text": "INTERFONE\nCABO CCI", "metadata": {"page_number": 2}},
+                    {"text": f"TV COLETIVA\nH=1,{n}0m", "metadata": {"page_number": 1}},
+                ],
+            })
+        return extractions
+    
+    def test_plan_documents_in_file_and_page_order(self):
+        from memorial_maker.normalize.stage import plan_documents
+        
+        documents = plan_documents(self._extractions())
+        assert len(documents) == 9
+        assert documents[0][1] == {"filename": "planta_0.pdf"}
+        assert [d[1].get("page_number") for d in documents[:3]] == [None, 1, 2]
+        assert documents[3][1]["filename"] == "planta_1.pdf"
+    
+    def test_parallel_items_match_serial(self, monkeypatch):
+        from memorial_maker.normalize import stage
+        
+        extractions = self._extractions()
+        serial = ItemExtractor().extract_batch(stage.plan_documents(extractions))
+        
+        # Uma tarefa por documento, em dois processos
+        monkeypatch.setattr(stage, "CHUNK_CHARS", 1)
+        parallel = stage.extract_raw_items(extractions, max_workers=2)
+        assert parallel == serial
+        # Texto do arquivo (que já inclui as tabelas) e depois as tabelas, por página
+        assert [item["tipo"] for item in parallel[3:5]] == ["point_tv_coletiva", "point_interfone"]
+        assert parallel[5]["altura_m"] == 0.2
+        
+        # Acertos e análises do memo voltam de cada worker e são somados
+        stats = {}
+        stage.extract_raw_items(extractions, max_workers=2, memo_stats=stats)
+        lines = sum(1 for text, _ in stage.plan_documents(extractions) for line in text.split("\n") if line.strip())
+        assert stats["hits"] + stats["misses"] == lines and stats["misses"] > 0
+    
 class TestDataConsolidator:
     """Testes do consolidador."""
     
@@ -126,6 +257,27 @@ class TestDataConsolidator:
         assert "térreo" in pavimentos[1].lower() or "terreo" in pavimentos[1].lower()
 
 
+    def test_obra_por_consenso(self):
+        """Dados da obra são votados por campo entre as folhas, com confiança."""
+        consolidator = DataConsolidator()
+        
+        extractions = [
+            {"carimbo_pages": [
+                {"page_number": 0, "carimbo": {"empreendimento": "MAKAI", "construtora": "MGA LTDA"}},
+                {"page_number": 1, "carimbo": {"empreendimento": "MAKAI", "construtora": "MGA LTDA"}},
+            ]},
+            {"carimbo": {"empreendimento": "SUBSOLO", "construtora": "MGA LTDA", "data": "27/01/2025"}},
+        ]
+        
+        obra = consolidator._consolidate_obra_data(extractions)
+        
+        assert obra["empreendimento"] == "MAKAI"
+        assert obra["construtora"] == "MGA LTDA"
+        assert obra["carimbo"]["data"] == "27/01/2025"
+        assert obra["confianca"]["construtora"] == 1.0
+        assert obra["confianca"]["empreendimento"] == 0.67
+
+
 class TestOutputDirs:
     """Testa criação de diretórios."""
     
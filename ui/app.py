@@ -16,8 +16,8 @@ from datetime import datetime
 
 from memorial_maker.config import settings, MemorialType
 from memorial_maker.utils.io_paths import setup_output_dirs, get_project_name
-from memorial_maker.extract.unstructured_extract import extract_all_pdfs, extract_text_from_elements
-from memorial_maker.normalize.canonical_map import ItemExtractor, normalize_all_items
+from memorial_maker.extract.engine import ExtractionEngine
+from memorial_maker.normalize.stage import normalize_extractions
 from memorial_maker.normalize.consolidate import consolidate_and_export
 from memorial_maker.rag.index_style import index_models
 from memorial_maker.rag.generate_sections import SectionGenerator
@@ -207,46 +207,36 @@ def generate_memorial(pdf_files, model_files, parallel, memorial_type: str = "te
             
             # 1. Extração com Unstructured
             status_text.text("📄 Extraindo dados dos PDFs com Unstructured...")
+            engine = ExtractionEngine(
+                strategy=settings.extraction_strategy,
+                executor=settings.extraction_executor if parallel else "inline",
+            )
+            unit = "página" if engine.strategy == "hybrid" else "PDF"
             
             def update_extraction_progress(current, total):
-                status_text.text(f"📄 Extraindo PDF {current}/{total}...")
+                status_text.text(f"📄 Extraindo {unit} {current}/{total}...")
                 # Map 0-100% of extraction to 10-40% of overall progress
                 progress = 10 + int((current / total) * 30)
                 progress_bar.progress(progress)
                 
-            extractions = extract_all_pdfs(
+            extractions = engine.extract_dir(
                 pdf_dir, 
                 dirs["extraido"], 
-                memorial_type=memorial_type,
                 progress_callback=update_extraction_progress
             )
+            failed = [e for e in extractions if e.get("error")]
+            if failed:
+                st.warning(
+                    f"⚠️ {len(failed)} de {len(extractions)} PDFs não foram extraídos e ficam fora do memorial: "
+                    + "; ".join(f"{e['filename']} ({e['error']})" for e in failed)
+                )
+                extractions = [e for e in extractions if not e.get("error")]
             progress_bar.progress(40)
             
             # 2. Normalização
             status_text.text("🔧 Normalizando dados...")
-            extractor = ItemExtractor()
-            raw_items = []
-            
-            for extraction in extractions:
-                # Extrai texto de todos os elementos
-                full_text = extract_text_from_elements(extraction)
-                
-                # Extrai itens do texto
-                items = extractor.extract_from_text(full_text, {
-                    "filename": extraction.get("filename", ""),
-                })
-                raw_items.extend(items)
-                
-                # Processa tabelas estruturadas
-                for table in extraction.get("tables", []):
-                    table_text = table.get("text", "")
-                    items = extractor.extract_from_text(table_text, {
-                        "filename": extraction.get("filename", ""),
-                        "source": "table",
-                    })
-                    raw_items.extend(items)
-            
-            normalized_items = normalize_all_items(raw_items)
+            # Textos e tabelas de todas as extrações, divididos entre processos
+            normalized_items = normalize_extractions(extractions)
             progress_bar.progress(45)
             
             # 3. Consolidação (inclui extração automática de carimbo)